@@ -0,0 +1,218 @@
+import ctypes
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from pathlib import Path
+
+from nacl.encoding import Encoder, RawEncoder
+from nacl.hash import BLAKE2B_KEYBYTES_MAX, blake2b
+from nacl.utils import random
+
+from cw_soda import metrics
+from cw_soda.cryptography.kdf import kdf, kdf_workers
+from cw_soda.timings import stage
+
+__all__ = ["derive_key", "AgentServer", "default_socket", "SOCKET_ENV"]
+
+# Like SSH_AUTH_SOCK, the clients find the agent through the environment
+SOCKET_ENV = "SODA_AGENT_SOCK"
+
+MAX_REQUEST = 64 * 1024
+
+
+def default_socket() -> Path:
+    """The socket in XDG_RUNTIME_DIR, or in a private directory in /tmp.
+
+    Anyone can create the /tmp one first, so it must be a real directory
+    owned by the user and closed to the others.
+    """
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return Path(runtime_dir) / "cw-soda-agent.sock"
+
+    path = Path(f"/tmp/cw-soda-{os.getuid()}")
+    try:
+        path.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"Not a directory of the user: {path}")
+
+    if info.st_mode & 0o077:
+        raise PermissionError(f"The directory is open to the others: {path}")
+
+    return path / "cw-soda-agent.sock"
+
+
+def lock_memory(buffer: bytearray) -> bool:
+    """Keeps the buffer out of swap, if the OS allows it."""
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        address = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+        return libc.mlock(ctypes.c_void_p(address), ctypes.c_size_t(len(buffer))) == 0
+    except (OSError, AttributeError):
+        return False
+
+
+def unlock_memory(buffer: bytearray):
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        address = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+        libc.munlock(ctypes.c_void_p(address), ctypes.c_size_t(len(buffer)))
+    except (OSError, AttributeError):
+        pass
+
+
+class KeyCache:
+    """The derived keys with the expiration time, zeroized when expired.
+
+    The passwords and salts are never stored, the cache is keyed by their
+    hashes under a random per-agent key.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.secret = random(BLAKE2B_KEYBYTES_MAX)
+        self.keys = {}
+        self.lock = threading.Lock()
+        self.slots = {}
+        self.derivations = 0
+
+    def fingerprint(self, password: bytes, salt: bytes, profile: tuple) -> tuple:
+        def digest(data: bytes) -> bytes:
+            return blake2b(data, key=self.secret, encoder=RawEncoder)
+
+        return digest(password), digest(salt), tuple(profile)
+
+    def profile_slots(self, profile: tuple) -> threading.BoundedSemaphore:
+        """Caps the concurrent derivations of the profile, see kdf_workers."""
+        with self.lock:
+            if profile not in self.slots:
+                workers = kdf_workers(os.cpu_count() or 1, profile)
+                self.slots[profile] = threading.BoundedSemaphore(workers)
+
+            return self.slots[profile]
+
+    def get(self, password: bytes, salt: bytes, profile: tuple) -> bytes:
+        fingerprint = self.fingerprint(password, salt, profile)
+        with self.lock:
+            entry = self.keys.get(fingerprint)
+            if entry is not None and entry[0] > time.monotonic():
+                metrics.count("soda_agent_requests", outcome="hit")
+                return bytes(entry[1])
+
+        metrics.count("soda_agent_requests", outcome="miss")
+        with self.profile_slots(tuple(profile)):
+            key = bytearray(kdf(password, salt, profile, RawEncoder))
+
+        lock_memory(key)
+        with self.lock:
+            self.derivations += 1
+            previous = self.keys.pop(fingerprint, None)
+            if previous is not None:
+                self.wipe(previous[1])
+
+            self.keys[fingerprint] = (time.monotonic() + self.ttl, key)
+
+        return bytes(key)
+
+    @staticmethod
+    def wipe(key: bytearray):
+        key[:] = bytes(len(key))
+        unlock_memory(key)
+
+    def purge(self, everything: bool = False):
+        now = time.monotonic()
+        with self.lock:
+            for fingerprint, (expires, key) in list(self.keys.items()):
+                if everything or expires <= now:
+                    self.wipe(key)
+                    del self.keys[fingerprint]
+
+
+class AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST)
+        try:
+            request = json.loads(line)
+            profile = (int(request["opslimit"]), int(request["memlimit"]))
+            key = self.server.cache.get(
+                bytes.fromhex(request["password"]),
+                bytes.fromhex(request["salt"]),
+                profile,
+            )
+            response = {"key": key.hex()}
+        except Exception as ex:  # pylint: disable=broad-exception-caught
+            metrics.count("soda_agent_requests", outcome="error")
+            response = {"error": repr(ex)}
+
+        self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+
+
+class AgentServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path: Path, ttl: float):
+        self.cache = KeyCache(ttl)
+        self.path = path
+        # The handler threads count into the metrics of the command
+        self.context = metrics.worker_context()
+        path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+        umask = os.umask(0o177)
+        try:
+            super().__init__(str(path), AgentHandler)
+        finally:
+            os.umask(umask)
+
+    def process_request_thread(self, request, client_address):
+        self.context.copy().run(super().process_request_thread, request, client_address)
+
+    def service_actions(self):
+        self.cache.purge()
+        metrics.flush()
+
+    def server_close(self):
+        super().server_close()
+        self.cache.purge(everything=True)
+        self.path.unlink(missing_ok=True)
+
+
+def request_key(path: str, password: bytes, salt: bytes, profile: tuple) -> bytes:
+    request = {
+        "password": password.hex(),
+        "salt": salt.hex(),
+        "opslimit": profile[0],
+        "memlimit": profile[1],
+    }
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as fd:
+            response = json.loads(fd.readline(MAX_REQUEST))
+
+    if "error" in response:
+        raise RuntimeError(f"Agent error: {response['error']}")
+
+    return bytes.fromhex(response["key"])
+
+
+def derive_key(password: bytes, salt: bytes, profile, out_enc: Encoder) -> bytes:
+    """Asks the agent for the key, falls back to kdf() without the agent."""
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        try:
+            with stage("agent"):
+                key = request_key(path, password, salt, profile)
+
+            return out_enc.encode(key)
+        except (OSError, RuntimeError, ValueError):
+            # No agent, or it failed, e.g. out of memory
+            pass
+
+    return kdf(password, salt, profile, out_enc)
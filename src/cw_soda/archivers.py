@@ -1,18 +1,45 @@
 import bz2
+import contextvars
+import itertools
 import lzma
+import queue
+import threading
+import time
 import zlib
+from collections.abc import Iterable, Iterator
 
-__all__ = ["archivers", "unarchivers"]
+from cw_soda.dictionaries import dictionaries, dictionary_id
+from cw_soda.header import HeaderError, pack_header, unpack_header
+from cw_soda.profiling import region
 
+__all__ = [
+    "archivers",
+    "unarchivers",
+    "stream_archivers",
+    "stream_unarchivers",
+    "compress_stream",
+    "decompress_stream",
+    "compress_auto",
+    "compress_zdict",
+    "compress_header",
+    "decompress_header",
+    "read_stream_header",
+    "chosen_compression",
+    "auto_candidates",
+]
 
+
+@region("compress:zlib")
 def compress_zlib(data: bytes) -> bytes:
     return zlib.compress(data, level=9)
 
 
+@region("compress:bz2")
 def compress_bz2(data: bytes) -> bytes:
     return bz2.compress(data, compresslevel=9)
 
 
+@region("compress:lzma")
 def compress_lzma(data: bytes) -> bytes:
     return lzma.compress(
         data,
@@ -22,32 +49,264 @@ def compress_lzma(data: bytes) -> bytes:
     )
 
 
+def compress_zlib_fast(data: bytes) -> bytes:
+    return zlib.compress(data, level=6)
+
+
+def compress_lzma_fast(data: bytes) -> bytes:
+    return lzma.compress(
+        data,
+        format=lzma.FORMAT_ALONE,
+        check=lzma.CHECK_NONE,
+        preset=6,
+    )
+
+
+def compress_lzma_small(data: bytes) -> bytes:
+    return lzma.compress(
+        data,
+        format=lzma.FORMAT_ALONE,
+        check=lzma.CHECK_NONE,
+        filters=[{"id": lzma.FILTER_LZMA1, "preset": 9, "lc": 0, "lp": 0, "pb": 0}],
+    )
+
+
+@region("compress:zdict")
+def compress_zdict(data: bytes, dictionary: bytes | None = None) -> bytes:
+    """Raw deflate with a preset dictionary, prefixed with the dictionary id."""
+    dictionary = dictionary or dictionaries.default
+    compressor = zlib.compressobj(level=9, wbits=-15, zdict=dictionary)
+    prefix = dictionary_id(dictionary).to_bytes(2, "big")
+    return prefix + compressor.compress(data) + compressor.flush()
+
+
+@region("decompress:zlib")
 def decompress_zlib(data: bytes) -> bytes:
     return zlib.decompress(data)
 
 
+@region("decompress:bz2")
 def decompress_bz2(data: bytes) -> bytes:
     return bz2.decompress(data)
 
 
+@region("decompress:lzma")
 def decompress_lzma(data: bytes) -> bytes:
     return lzma.decompress(data, format=lzma.FORMAT_ALONE)
 
 
+@region("decompress:zdict")
+def decompress_zdict(data: bytes) -> bytes:
+    if len(data) < 2:
+        raise ValueError("Missing dictionary id")
+
+    dictionary = dictionaries.get(int.from_bytes(data[:2], "big"))
+    decompressor = zlib.decompressobj(wbits=-15, zdict=dictionary)
+    result = decompressor.decompress(data[2:]) + decompressor.flush()
+    if not decompressor.eof:
+        raise ValueError("Truncated zdict data")
+
+    return result
+
+
 def noop(data):
     return data
 
 
+def compressor_zlib():
+    return zlib.compressobj(level=9)
+
+
+def compressor_bz2():
+    return bz2.BZ2Compressor(9)
+
+
+def compressor_lzma():
+    return lzma.LZMACompressor(
+        format=lzma.FORMAT_ALONE,
+        check=lzma.CHECK_NONE,
+        preset=lzma.PRESET_EXTREME,
+    )
+
+
+def decompressor_lzma():
+    return lzma.LZMADecompressor(format=lzma.FORMAT_ALONE)
+
+
+class NoopStream:
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return data
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return data
+
+    @staticmethod
+    def flush() -> bytes:
+        return b""
+
+
+# The candidate name, its compressor, and the unarchiver it needs
+auto_candidates = {
+    "zlib": (compress_zlib, "zlib"),
+    "zlib-6": (compress_zlib_fast, "zlib"),
+    "bz2": (compress_bz2, "bz2"),
+    "lzma": (compress_lzma, "lzma"),
+    "lzma-6": (compress_lzma_fast, "lzma"),
+    "lzma-text": (compress_lzma_small, "lzma"),
+    "zdict": (compress_zdict, "zdict"),
+    "raw": (noop, "raw"),
+}
+
+
+def race_candidates(data: bytes, budget: float | None) -> dict:
+    """Runs the candidates in daemon threads, returns the ones done in time."""
+    results = queue.SimpleQueue()
+
+    def run(name: str, compressor):
+        try:
+            results.put((name, compressor(data)))
+        except Exception:  # pylint: disable=broad-exception-caught
+            results.put((name, None))
+
+    # The threads see the dictionary of the command, see using_dictionary
+    for name, (compressor, _) in auto_candidates.items():
+        context = contextvars.copy_context()
+        thread = threading.Thread(
+            target=context.run, args=(run, name, compressor), daemon=True
+        )
+        thread.start()
+
+    finished = {"raw": data}
+    deadline = None if budget is None else time.monotonic() + budget
+    for _ in auto_candidates:
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        try:
+            name, compressed = results.get(timeout=timeout)
+        except queue.Empty:
+            break
+
+        if compressed is not None:
+            finished[name] = compressed
+
+    return finished
+
+
+@region("compress:auto")
+def compress_auto(data: bytes, budget: float | None = None) -> bytes:
+    """Keeps the smallest output done within the budget, seconds.
+
+    The choice is recorded in the header.
+    """
+    finished = race_candidates(data, budget)
+    name = min(finished, key=lambda n: len(finished[n]))
+    compression = auto_candidates[name][1]
+    return pack_header(compression, len(data)) + finished[name]
+
+
+def chosen_compression(compression: str, packed: bytes) -> str:
+    """The compression of the message, read from the header when auto."""
+    if compression != "auto":
+        return compression
+
+    return unpack_header(packed)[0]
+
+
+def compress_header(data: bytes, compression: str) -> bytes:
+    return pack_header(compression, len(data)) + archivers[compression](data)
+
+
+def decompress_sized(data: bytes, compression: str, length: int) -> bytes:
+    if compression == "zlib":
+        # The output buffer is allocated once
+        result = zlib.decompress(data, bufsize=max(length, 1))
+    else:
+        result = unarchivers[compression](data)
+
+    if len(result) != length:
+        raise ValueError("The length doesn't match the header")
+
+    return result
+
+
+@region("decompress:auto")
+def decompress_header(data: bytes) -> bytes:
+    compression, length, chunk_size, offset = unpack_header(data)
+    if chunk_size:
+        raise HeaderError("The message is chunked, decrypt it with --stream")
+
+    return decompress_sized(data[offset:], compression, length)
+
+
 archivers = {
     "zlib": compress_zlib,
     "bz2": compress_bz2,
     "lzma": compress_lzma,
+    "zdict": compress_zdict,
     "raw": noop,
+    "auto": compress_auto,
 }
 
 unarchivers = {
     "zlib": decompress_zlib,
     "bz2": decompress_bz2,
     "lzma": decompress_lzma,
+    "zdict": decompress_zdict,
     "raw": noop,
+    "auto": decompress_header,
 }
+
+stream_archivers = {
+    "zlib": compressor_zlib,
+    "bz2": compressor_bz2,
+    "lzma": compressor_lzma,
+    "raw": NoopStream,
+}
+
+stream_unarchivers = {
+    "zlib": zlib.decompressobj,
+    "bz2": bz2.BZ2Decompressor,
+    "lzma": decompressor_lzma,
+    "raw": NoopStream,
+}
+
+
+def compress_stream(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    compressor = stream_archivers[compression]()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+
+    data = compressor.flush()
+    if data:
+        yield data
+
+
+def read_stream_header(chunks: Iterable[bytes]) -> tuple[str, Iterator[bytes]]:
+    """Returns the compression and the chunks after the header.
+
+    The header is the first chunk of the stream.
+    """
+    chunks = iter(chunks)
+    header = next(chunks, b"")
+    compression, _, _, offset = unpack_header(header)
+    return compression, itertools.chain([header[offset:]], chunks)
+
+
+def decompress_stream(chunks: Iterable[bytes], compression: str) -> Iterator[bytes]:
+    if compression == "auto":
+        compression, chunks = read_stream_header(chunks)
+
+    decompressor = stream_unarchivers[compression]()
+    for chunk in chunks:
+        data = decompressor.decompress(chunk)
+        if data:
+            yield data
+
+    # Only zlib keeps the tail of the output until flushed
+    if hasattr(decompressor, "flush"):
+        data = decompressor.flush()
+        if data:
+            yield data
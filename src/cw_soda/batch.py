@@ -0,0 +1,136 @@
+import csv
+import json
+import os
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import click
+from nacl.encoding import Encoder
+from nacl.public import PrivateKey, PublicKey
+
+from cw_soda.archivers import archivers, chosen_compression, unarchivers
+from cw_soda.cryptography import public
+from cw_soda.encoders import encoders
+from cw_soda.io_utils import read_bytes_formatted, read_ciphertext, read_message
+from cw_soda.metrics import observe_ratio, timer, worker_context
+
+__all__ = [
+    "read_manifest",
+    "load_public_keys",
+    "recipient_key",
+    "encrypt_job",
+    "decrypt_job",
+    "run_jobs",
+]
+
+manifest_fields = ["input", "output", "recipient", "encoding", "compression"]
+
+
+def read_manifest(manifest: Path, encoding: str, compression: str) -> list:
+    """Reads the jobs from CSV (with a header row) or JSONL.
+
+    The empty encoding and compression fall back to the given defaults.
+    """
+    with manifest.open("r", encoding="utf-8", errors="strict") as fd:
+        if manifest.suffix in (".jsonl", ".json"):
+            rows = [json.loads(line) for line in fd if line.strip()]
+        else:
+            rows = list(csv.DictReader(fd))
+
+    jobs = []
+    for number, row in enumerate(rows, start=1):
+        if not row.get("input") or not row.get("recipient"):
+            raise click.BadParameter(f"Job {number}: input and recipient are required")
+
+        job = {field: row.get(field) or None for field in manifest_fields}
+        job["encoding"] = job["encoding"] or encoding
+        job["compression"] = job["compression"] or compression
+        if job["encoding"] not in encoders:
+            raise click.BadParameter(f"Job {number}: unknown encoding")
+
+        if job["compression"] not in archivers:
+            raise click.BadParameter(f"Job {number}: unknown compression")
+
+        jobs.append(job)
+
+    return jobs
+
+
+def load_public_keys(jobs: list, key_enc: Encoder) -> dict:
+    """Reads every recipient key once.
+
+    A missing or invalid key is kept as its error, so only the jobs of
+    that recipient fail, see recipient_key.
+    """
+    keys = {}
+    for job in jobs:
+        recipient = job["recipient"]
+        if recipient in keys:
+            continue
+
+        try:
+            with open(recipient, "r", encoding="utf-8", errors="strict") as fd:
+                keys[recipient] = PublicKey(read_bytes_formatted(fd, key_enc), key_enc)
+        except (OSError, ValueError, TypeError) as ex:
+            keys[recipient] = ex
+
+    return keys
+
+
+def recipient_key(public_keys: dict, job: dict) -> PublicKey:
+    key = public_keys[job["recipient"]]
+    if isinstance(key, Exception):
+        raise key
+
+    return key
+
+
+def encrypt_job(job: dict, private: PrivateKey, public_keys: dict):
+    """Returns the output, plaintext and ciphertext."""
+    data_enc = encoders[job["encoding"]]
+    archiver = archivers[job["compression"]]
+    with timer("soda_batch_job_seconds", job="encrypt"):
+        with open(job["input"], "rb") as fd:
+            plain = read_message(fd, data_enc)
+
+        data = archiver(plain)
+        encrypted = public.encrypt(
+            private, recipient_key(public_keys, job), data, data_enc
+        )
+
+    compression = chosen_compression(job["compression"], data)
+    observe_ratio(compression, len(plain), len(data))
+    return encrypted, plain, encrypted
+
+
+def decrypt_job(job: dict, private: PrivateKey, public_keys: dict):
+    """Returns the output, plaintext and ciphertext."""
+    data_enc = encoders[job["encoding"]]
+    unarchiver = unarchivers[job["compression"]]
+    with timer("soda_batch_job_seconds", job="decrypt"):
+        with open(job["input"], "rb") as fd:
+            data = read_ciphertext(fd, data_enc)
+
+        packed = public.decrypt(
+            private, recipient_key(public_keys, job), data, data_enc
+        )
+        plain = unarchiver(packed)
+
+    compression = chosen_compression(job["compression"], packed)
+    observe_ratio(compression, len(plain), len(packed))
+    return plain, plain, data
+
+
+def run_jobs(func: Callable, jobs: list, workers: int, *args) -> Iterator:
+    """Yields (job, result, error) in the order the jobs finish."""
+    workers = workers or os.cpu_count() or 1
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(worker_context().run, func, job, *args): job for job in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as ex:  # pylint: disable=broad-exception-caught
+                yield futures[future], None, ex
@@ -0,0 +1,324 @@
+import contextlib
+import io
+import math
+import multiprocessing
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+from pathlib import Path
+
+from crc import Calculator
+from nacl.encoding import RawEncoder
+from nacl.public import PrivateKey
+
+from cw_soda.archivers import archivers, unarchivers
+from cw_soda.checksums import PrefixChecksums
+from cw_soda.cryptography import public, secret
+from cw_soda.cryptography.kdf import available_memory, hash_salt, kdf
+from cw_soda.encoders import decode_bytes, encoders
+from cw_soda.error_search import checksum_calculators, checksum_configs, split_ranges
+
+__all__ = [
+    "kdf_bench",
+    "suggest_profile",
+    "generate_corpus",
+    "measure",
+    "benchmark_suites",
+    "run_benchmarks",
+]
+
+corpus_words = [
+    "CQ", "DE", "K", "KN", "AR", "SK", "BT", "TNX", "FER", "CALL", "UR", "RST",
+    "5NN", "599", "579", "NAME", "QTH", "RIG", "ANT", "WX", "HR", "ES", "OM",
+    "FB", "GM", "GA", "GE", "73", "88", "TU", "QSL", "QRZ", "QRM", "QRN", "QSB",
+    "QSY", "QRP", "QRO", "QRT", "QRL", "PSE", "AGN", "HW", "CPY", "SRI", "BK",
+    "DX", "TEST", "WATTS", "DIPOLE", "YAGI", "SUNNY", "CLOUDY", "RAIN", "TEMP",
+]  # fmt: skip
+
+
+def generate_corpus(size: int, seed: int = 0) -> bytes:
+    """A synthetic CW log: exchanges of callsigns, reports, and Q-codes."""
+    rnd = random.Random(seed)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    lines = []
+    length = 0
+    while length < size:
+        calls = [
+            rnd.choice("KNWGFDI")
+            + rnd.choice(letters)
+            + str(rnd.randrange(10))
+            + "".join(rnd.choices(letters, k=rnd.randrange(1, 4)))
+            for _ in range(2)
+        ]
+        words = rnd.choices(corpus_words, k=rnd.randrange(4, 12))
+        line = f"{calls[0]} DE {calls[1]} {' '.join(words)} {calls[0]} K\n"
+        lines.append(line)
+        length += len(line)
+
+    return "".join(lines).encode("ascii")[:size]
+
+
+def percentile(timings: list, fraction: float) -> float:
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def measure(func: Callable, size: int, repeat: int) -> dict:
+    """Runs the function repeat times, size is the processed bytes per run."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    median = statistics.median(timings)
+    return {
+        "mb_per_s": size / max(median, 1e-9) / 1e6,
+        "p50_ms": median * 1e3,
+        "p90_ms": percentile(timings, 0.9) * 1e3,
+        "p99_ms": percentile(timings, 0.99) * 1e3,
+        "runs": repeat,
+    }
+
+
+def peak_rss() -> int:
+    """The peak resident set size of the process, bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def kdf_run(profile: tuple, rounds: int) -> dict:
+    password = b"benchmark"
+    salt = hash_salt(b"benchmark")
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        kdf(password, salt, profile, RawEncoder)
+        timings.append(time.perf_counter() - start)
+
+    wall = statistics.median(timings)
+    return {
+        "opslimit": profile[0],
+        "memlimit": profile[1],
+        "wall": wall,
+        "peak_rss": peak_rss(),
+        "per_second": 1 / wall,
+    }
+
+
+def kdf_bench(profiles: dict, rounds: int) -> dict:
+    """Times every profile in a fresh process, so the peak RSS is its own."""
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for name, profile in profiles.items():
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[name] = executor.submit(kdf_run, profile, rounds).result()
+
+    return results
+
+
+def suggest_profile(results: dict, target: float) -> tuple | None:
+    """Picks the largest measured memlimit that reaches the target latency.
+
+    Argon2 time grows linearly with opslimit * memlimit, the rate is
+    fitted over all the measurements. None when nothing was measured,
+    or no memlimit fits in half the free memory.
+    """
+    if not results:
+        return None
+
+    samples = [(r["opslimit"] * r["memlimit"], r["wall"]) for r in results.values()]
+    rate = sum(x * t for x, t in samples) / sum(x * x for x, _ in samples)
+    memory = available_memory()
+    memlimits = [
+        memlimit
+        for memlimit in sorted({r["memlimit"] for r in results.values()}, reverse=True)
+        if memory is None or memlimit <= memory // 2
+    ]
+    for memlimit in memlimits:
+        opslimit = round(target / (rate * memlimit))
+        if opslimit >= 1:
+            return opslimit, memlimit
+
+    if not memlimits:
+        return None
+
+    return 1, memlimits[-1]
+
+
+def bench_encoders(corpus: bytes, repeat: int) -> dict:
+    results = {}
+    encoders.load()
+    for name, enc in encoders.items():
+        encoded = enc.encode(corpus)
+        results[f"{name}.encode"] = measure(
+            lambda e=enc: e.encode(corpus), len(corpus), repeat
+        )
+        results[f"{name}.decode"] = measure(
+            lambda e=enc, d=encoded: e.decode(d), len(corpus), repeat
+        )
+
+    return results
+
+
+def bench_archivers(corpus: bytes, repeat: int) -> dict:
+    results = {}
+    for name, archiver in archivers.items():
+        compressed = archiver(corpus)
+        unarchiver = unarchivers[name]
+        result = measure(lambda a=archiver: a(corpus), len(corpus), repeat)
+        result["ratio"] = len(compressed) / len(corpus)
+        results[f"{name}.compress"] = result
+        results[f"{name}.decompress"] = measure(
+            lambda u=unarchiver, c=compressed: u(c), len(corpus), repeat
+        )
+
+    return results
+
+
+def bench_crypto(corpus: bytes, repeat: int) -> dict:
+    alice = PrivateKey.generate()
+    bob = PrivateKey.generate()
+    key = bytes(PrivateKey.generate())
+    public_encrypted = public.encrypt(alice, bob.public_key, corpus, RawEncoder)
+    secret_encrypted = secret.encrypt(key, corpus, RawEncoder, RawEncoder)
+    size = len(corpus)
+    return {
+        "public.encrypt": measure(
+            lambda: public.encrypt(alice, bob.public_key, corpus, RawEncoder),
+            size,
+            repeat,
+        ),
+        "public.decrypt": measure(
+            lambda: public.decrypt(bob, alice.public_key, public_encrypted, RawEncoder),
+            size,
+            repeat,
+        ),
+        "secret.encrypt": measure(
+            lambda: secret.encrypt(key, corpus, RawEncoder, RawEncoder), size, repeat
+        ),
+        "secret.decrypt": measure(
+            lambda: secret.decrypt(key, secret_encrypted, RawEncoder, RawEncoder),
+            size,
+            repeat,
+        ),
+    }
+
+
+def bench_checksums(corpus: bytes, repeat: int) -> dict:
+    """The CRC backends against the crc package on the corpus groups.
+
+    The segments are the checksum tree ranges down to depth 8, rescanned
+    or derived from the prefixes.
+    """
+    groups = [corpus[i : i + 5] for i in range(0, len(corpus), 5)]
+    ranges = [
+        node for depth in range(1, 9) for node in split_ranges(len(groups), depth)
+    ]
+    size = len(corpus)
+
+    def rescan(calc):
+        for start, end in ranges:
+            calc.checksum(groups[start:end])
+
+    def prefixes(calc):
+        checksums = PrefixChecksums(calc, groups)
+        for start, end in ranges:
+            checksums.segment(start, end)
+
+    results = {}
+    for name, calc in checksum_calculators.items():
+        reference = Calculator(checksum_configs[name])
+        results[f"{name}.crc-package"] = measure(
+            lambda r=reference: r.checksum(corpus), size, repeat
+        )
+        results[f"{name}.backend"] = measure(
+            lambda c=calc: c.checksum(groups), size, repeat
+        )
+        results[f"{name}.segments-rescan"] = measure(
+            lambda c=calc: rescan(c), size, repeat
+        )
+        results[f"{name}.segments-prefix"] = measure(
+            lambda c=calc: prefixes(c), size, repeat
+        )
+
+    return results
+
+
+def bench_pipelines(corpus: bytes, repeat: int) -> dict:
+    """The CLI commands in-process, with the default options."""
+    # pylint: disable=import-outside-toplevel,cyclic-import
+    from cw_soda.commands.crypto import (
+        decrypt_cmd,
+        decrypt_secret_cmd,
+        encrypt_cmd,
+        encrypt_secret_cmd,
+    )
+
+    # The blocked encoding keeps the nonce's leading zero bytes, so every run decrypts
+    options = ["--data-encoding", "base36-blocked"]
+    commands = {
+        "encrypt": (encrypt_cmd, ["alice", "bob_pub", "message", "enc"]),
+        "decrypt": (decrypt_cmd, ["bob", "alice_pub", "enc", "dec"]),
+        "encrypt-secret": (encrypt_secret_cmd, ["alice", "message", "enc"]),
+        "decrypt-secret": (decrypt_secret_cmd, ["alice", "enc", "dec"]),
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp:
+        directory = Path(temp)
+
+        def invoke(command, files: list):
+            *inputs, output = [str(directory / name) for name in files]
+            Path(output).unlink(missing_ok=True)
+            args = [*inputs, *options, "--output-file", output]
+            # The stats are printed to stderr on every run
+            with contextlib.redirect_stderr(io.StringIO()):
+                command.main(args=args, standalone_mode=False)
+
+        (directory / "message").write_bytes(corpus)
+        for name in ("alice", "bob"):
+            key = PrivateKey.generate()
+            while bytes(key)[0] == 0 or bytes(key.public_key)[0] == 0:
+                key = PrivateKey.generate()
+
+            enc = encoders["base36"]
+            key_text = decode_bytes(key.encode(enc))
+            (directory / name).write_text(key_text, encoding="utf-8")
+            pub = decode_bytes(key.public_key.encode(enc))
+            (directory / f"{name}_pub").write_text(pub, encoding="utf-8")
+
+        for name, (command, files) in commands.items():
+            results[name] = measure(
+                lambda c=command, f=files: invoke(c, f), len(corpus), repeat
+            )
+
+    return results
+
+
+benchmark_suites = {
+    "encoders": bench_encoders,
+    "archivers": bench_archivers,
+    "crypto": bench_crypto,
+    "checksums": bench_checksums,
+    "pipelines": bench_pipelines,
+}
+
+
+def run_benchmarks(size: int, repeat: int, suites: list) -> dict:
+    corpus = generate_corpus(size)
+    return {
+        "version": version("cw-soda"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "repeat": repeat,
+        "results": {suite: benchmark_suites[suite](corpus, repeat) for suite in suites},
+    }
@@ -0,0 +1,163 @@
+import zlib
+from array import array
+from collections.abc import Iterable
+
+from crc import Configuration
+
+__all__ = ["TableCrc", "ZlibCrc32", "PrefixChecksums"]
+
+
+def reflect(value: int, width: int) -> int:
+    return int(f"{value:0{width}b}"[::-1], 2)
+
+
+class TableCrc:
+    """A table-driven CRC, a byte per lookup.
+
+    The register is kept before the final XOR, so it can be updated
+    incrementally. A reflected CRC keeps the reflected register.
+    """
+
+    def __init__(self, config: Configuration):
+        if config.reverse_input != config.reverse_output:
+            raise ValueError("Mixed reflection isn't supported")
+
+        self.width = config.width
+        self.mask = (1 << self.width) - 1
+        self.poly = config.polynomial
+        self.reflected = config.reverse_input
+        self.xorout = config.final_xor_value
+        self.init = config.init_value
+        if self.reflected:
+            self.init = reflect(self.init, self.width)
+
+        self.table = array("Q", (self.byte_register(byte) for byte in range(256)))
+        self.powers = {}
+
+    def byte_register(self, byte: int) -> int:
+        if self.reflected:
+            poly = reflect(self.poly, self.width)
+            register = byte
+            for _ in range(8):
+                register = (register >> 1) ^ (poly if register & 1 else 0)
+
+            return register
+
+        topbit = 1 << (self.width - 1)
+        register = byte << (self.width - 8) if self.width >= 8 else byte
+        for _ in range(8):
+            register = (register << 1) ^ (self.poly if register & topbit else 0)
+            register &= self.mask
+
+        return register
+
+    def update(self, register: int, data: bytes) -> int:
+        table = self.table
+        if self.reflected:
+            for byte in data:
+                register = table[(register ^ byte) & 0xFF] ^ (register >> 8)
+        else:
+            shift = self.width - 8
+            mask = self.mask
+            for byte in data:
+                index = ((register >> shift) ^ byte) & 0xFF
+                register = table[index] ^ ((register << 8) & mask)
+
+        return register
+
+    def finalize(self, register: int) -> int:
+        return register ^ self.xorout
+
+    def checksum(self, data: bytes | Iterable[bytes]) -> int:
+        """The data is bytes, or an iterable of bytes."""
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            data = [data]
+
+        register = self.init
+        for chunk in data:
+            register = self.update(register, chunk)
+
+        return self.finalize(register)
+
+    def multiply(self, a: int, b: int) -> int:
+        """The product modulo the polynomial, in the register order."""
+        if self.reflected:
+            a = reflect(a, self.width)
+            b = reflect(b, self.width)
+
+        topbit = 1 << (self.width - 1)
+        product = 0
+        for i in reversed(range(self.width)):
+            product = (product << 1) ^ (self.poly if product & topbit else 0)
+            product &= self.mask
+            if b >> i & 1:
+                product ^= a
+
+        return reflect(product, self.width) if self.reflected else product
+
+    def zeros(self, length: int) -> int:
+        """x^(8 * length) modulo the polynomial, in the register order."""
+        if length in self.powers:
+            return self.powers[length]
+
+        result = 1
+        power = 2  # x
+        if self.reflected:
+            result = reflect(result, self.width)
+            power = reflect(power, self.width)
+
+        exponent = 8 * length
+        while exponent:
+            if exponent & 1:
+                result = self.multiply(result, power)
+
+            power = self.multiply(power, power)
+            exponent >>= 1
+
+        # The segment lengths repeat, the groups are of the same size
+        self.powers[length] = result
+        return result
+
+    def shift(self, register: int, length: int) -> int:
+        """The register after length zero bytes."""
+        return self.multiply(register, self.zeros(length))
+
+    def combine(self, first: int, second: int, length: int) -> int:
+        """The checksum of A + B, from the checksums of A and B, length of B."""
+        return self.shift(first ^ self.xorout ^ self.init, length) ^ second
+
+
+class ZlibCrc32(TableCrc):
+    """CRC-32 (ISO-HDLC) in zlib, the combine math is inherited."""
+
+    def update(self, register: int, data: bytes) -> int:
+        return zlib.crc32(data, register ^ self.xorout) ^ self.xorout
+
+
+class PrefixChecksums:
+    """The registers after every chunk, in one pass.
+
+    A segment checksum is derived from two prefixes in O(log n), the
+    chunks aren't read again.
+    """
+
+    def __init__(self, crc: TableCrc, chunks: Iterable[bytes]):
+        self.crc = crc
+        self.registers = array("Q", [crc.init])
+        self.offsets = array("Q", [0])
+        register = crc.init
+        offset = 0
+        for chunk in chunks:
+            register = crc.update(register, chunk)
+            offset += len(chunk)
+            self.registers.append(register)
+            self.offsets.append(offset)
+
+    def __len__(self) -> int:
+        return len(self.registers) - 1
+
+    def segment(self, start: int, end: int) -> int:
+        """The checksum of the chunks in [start, end)."""
+        length = self.offsets[end] - self.offsets[start]
+        prefix = self.registers[start] ^ self.crc.init
+        return self.crc.finalize(self.registers[end] ^ self.crc.shift(prefix, length))
@@ -0,0 +1,40 @@
+import signal
+import sys
+from pathlib import Path
+
+import click
+
+from cw_soda.agent import SOCKET_ENV, AgentServer, default_socket
+from cw_soda.commands.common import out_path
+
+__all__ = ["agent_cmd"]
+
+
+@click.command()
+@click.argument("socket_path", type=out_path, required=False)
+@click.option("--ttl", default=900, show_default=True, help="Key lifetime, seconds")
+def agent_cmd(socket_path: Path, ttl: int):
+    """Key Agent.
+
+    Keeps the derived keys in memory, so kdf, hide-secret, and reveal-secret
+    don't re-run Argon2 for the same password, salt, and profile.
+
+    The commands use the agent when SODA_AGENT_SOCK is set.
+    """
+    try:
+        path = socket_path or default_socket()
+    except OSError as ex:
+        raise click.ClickException(str(ex)) from ex
+
+    if path.exists():
+        raise click.ClickException(f"The socket already exists: {path}")
+
+    server = AgentServer(path, ttl)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    click.echo(f"{SOCKET_ENV}={path}; export {SOCKET_ENV};")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -0,0 +1,161 @@
+import time
+from pathlib import Path
+from typing import TextIO
+
+import click
+from nacl.public import PrivateKey
+
+from cw_soda.batch import (
+    decrypt_job,
+    encrypt_job,
+    load_public_keys,
+    read_manifest,
+    run_jobs,
+)
+from cw_soda.commands.common import in_path, text_file
+from cw_soda.encoders import encoders
+from cw_soda.io_utils import (
+    StreamCounter,
+    output_conflict,
+    print_stats,
+    print_throughput,
+    read_bytes_formatted,
+    write_output,
+)
+from cw_soda.metrics import count, count_bytes
+
+__all__ = ["batch_encrypt_cmd", "batch_decrypt_cmd"]
+
+
+job_funcs = {"encrypt": encrypt_job, "decrypt": decrypt_job}
+
+
+def run_batch(
+    direction, private_key_file, manifest, workers, key_encoding, force, **defaults
+):
+    """Runs the jobs, the direction is encrypt or decrypt.
+
+    Without force, a job fails instead of asking to overwrite its output.
+    """
+    key_enc = encoders[key_encoding]
+    jobs = read_manifest(manifest, **defaults)
+    priv = read_bytes_formatted(private_key_file, key_enc)
+    priv = PrivateKey(priv, key_enc)
+    pub_keys = load_public_keys(jobs, key_enc)
+
+    plain_stat = StreamCounter()
+    cipher_stat = StreamCounter()
+    failed = 0
+    start = time.perf_counter()
+    job_func = job_funcs[direction]
+    for job, result, error in run_jobs(job_func, jobs, workers, priv, pub_keys):
+        data_enc = encoders[job["encoding"]]
+        output = job["output"] and Path(job["output"])
+        conflict = not force and output_conflict(output, data_enc)
+        if error is None and conflict:
+            error = click.ClickException(f"Needs --force: {conflict}")
+
+        if error is not None:
+            failed += 1
+            count("soda_batch_jobs", outcome="failed")
+            click.echo(f"Failed: {job['input']}: {error!r}", err=True)
+            continue
+
+        data, plain, cipher = result
+        write_output(output, data, data_enc, force=True)
+        count("soda_batch_jobs", outcome="ok")
+        if direction == "encrypt":
+            count_bytes(job["encoding"], len(plain), len(cipher))
+        else:
+            count_bytes(job["encoding"], len(cipher), len(plain))
+
+        plain_stat.length += len(plain)
+        cipher_stat.length += len(cipher)
+
+    succeeded = len(jobs) - failed
+    if succeeded:
+        print_stats(plain_stat, cipher_stat)
+
+    print_throughput(succeeded, plain_stat, time.perf_counter() - start)
+    if failed:
+        raise click.ClickException(f"{failed} of {len(jobs)} jobs failed")
+
+
+@click.command()
+@click.argument("private_key_file", type=text_file)
+@click.argument("manifest", type=in_path)
+@click.option("--key-encoding", default="base36", show_default=True)
+@click.option("--data-encoding", default="base36", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+@click.option("--workers", default=0, help="(Default: CPU count)")
+@click.option("--force", is_flag=True, help="Overwrite the output files")
+def batch_encrypt_cmd(
+    private_key_file: TextIO,
+    manifest: Path,
+    key_encoding: str,
+    data_encoding: str,
+    compression: str,
+    workers: int,
+    force: bool,
+):
+    """Encrypt Messages in batch.
+
+    Manifest: CSV with a header row, or JSONL (*.jsonl)
+
+    Fields: input, output, recipient, encoding, compression
+
+    The recipient is the public key file of the other party.
+    The empty output is printed, the empty encoding and compression
+    default to --data-encoding and --compression. A job fails if its
+    output exists or it prints binary, unless --force.
+    """
+    run_batch(
+        "encrypt",
+        private_key_file,
+        manifest,
+        workers,
+        key_encoding,
+        force,
+        encoding=data_encoding,
+        compression=compression,
+    )
+
+
+@click.command()
+@click.argument("private_key_file", type=text_file)
+@click.argument("manifest", type=in_path)
+@click.option("--key-encoding", default="base36", show_default=True)
+@click.option("--data-encoding", default="base36", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+@click.option("--workers", default=0, help="(Default: CPU count)")
+@click.option("--force", is_flag=True, help="Overwrite the output files")
+def batch_decrypt_cmd(
+    private_key_file: TextIO,
+    manifest: Path,
+    key_encoding: str,
+    data_encoding: str,
+    compression: str,
+    workers: int,
+    force: bool,
+):
+    """Decrypt Messages in batch.
+
+    Manifest: CSV with a header row, or JSONL (*.jsonl)
+
+    Fields: input, output, recipient, encoding, compression
+
+    The recipient is the public key file of the other party.
+    The empty output is printed, the empty encoding and compression
+    default to --data-encoding and --compression. A job fails if its
+    output exists or it prints binary, unless --force.
+    """
+    run_batch(
+        "decrypt",
+        private_key_file,
+        manifest,
+        workers,
+        key_encoding,
+        force,
+        encoding=data_encoding,
+        compression=compression,
+    )
@@ -0,0 +1,97 @@
+import json
+from pathlib import Path
+
+import click
+
+from cw_soda.benchmark import (
+    benchmark_suites,
+    kdf_bench,
+    run_benchmarks,
+    suggest_profile,
+)
+from cw_soda.commands.common import ByteSize, out_path
+from cw_soda.cryptography.kdf import format_profile, kdf_profiles, parse_profile
+from cw_soda.encoders import RawEncoder, encode_str
+from cw_soda.io_utils import write_output
+
+__all__ = ["kdf_bench_cmd", "bench_cmd"]
+
+# The corpus and its encodings are held in memory
+MAX_CORPUS_SIZE = 1024**3
+
+
+@click.command()
+@click.option("--ops", default="1,2,3", show_default=True, help="Custom opslimits")
+@click.option("--mem", default="64M,256M", show_default=True, help="Custom memlimits")
+@click.option("--rounds", default=1, show_default=True)
+@click.option("--target", default=1.0, show_default=True, help="Latency, seconds")
+@click.option("--no-builtin", is_flag=True, help="Skip the built-in profiles")
+def kdf_bench_cmd(ops: str, mem: str, rounds: int, target: float, no_builtin: bool):
+    """KDF Benchmark.
+
+    Times the built-in profiles and every custom OPS:MEM pair,
+    then suggests the custom profile for the target latency.
+
+    The suggested profile is accepted by --profile.
+    """
+    profiles = {} if no_builtin else dict(kdf_profiles)
+    for opslimit in filter(None, ops.split(",")):
+        for memlimit in filter(None, mem.split(",")):
+            try:
+                profile = parse_profile(f"{opslimit}:{memlimit}")
+            except ValueError as ex:
+                raise click.BadParameter(str(ex)) from ex
+
+            profiles[format_profile(profile)] = profile
+
+    if not profiles:
+        raise click.BadParameter("No profiles to measure, see --ops and --mem")
+
+    results = kdf_bench(profiles, rounds)
+    click.echo("Profile\tOps:Mem\tWall, s\tPeak RSS\tKeys/s")
+    for name, result in results.items():
+        profile = (result["opslimit"], result["memlimit"])
+        peak = result["peak_rss"] / 1024**2
+        click.echo(
+            f"{name}\t{format_profile(profile)}\t{result['wall']:.3f}\t"
+            f"{peak:.0f}M\t{result['per_second']:.2f}"
+        )
+
+    suggestion = suggest_profile(results, target)
+    if suggestion is None:
+        click.echo("No measured memlimit fits in half the free memory")
+    else:
+        click.echo(f"Suggested profile for {target}s: {format_profile(suggestion)}")
+
+
+@click.command()
+@click.option(
+    "--size",
+    type=ByteSize(MAX_CORPUS_SIZE),
+    default="64K",
+    show_default=True,
+    help="Corpus size",
+)
+@click.option("--repeat", type=click.IntRange(min=1), default=5, show_default=True)
+@click.option("--suites", default=",".join(benchmark_suites), show_default=True)
+@click.option("--output-file", type=out_path, help="(Optional)")
+def bench_cmd(size: int, repeat: int, suites: str, output_file: Path):
+    """Benchmark.
+
+    Measures MB/s and the latency percentiles on a synthetic CW log.
+
+    Suites: encoders | archivers | crypto | checksums | pipelines
+
+    The results are printed as JSON, so the runs can be compared.
+    """
+    suites = [suite for suite in suites.split(",") if suite]
+    for suite in suites:
+        if suite not in benchmark_suites:
+            raise click.BadParameter(f"Unknown suite: {suite}")
+
+    results = run_benchmarks(size, repeat, suites)
+    report = json.dumps(results, indent=2)
+    if output_file is None:
+        click.echo(report)
+    else:
+        write_output(output_file, encode_str(report), RawEncoder)
@@ -0,0 +1,96 @@
+import functools
+from pathlib import Path
+
+import click
+
+from cw_soda.header import HeaderError
+from cw_soda.timings import recording, timings_formats
+
+__all__ = [
+    "text_file",
+    "bin_file",
+    "in_path",
+    "out_path",
+    "KdfProfile",
+    "kdf_profile",
+    "ByteSize",
+    "timings_option",
+    "decompress",
+]
+
+
+text_file = click.File(mode="r", encoding="utf-8", errors="strict")
+bin_file = click.File(mode="rb")
+in_path = click.Path(dir_okay=False, readable=True, path_type=Path)
+out_path = click.Path(dir_okay=False, writable=True, path_type=Path)
+
+
+class KdfProfile(click.ParamType):
+    name = "profile"
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, tuple):
+            return value
+
+        # The KDF is imported on use, the profile is parsed by the crypto commands only
+        # pylint: disable-next=import-outside-toplevel
+        from cw_soda.cryptography.kdf import parse_profile
+
+        try:
+            return parse_profile(value)
+        except ValueError as ex:
+            self.fail(str(ex), param, ctx)
+
+
+kdf_profile = KdfProfile()
+
+size_units = {"K": 1024, "M": 1024**2}
+
+
+class ByteSize(click.ParamType):
+    """A byte count up to the maximum, e.g. 4096 or 4K."""
+
+    name = "size"
+
+    def __init__(self, maximum: int):
+        self.maximum = maximum
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+
+        text = value.strip().upper()
+        unit = size_units.get(text[-1:], 1)
+        try:
+            size = int(text[:-1] if unit > 1 else text) * unit
+        except ValueError:
+            self.fail(f"Not a size: {value}", param, ctx)
+
+        if size not in range(1, self.maximum + 1):
+            self.fail(f"The size must be 1-{self.maximum} bytes", param, ctx)
+
+        return size
+
+
+def timings_option(command):
+    """Adds --timings, the stages of the command are printed to stderr."""
+
+    @click.option(
+        "--timings",
+        type=click.Choice(timings_formats),
+        help="Print the stage timings: table | json",
+    )
+    @functools.wraps(command)
+    def wrapper(*args, timings: str | None, **kwargs):
+        with recording(timings):
+            return command(*args, **kwargs)
+
+    return wrapper
+
+
+def decompress(unarchiver, packed: bytes) -> bytes:
+    """A message without a valid header is a --compression error."""
+    try:
+        return unarchiver(packed)
+    except HeaderError as ex:
+        raise click.BadParameter(str(ex), param_hint="'--compression'") from ex
@@ -0,0 +1,491 @@
+import itertools
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, TextIO
+
+import click
+
+from cw_soda.archivers import (
+    archivers,
+    chosen_compression,
+    compress_auto,
+    compress_header,
+    compress_stream,
+    compress_zdict,
+    decompress_stream,
+    read_stream_header,
+    stream_archivers,
+    stream_unarchivers,
+    unarchivers,
+)
+from cw_soda.commands.common import (
+    ByteSize,
+    bin_file,
+    decompress,
+    in_path,
+    out_path,
+    text_file,
+    timings_option,
+)
+from cw_soda.cryptography import public, secret
+from cw_soda.cryptography import stream as secretstream
+from cw_soda.dictionaries import (
+    MAX_DICTIONARY_SIZE,
+    dictionary_id,
+    train_dictionary,
+    using_dictionary,
+)
+from cw_soda.encoders import RawEncoder, decode_bytes, encode_str, encoders
+from cw_soda.fec import add_fec, fec_alphabet
+from cw_soda.header import HeaderError, pack_header
+from cw_soda.io_utils import (
+    StreamCounter,
+    check_stream_encoding,
+    encode_stream,
+    init_keypair,
+    print_stats,
+    read_bytes_formatted,
+    read_chunks,
+    read_ciphertext,
+    read_ciphertext_stream,
+    read_message,
+    write_output,
+    write_stream,
+)
+from cw_soda.metrics import count_bytes, observe_ratio
+from cw_soda.timings import stage, timed
+
+__all__ = [
+    "train_dict_cmd",
+    "encrypt_cmd",
+    "encrypt_secret_cmd",
+    "decrypt_cmd",
+    "decrypt_secret_cmd",
+]
+
+
+def load_dictionary(dictionary_file: Path | None):
+    """Uses the --dictionary until the command ends."""
+    if dictionary_file is None:
+        return
+
+    ctx = click.get_current_context()
+    try:
+        ctx.with_resource(using_dictionary(dictionary_file.read_bytes()))
+    except ValueError as ex:
+        raise click.BadParameter(str(ex)) from ex
+
+
+def apply_fec(encrypted: bytes, data_encoding: str, fec: int) -> bytes:
+    if fec not in range(0, 256):
+        raise click.BadParameter("FEC must be 0-255 groups")
+
+    if not fec:
+        return encrypted
+
+    alphabet = fec_alphabet(data_encoding)
+    if alphabet is None:
+        raise click.BadParameter(f"FEC doesn't support {data_encoding}")
+
+    with stage("fec"):
+        return encode_str(add_fec(decode_bytes(encrypted), alphabet, fec))
+
+
+def check_stream_compression(compression: str, supported):
+    if compression not in supported:
+        raise click.BadParameter(f"Streaming doesn't support {compression}")
+
+
+def encrypt_stream(
+    key: bytes,
+    message_file: BinaryIO,
+    output_file: Path | None,
+    data_encoding: str,
+    compression: str,
+    header: bool,
+):
+    check_stream_compression(compression, stream_archivers)
+    data_enc = encoders[data_encoding]
+    plain_stat = StreamCounter()
+    packed_stat = StreamCounter()
+    cipher_stat = StreamCounter()
+    data = plain_stat.count(timed("read", read_chunks(message_file)))
+    data = packed_stat.count(timed("compress", compress_stream(data, compression)))
+    if header:
+        # The length is unknown in advance
+        data = itertools.chain(
+            [pack_header(compression, 0, secretstream.CHUNK_SIZE)], data
+        )
+
+    data = timed("encrypt", secretstream.encrypt(key, data))
+    data = cipher_stat.count(timed("encode", encode_stream(data, data_enc)))
+    with stage("write"):
+        write_stream(output_file, data, data_enc)
+
+    observe_ratio(compression, len(plain_stat), len(packed_stat))
+    count_bytes(data_encoding, len(plain_stat), len(cipher_stat))
+    print_stats(plain_stat, cipher_stat)
+
+
+def decrypt_stream(
+    key: bytes,
+    message_file: BinaryIO,
+    output_file: Path | None,
+    data_encoding: str,
+    compression: str,
+):
+    check_stream_compression(compression, [*stream_unarchivers, "auto"])
+    data_enc = encoders[data_encoding]
+    plain_stat = StreamCounter()
+    packed_stat = StreamCounter()
+    cipher_stat = StreamCounter()
+    data = read_ciphertext_stream(message_file, data_enc)
+    data = cipher_stat.count(timed("decode", data))
+    data = packed_stat.count(timed("decrypt", secretstream.decrypt(key, data)))
+    if compression == "auto":
+        try:
+            compression, data = read_stream_header(data)
+        except HeaderError as ex:
+            raise click.BadParameter(str(ex), param_hint="'--compression'") from ex
+
+    data = plain_stat.count(timed("decompress", decompress_stream(data, compression)))
+    with stage("write"):
+        write_stream(output_file, data, data_enc)
+
+    observe_ratio(compression, len(plain_stat), len(packed_stat))
+    count_bytes(data_encoding, len(cipher_stat), len(plain_stat))
+    print_stats(plain_stat, cipher_stat)
+
+
+@click.command()
+@click.argument("corpus_files", type=in_path, nargs=-1, required=True)
+@click.option("--output-file", type=out_path, required=True)
+@click.option(
+    "--size",
+    type=ByteSize(MAX_DICTIONARY_SIZE),
+    default="4K",
+    show_default=True,
+    help="Dictionary size, up to 32K",
+)
+def train_dict_cmd(corpus_files: tuple[Path], output_file: Path, size: int):
+    """Train Dictionary.
+
+    Builds a zdict dictionary from the common phrases of the corpus,
+    e.g. the sent messages. Every line is a sample.
+
+    Both sides pass the dictionary with --dictionary.
+    """
+    samples = [line for path in corpus_files for line in path.read_bytes().splitlines()]
+    dictionary = train_dictionary(samples, size)
+    if not dictionary:
+        raise click.BadParameter("The corpus has no repeated phrases")
+
+    write_output(output_file, dictionary, RawEncoder)
+    compressed = sum(len(compress_zdict(sample, dictionary)) for sample in samples)
+    builtin = sum(len(compress_zdict(sample)) for sample in samples)
+    click.echo(f"Dictionary id: {dictionary_id(dictionary):04x}", err=True)
+    click.echo(f"Dictionary size: {len(dictionary)}", err=True)
+    click.echo(f"Corpus compressed, built-in: {builtin}", err=True)
+    click.echo(f"Corpus compressed, trained: {compressed}", err=True)
+
+
+@click.command()
+@timings_option
+@click.argument("private_key_file", type=text_file)
+@click.argument("public_key_file", type=text_file)
+@click.argument("message_file", type=bin_file)
+@click.option("--output-file", type=out_path, help="(Optional)")
+@click.option("--key-encoding", default="base36", show_default=True)
+@click.option("--data-encoding", default="base36", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+@click.option("--stream", is_flag=True, help="Process the file in chunks")
+@click.option("--budget", type=float, help="Auto compression time limit, seconds")
+@click.option("--header", is_flag=True, help="Record the compression in the message")
+@click.option("--dictionary", type=in_path, help="Custom zdict dictionary")
+@click.option("--fec", default=0, show_default=True, help="Parity groups")
+def encrypt_cmd(
+    private_key_file: TextIO,
+    public_key_file: TextIO,
+    message_file: BinaryIO,
+    output_file: Path,
+    key_encoding: str,
+    data_encoding: str,
+    compression: str,
+    stream: bool,
+    budget: float | None,
+    header: bool,
+    dictionary: Path | None,
+    fec: int,
+):
+    """Encrypt Message.
+
+    Key encoding: base26 | base31 | base36 | base64 | base94
+
+    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
+
+    Blocked data encoding: base26-blocked | base31-blocked | base36-blocked |
+    base94-blocked
+
+    Compression: zlib | bz2 | lzma | zdict | raw | auto
+
+    Zdict: deflate with a preset dictionary of CW vocabulary, or the
+    --dictionary made by train-dict. The dictionary id is recorded.
+
+    Auto: compresses with every archiver in parallel and keeps the smallest
+    output, implies --header.
+
+    Header: records the compression and length in the encrypted message,
+    so it's decrypted with --compression auto.
+
+    FEC: appends the Reed-Solomon parity groups, so soda repair corrects
+    up to FEC/2 wrong groups, or FEC erased ones. Requires base26, base31,
+    or base36.
+
+    Stream: encrypts the file in chunks with constant memory,
+    requires a binary or blocked data encoding.
+    The stream format is not compatible with the default one.
+    """
+    load_dictionary(dictionary)
+    key_enc = encoders[key_encoding]
+    data_enc = encoders[data_encoding]
+    archiver = archivers[compression]
+    if compression == "auto":
+        archiver = partial(compress_auto, budget=budget)
+    elif header:
+        archiver = partial(compress_header, compression=compression)
+    if stream and fec:
+        raise click.BadParameter("Streaming doesn't support FEC")
+
+    if stream:
+        check_stream_encoding(data_enc)
+        priv, pub = init_keypair(private_key_file, public_key_file, key_enc)
+        key = public.stream_key(priv, pub)
+        encrypt_stream(
+            key, message_file, output_file, data_encoding, compression, header
+        )
+        return
+
+    data = data_stat = read_message(message_file, data_enc)
+    with stage("compress"):
+        data = archiver(data)
+
+    observe_ratio(chosen_compression(compression, data), len(data_stat), len(data))
+
+    priv, pub = init_keypair(private_key_file, public_key_file, key_enc)
+    encrypted = public.encrypt(priv, pub, data, data_enc)
+    encrypted = apply_fec(encrypted, data_encoding, fec)
+    write_output(output_file, encrypted, data_enc)
+    count_bytes(data_encoding, len(data_stat), len(encrypted))
+    print_stats(data_stat, encrypted, fec and fec + 1)
+
+
+@click.command()
+@timings_option
+@click.argument("key_file", type=text_file)
+@click.argument("message_file", type=bin_file)
+@click.option("--output-file", type=out_path, help="(Optional)")
+@click.option("--key-encoding", default="base36", show_default=True)
+@click.option("--data-encoding", default="base36", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+@click.option("--stream", is_flag=True, help="Process the file in chunks")
+@click.option("--budget", type=float, help="Auto compression time limit, seconds")
+@click.option("--header", is_flag=True, help="Record the compression in the message")
+@click.option("--dictionary", type=in_path, help="Custom zdict dictionary")
+@click.option("--fec", default=0, show_default=True, help="Parity groups")
+def encrypt_secret_cmd(
+    key_file: TextIO,
+    message_file: BinaryIO,
+    output_file: Path,
+    key_encoding: str,
+    data_encoding: str,
+    compression: str,
+    stream: bool,
+    budget: float | None,
+    header: bool,
+    dictionary: Path | None,
+    fec: int,
+):
+    """Encrypt Message (symmetric).
+
+    Key encoding: base26 | base31 | base36 | base64 | base94
+
+    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
+
+    Blocked data encoding: base26-blocked | base31-blocked | base36-blocked |
+    base94-blocked
+
+    Compression: zlib | bz2 | lzma | zdict | raw | auto
+
+    Zdict: deflate with a preset dictionary of CW vocabulary, or the
+    --dictionary made by train-dict. The dictionary id is recorded.
+
+    Auto: compresses with every archiver in parallel and keeps the smallest
+    output, implies --header.
+
+    Header: records the compression and length in the encrypted message,
+    so it's decrypted with --compression auto.
+
+    FEC: appends the Reed-Solomon parity groups, so soda repair corrects
+    up to FEC/2 wrong groups, or FEC erased ones. Requires base26, base31,
+    or base36.
+
+    Stream: encrypts the file in chunks with constant memory,
+    requires a binary or blocked data encoding.
+    The stream format is not compatible with the default one.
+    """
+    load_dictionary(dictionary)
+    key_enc = encoders[key_encoding]
+    data_enc = encoders[data_encoding]
+    archiver = archivers[compression]
+    if compression == "auto":
+        archiver = partial(compress_auto, budget=budget)
+    elif header:
+        archiver = partial(compress_header, compression=compression)
+    if stream and fec:
+        raise click.BadParameter("Streaming doesn't support FEC")
+
+    if stream:
+        check_stream_encoding(data_enc)
+        key = key_enc.decode(read_bytes_formatted(key_file, key_enc))
+        encrypt_stream(
+            key, message_file, output_file, data_encoding, compression, header
+        )
+        return
+
+    data = data_stat = read_message(message_file, data_enc)
+    with stage("compress"):
+        data = archiver(data)
+
+    observe_ratio(chosen_compression(compression, data), len(data_stat), len(data))
+
+    key = read_bytes_formatted(key_file, key_enc)
+    encrypted = secret.encrypt(key, data, key_enc, data_enc)
+    encrypted = apply_fec(encrypted, data_encoding, fec)
+    write_output(output_file, encrypted, data_enc)
+    count_bytes(data_encoding, len(data_stat), len(encrypted))
+    print_stats(data_stat, encrypted, fec and fec + 1)
+
+
+@click.command()
+@timings_option
+@click.argument("private_key_file", type=text_file)
+@click.argument("public_key_file", type=text_file)
+@click.argument("message_file", type=bin_file)
+@click.option("--output-file", type=out_path, help="(Optional)")
+@click.option("--key-encoding", default="base36", show_default=True)
+@click.option("--data-encoding", default="base36", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+@click.option("--stream", is_flag=True, help="Process the file in chunks")
+@click.option("--dictionary", type=in_path, help="Custom zdict dictionary")
+def decrypt_cmd(
+    private_key_file: TextIO,
+    public_key_file: TextIO,
+    message_file: BinaryIO,
+    output_file: Path,
+    key_encoding: str,
+    data_encoding: str,
+    compression: str,
+    stream: bool,
+    dictionary: Path | None,
+):
+    """Decrypt Message.
+
+    Key encoding: base26 | base31 | base36 | base64 | base94
+
+    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
+
+    Blocked data encoding: base26-blocked | base31-blocked | base36-blocked |
+    base94-blocked
+
+    Compression: zlib | bz2 | lzma | zdict | raw | auto
+
+    Zdict: deflate with a preset dictionary of CW vocabulary, or the
+    --dictionary made by train-dict. The dictionary id is recorded.
+
+    Auto: reads the compression from the message header.
+
+    Stream: decrypts the file in chunks with constant memory,
+    requires a binary or blocked data encoding.
+    """
+    load_dictionary(dictionary)
+    key_enc = encoders[key_encoding]
+    data_enc = encoders[data_encoding]
+    unarchiver = unarchivers[compression]
+    if stream:
+        check_stream_encoding(data_enc)
+        priv, pub = init_keypair(private_key_file, public_key_file, key_enc)
+        key = public.stream_key(priv, pub)
+        decrypt_stream(key, message_file, output_file, data_encoding, compression)
+        return
+
+    data = data_stat = read_ciphertext(message_file, data_enc)
+    priv, pub = init_keypair(private_key_file, public_key_file, key_enc)
+    packed = public.decrypt(priv, pub, data, data_enc)
+    with stage("decompress"):
+        plain = decompress(unarchiver, packed)
+
+    observe_ratio(chosen_compression(compression, packed), len(plain), len(packed))
+    write_output(output_file, plain, data_enc)
+    count_bytes(data_encoding, len(data_stat), len(plain))
+    print_stats(plain, data_stat)
+
+
+@click.command()
+@timings_option
+@click.argument("key_file", type=text_file)
+@click.argument("message_file", type=bin_file)
+@click.option("--output-file", type=out_path, help="(Optional)")
+@click.option("--key-encoding", default="base36", show_default=True)
+@click.option("--data-encoding", default="base36", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+@click.option("--stream", is_flag=True, help="Process the file in chunks")
+@click.option("--dictionary", type=in_path, help="Custom zdict dictionary")
+def decrypt_secret_cmd(
+    key_file: TextIO,
+    message_file: BinaryIO,
+    output_file: Path,
+    key_encoding: str,
+    data_encoding: str,
+    compression: str,
+    stream: bool,
+    dictionary: Path | None,
+):
+    """Decrypt Message (symmetric).
+
+    Key encoding: base26 | base31 | base36 | base64 | base94
+
+    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
+
+    Blocked data encoding: base26-blocked | base31-blocked | base36-blocked |
+    base94-blocked
+
+    Compression: zlib | bz2 | lzma | zdict | raw | auto
+
+    Zdict: deflate with a preset dictionary of CW vocabulary, or the
+    --dictionary made by train-dict. The dictionary id is recorded.
+
+    Auto: reads the compression from the message header.
+
+    Stream: decrypts the file in chunks with constant memory,
+    requires a binary or blocked data encoding.
+    """
+    load_dictionary(dictionary)
+    key_enc = encoders[key_encoding]
+    data_enc = encoders[data_encoding]
+    unarchiver = unarchivers[compression]
+    if stream:
+        check_stream_encoding(data_enc)
+        key = key_enc.decode(read_bytes_formatted(key_file, key_enc))
+        decrypt_stream(key, message_file, output_file, data_encoding, compression)
+        return
+
+    data = data_stat = read_ciphertext(message_file, data_enc)
+    key = read_bytes_formatted(key_file, key_enc)
+    packed = secret.decrypt(key, data, key_enc, data_enc)
+    with stage("decompress"):
+        plain = decompress(unarchiver, packed)
+
+    observe_ratio(chosen_compression(compression, packed), len(plain), len(packed))
+    write_output(output_file, plain, data_enc)
+    count_bytes(data_encoding, len(data_stat), len(plain))
+    print_stats(plain, data_stat)
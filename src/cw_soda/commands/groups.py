@@ -0,0 +1,174 @@
+from pathlib import Path
+from typing import TextIO
+
+import click
+
+from cw_soda.commands.common import out_path, text_file
+from cw_soda.encoders import encode_str, encoders
+from cw_soda.error_search import (
+    ChecksumTree,
+    checksum_calculators,
+    checksum_widths,
+    error_search,
+    grid_parity,
+    parity_search,
+)
+from cw_soda.fec import fec_alphabet, repair
+from cw_soda.format_table import format_table
+from cw_soda.io_utils import (
+    break_into_groups,
+    format_cw_input,
+    read_groups,
+    read_str,
+    remove_whitespace,
+    write_lines,
+    write_output,
+)
+
+__all__ = ["repair_cmd", "digest_cmd", "find_error_cmd"]
+
+
+def parse_parity(text: str | None, width: int) -> list | None:
+    """The checksums separated by whitespace."""
+    if text is None:
+        return None
+
+    return [f"{int(value, 16):0{width * 2}X}" for value in text.split()]
+
+
+@click.command()
+@click.argument("message_file", type=text_file)
+@click.option("--fec", default=2, show_default=True, help="Parity groups")
+@click.option("--data-encoding", default="base36", show_default=True)
+@click.option("--output-file", type=out_path, help="(Optional)")
+def repair_cmd(message_file: TextIO, fec: int, data_encoding: str, output_file: Path):
+    """Repair Message.
+
+    Corrects the wrong and erased groups with the FEC parity, and removes
+    the FEC groups, so the message can be decrypted.
+
+    Mark an unreadable group with ?, e.g. AB?DE, an erased group takes
+    half the parity of a wrong one.
+
+    Data encoding: base26 | base31 | base36 | base26-blocked |
+    base31-blocked | base36-blocked
+    """
+    # Without parity the tweak group would be taken from the message
+    if fec not in range(1, 256):
+        raise click.BadParameter("FEC must be 1-255 groups")
+
+    alphabet = fec_alphabet(data_encoding)
+    if alphabet is None:
+        raise click.BadParameter(f"FEC doesn't support {data_encoding}")
+
+    text = format_cw_input(read_str(message_file))
+    try:
+        message, corrected = repair(text, alphabet, fec)
+    except ValueError as ex:
+        raise click.ClickException(str(ex)) from ex
+
+    if corrected:
+        numbers = ", ".join(str(i + 1) for i in corrected)
+        click.echo(f"Corrected groups: {numbers}", err=True)
+    else:
+        click.echo("The file is correct", err=True)
+
+    write_output(output_file, encode_str(message), encoders[data_encoding])
+
+
+@click.command()
+@click.argument("message_file", type=text_file)
+@click.option("--checksum", default="crc8", show_default=True)
+@click.option("--depth", default=3, show_default=True, help="Tree levels")
+def digest_cmd(message_file: TextIO, checksum: str, depth: int):
+    """Checksum Digest.
+
+    Prints the checksum tree level for find-error --digest. It's sent
+    once, instead of confirming the checksums one by one.
+
+    A level has up to 2^depth checksums, the deeper level narrows the
+    error down to fewer groups.
+
+    Checksum: crc8 | crc16 | crc32 | crc32-iso
+    """
+    groups = click.get_current_context().with_resource(read_groups(message_file))
+    tree = ChecksumTree(
+        groups, checksum_calculators[checksum], checksum_widths[checksum]
+    )
+    click.echo(" ".join(break_into_groups(tree.digest(depth))))
+
+
+@click.command()
+@click.argument("message_file", type=text_file)
+@click.option("--checksum", default="crc8", show_default=True)
+@click.option("--digest", help="The sender's digest")
+@click.option("--single", is_flag=True, help="Stop at the first error")
+@click.option("--row-parity", help="The sender's row checksums")
+@click.option("--column-parity", help="The sender's column checksums")
+@click.option("--output-format", default="fixed", show_default=True)
+@click.option("--column-height", default=10, show_default=True)
+@click.option("--no-header", is_flag=True)
+@click.option("--output-file", type=out_path, help="(Optional)")
+@click.option("--pager", is_flag=True, help="Page the table")
+def find_error_cmd(
+    message_file: TextIO,
+    checksum: str,
+    digest: str | None,
+    single: bool,
+    row_parity: str | None,
+    column_parity: str | None,
+    output_format: str,
+    column_height: int,
+    no_header: bool,
+    output_file: Path,
+    pager: bool,
+):
+    """Find Error.
+
+    This only works with Base26, Base31, and Base36.
+
+    Checksum: crc8 | crc16 | crc32 | crc32-iso
+
+    Finds every wrong group in one session. Single: assumes one error,
+    which takes fewer questions.
+
+    Digest: compares the checksum tree with the sender's digest, without
+    the questions.
+
+    Row and column parity: compares the checksums from print --parity,
+    the error is where the wrong row and column cross.
+
+    Output format: fixed | csv
+    """
+    add_header = not no_header
+    calc = checksum_calculators[checksum]
+    groups = click.get_current_context().with_resource(read_groups(message_file))
+    width = checksum_widths[checksum]
+    parity = None
+    try:
+        if digest is not None:
+            tree = ChecksumTree(groups, calc, width)
+            errors = tree.compare(remove_whitespace(digest).upper())
+        elif row_parity is not None or column_parity is not None:
+            parity = grid_parity(groups, calc, width, column_height)
+            remote_rows = parse_parity(row_parity, width)
+            remote_columns = parse_parity(column_parity, width)
+            found = parity_search(groups, parity, remote_rows, remote_columns)
+            errors = [(i, i + 1) for i in found]
+        else:
+            errors = [(i, i + 1) for i in error_search(groups, calc, single)]
+    except ValueError as ex:
+        raise click.BadParameter(str(ex)) from ex
+
+    if not errors:
+        click.echo("The file is correct")
+    else:
+        highlight = set()
+        for start, end in errors:
+            click.echo(f"The error is in: {' '.join(groups[start:end])}")
+            highlight.update(range(start, end))
+
+        table = format_table(
+            groups, output_format, column_height, add_header, highlight, parity
+        )
+        write_lines(output_file, table, pager)
@@ -0,0 +1,65 @@
+from typing import TextIO
+
+import click
+from nacl.public import PrivateKey
+
+from cw_soda.agent import derive_key
+from cw_soda.commands.common import kdf_profile, text_file, timings_option
+from cw_soda.encoders import decode_bytes, encoders
+from cw_soda.io_utils import get_salt, read_bytes, read_bytes_formatted
+
+__all__ = ["genkey_cmd", "pubkey_cmd", "kdf_cmd"]
+
+
+@click.command()
+@click.option("--encoding", default="base36", show_default=True)
+def genkey_cmd(encoding: str):
+    """Key Generator.
+
+    Encoding: base26 | base31 | base36 | base64 | base94
+    """
+    enc = encoders[encoding]
+    key = PrivateKey.generate().encode(enc)
+    click.echo(decode_bytes(key))
+
+
+@click.command()
+@click.argument("private_key_file", type=text_file)
+@click.option("--encoding", default="base36", show_default=True)
+def pubkey_cmd(private_key_file: TextIO, encoding: str):
+    """Get Public Key.
+
+    Encoding: base26 | base31 | base36 | base64 | base94
+    """
+    enc = encoders[encoding]
+    pk = read_bytes_formatted(private_key_file, enc)
+    pk = PrivateKey(pk, enc)
+    pub = pk.public_key.encode(enc)
+    click.echo(decode_bytes(pub))
+
+
+@click.command()
+@timings_option
+@click.argument("password_file", type=text_file)
+@click.argument("salt_file", type=text_file)
+@click.option("--encoding", default="base36", show_default=True)
+@click.option("--profile", type=kdf_profile, default="interactive", show_default=True)
+@click.option("--raw-salt", is_flag=True, help="Decode the salt as bytes")
+def kdf_cmd(
+    password_file: TextIO,
+    salt_file: TextIO,
+    encoding: str,
+    profile: tuple,
+    raw_salt: bool,
+):
+    """Key Derivation Function.
+
+    Encoding: base26 | base31 | base36 | base64 | base94
+
+    Profile: interactive | moderate | sensitive | OPS:MEM (e.g. 3:256M)
+    """
+    enc = encoders[encoding]
+    password = read_bytes(password_file)
+    salt = get_salt(salt_file, raw_salt, enc)
+    key = derive_key(password, salt, profile, enc)
+    click.echo(decode_bytes(key))
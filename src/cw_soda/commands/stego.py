@@ -0,0 +1,200 @@
+from pathlib import Path
+
+import click
+from steganon import LSB_MWS, Image
+
+from cw_soda.agent import derive_key
+from cw_soda.archivers import archivers, chosen_compression, unarchivers
+from cw_soda.commands.common import (
+    decompress,
+    in_path,
+    kdf_profile,
+    out_path,
+    timings_option,
+)
+from cw_soda.cryptography import secret
+from cw_soda.cryptography.kdf import hash_salt, kdf_many
+from cw_soda.encoders import RawEncoder
+from cw_soda.io_utils import read_arg_groups, read_bytes
+from cw_soda.metrics import observe_ratio
+from cw_soda.stego import carrier_capacity, check_carrier, sealed_size
+from cw_soda.timings import stage
+
+__all__ = ["hide_secret_cmd", "stego_plan_cmd", "reveal_secret_cmd"]
+
+
+def compress_payloads(files: list, archiver, compression: str) -> list:
+    packed = []
+    for path in files:
+        with stage("read"):
+            data = path.read_bytes()
+
+        with stage("compress"):
+            packed.append(archiver(data))
+
+        observe_ratio(
+            chosen_compression(compression, packed[-1]), len(data), len(packed[-1])
+        )
+
+    return packed
+
+
+def preflight(image: Image.Image, packed: list) -> int:
+    """Checks the image holds the payloads, returns the capacity."""
+    capacity = carrier_capacity(*image.size, len(packed))
+    payloads = [sealed_size(len(data)) for data in packed]
+    try:
+        check_carrier(len(image.getbands()), capacity, payloads)
+    except ValueError as ex:
+        raise click.ClickException(str(ex)) from ex
+
+    return capacity
+
+
+@click.command()
+@timings_option
+@click.argument("input_image", type=in_path)
+@click.argument("output_image", type=out_path)
+@click.argument("files", type=in_path, nargs=-1)
+@click.option("--profile", type=kdf_profile, default="interactive", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+def hide_secret_cmd(
+    input_image: Path,
+    output_image: Path,
+    files: tuple[Path],
+    profile: tuple,
+    compression: str,
+):
+    """Hide Data (symmetric).
+
+    Files: seed password salt plaintext [seed password salt plaintext]...
+
+    Profile: interactive | moderate | sensitive | OPS:MEM (e.g. 3:256M)
+
+    Compression: zlib | bz2 | lzma | zdict | raw | auto
+
+    The payloads are compressed and checked against the image capacity
+    before the keys are derived.
+    """
+    archiver = archivers[compression]
+
+    args = read_arg_groups(files, 4)
+    packed = compress_payloads([group[3] for group in args], archiver, compression)
+    image = Image.open(input_image)
+    preflight(image, packed)
+    if output_image.exists():
+        click.confirm(
+            f"Overwrite the output file? ({output_image})", default=False, abort=True
+        )
+
+    seeds = [read_bytes(group[0]) for group in args]
+    passwords = [read_bytes(group[1]) for group in args]
+    hashes = [hash_salt(read_bytes(group[2])) for group in args]
+    keys = kdf_many(passwords, hashes, profile, RawEncoder, derive_key)
+    encrypted = [
+        secret.encrypt(key, data, RawEncoder, RawEncoder)
+        for key, data in zip(keys, packed)
+    ]
+
+    with stage("hide"):
+        lsb_mws = LSB_MWS(image, seeds)
+        groups = len(args)
+        for i in range(groups):
+            lsb_mws.hide(encrypted[i])
+            if i < groups - 1:
+                lsb_mws.next()
+
+        lsb_mws.finalize()
+
+    with stage("write"):
+        image.save(output_image)
+
+
+@click.command()
+@click.argument("input_image", type=in_path)
+@click.argument("files", type=in_path, nargs=-1, required=True)
+@click.option("--compression", default="zlib", show_default=True)
+def stego_plan_cmd(input_image: Path, files: tuple[Path], compression: str):
+    """Plan Hiding Data.
+
+    Files: plaintext [plaintext]...
+
+    Prints the image capacity for a seed per file, the payload sizes,
+    and the headroom, without deriving the keys.
+
+    Compression: zlib | bz2 | lzma | zdict | raw | auto
+    """
+    archiver = archivers[compression]
+    packed = compress_payloads(files, archiver, compression)
+    image = Image.open(input_image)
+    width, height = image.size
+    capacity = carrier_capacity(width, height, len(files))
+    click.echo(f"Image: {width}x{height} {image.mode}")
+    click.echo(f"Seeds: {len(files)}")
+    click.echo(f"Capacity: {capacity}")
+    click.echo(f"{'File':<24}{'Plaintext':>11}{'Compressed':>12}{'Payload':>9}")
+    for path, data in zip(files, packed):
+        click.echo(
+            f"{path.name[:23]:<24}{path.stat().st_size:>11}"
+            f"{len(data):>12}{sealed_size(len(data)):>9}"
+        )
+
+    total = sum(sealed_size(len(data)) for data in packed)
+    click.echo(f"Total payload: {total}")
+    click.echo(f"Headroom: {capacity - total}")
+    preflight(image, packed)
+
+
+@click.command()
+@timings_option
+@click.argument("input_image", type=in_path)
+@click.argument("files", type=in_path, nargs=-1)
+@click.option("--profile", type=kdf_profile, default="interactive", show_default=True)
+@click.option("--compression", default="zlib", show_default=True)
+def reveal_secret_cmd(
+    input_image: Path,
+    files: tuple[Path],
+    profile: tuple,
+    compression: str,
+):
+    """Reveal Data (symmetric).
+
+    Files: seed password salt output [seed password salt output]...
+
+    Profile: interactive | moderate | sensitive | OPS:MEM (e.g. 3:256M)
+
+    Compression: zlib | bz2 | lzma | zdict | raw | auto
+    """
+    unarchiver = unarchivers[compression]
+
+    args = read_arg_groups(files, 4)
+    seeds = [read_bytes(group[0]) for group in args]
+    passwords = [read_bytes(group[1]) for group in args]
+    hashes = [hash_salt(read_bytes(group[2])) for group in args]
+    keys = kdf_many(passwords, hashes, profile, RawEncoder, derive_key)
+    outputs = [group[3] for group in args]
+
+    with stage("reveal"):
+        image = Image.open(input_image)
+        lsb_mws = LSB_MWS(image, seeds)
+
+    groups = len(args)
+    for i in range(groups):
+        with stage("reveal"):
+            encrypted = lsb_mws.extract()
+            if i < groups - 1:
+                lsb_mws.next()
+
+        packed = secret.decrypt(keys[i], encrypted, RawEncoder, RawEncoder)
+        with stage("decompress"):
+            data = decompress(unarchiver, packed)
+
+        observe_ratio(chosen_compression(compression, packed), len(data), len(packed))
+
+        if outputs[i].exists():
+            click.confirm(
+                f"Overwrite the output file? ({outputs[i]})", default=False, abort=True
+            )
+
+        with stage("write"):
+            outputs[i].write_bytes(data)
@@ -0,0 +1,59 @@
+from pathlib import Path
+from typing import TextIO
+
+import click
+
+from cw_soda.commands.common import out_path, text_file
+from cw_soda.format_table import format_table
+from cw_soda.io_utils import read_groups, write_lines
+
+__all__ = ["print_cmd"]
+
+
+@click.command()
+@click.argument("message_file", type=text_file)
+@click.option("--output-format", default="fixed", show_default=True)
+@click.option("--column-height", default=10, show_default=True)
+@click.option("--no-header", is_flag=True)
+@click.option("--parity", is_flag=True, help="Add the row and column checksums")
+@click.option("--checksum", default="crc8", show_default=True)
+@click.option("--output-file", type=out_path, help="(Optional)")
+@click.option("--pager", is_flag=True, help="Page the table")
+def print_cmd(
+    message_file: TextIO,
+    output_format: str,
+    column_height: int,
+    no_header: bool,
+    parity: bool,
+    checksum: str,
+    output_file: Path,
+    pager: bool,
+):
+    """Print Table.
+
+    This only works with Base26, Base31, and Base36.
+
+    Output format: fixed | csv
+
+    Parity: adds the checksum of every row and column, the receiver passes
+    them to find-error --row-parity and --column-parity.
+
+    Checksum: crc8 | crc16 | crc32 | crc32-iso
+    """
+    add_header = not no_header
+    groups = click.get_current_context().with_resource(read_groups(message_file))
+    lines = None
+    if parity:
+        # The checksums are imported on use, the plain table starts faster
+        # pylint: disable-next=import-outside-toplevel
+        from cw_soda.error_search import (
+            checksum_calculators,
+            checksum_widths,
+            grid_parity,
+        )
+
+        calc = checksum_calculators[checksum]
+        lines = grid_parity(groups, calc, checksum_widths[checksum], column_height)
+
+    table = format_table(groups, output_format, column_height, add_header, parity=lines)
+    write_lines(output_file, table, pager)
@@ -1,18 +1,41 @@
+import os
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
 from nacl.encoding import Encoder, RawEncoder
 from nacl.hash import blake2b
 from nacl.public import PrivateKey
 from nacl.pwhash import argon2id
 from nacl.pwhash.argon2id import (
     MEMLIMIT_INTERACTIVE,
+    MEMLIMIT_MAX,
+    MEMLIMIT_MIN,
     MEMLIMIT_MODERATE,
     MEMLIMIT_SENSITIVE,
     OPSLIMIT_INTERACTIVE,
+    OPSLIMIT_MAX,
+    OPSLIMIT_MIN,
     OPSLIMIT_MODERATE,
     OPSLIMIT_SENSITIVE,
     SALTBYTES,
 )
 
-__all__ = ["kdf", "kdf_profiles", "hash_salt", "align_salt"]
+from cw_soda.metrics import count, timer, worker_context
+from cw_soda.timings import stage
+
+__all__ = [
+    "kdf",
+    "kdf_many",
+    "kdf_workers",
+    "available_memory",
+    "kdf_profiles",
+    "parse_profile",
+    "format_profile",
+    "parse_memlimit",
+    "format_memlimit",
+    "hash_salt",
+    "align_salt",
+]
 
 kdf_profiles = {
     "interactive": (OPSLIMIT_INTERACTIVE, MEMLIMIT_INTERACTIVE),
@@ -20,9 +43,102 @@ kdf_profiles = {
     "sensitive": (OPSLIMIT_SENSITIVE, MEMLIMIT_SENSITIVE),
 }
 
+memlimit_units = {"K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_memlimit(value: str) -> int:
+    value = value.strip().upper()
+    unit = memlimit_units.get(value[-1:], 1)
+    if unit > 1:
+        value = value[:-1]
+
+    return int(value) * unit
+
+
+def format_memlimit(memlimit: int) -> str:
+    for suffix, unit in reversed(memlimit_units.items()):
+        if memlimit % unit == 0:
+            return f"{memlimit // unit}{suffix}"
+
+    return str(memlimit)
+
+
+def parse_profile(value: str) -> tuple:
+    """A profile name, or the custom OPS:MEM pair, e.g. 3:256M."""
+    if value in kdf_profiles:
+        return kdf_profiles[value]
+
+    ops, sep, mem = value.partition(":")
+    if not sep:
+        raise ValueError(f"Unknown profile: {value}")
+
+    ops = int(ops)
+    mem = parse_memlimit(mem)
+    if not OPSLIMIT_MIN <= ops <= OPSLIMIT_MAX:
+        raise ValueError(f"The opslimit is out of range: {ops}")
+
+    if not MEMLIMIT_MIN <= mem <= MEMLIMIT_MAX:
+        raise ValueError(f"The memlimit is out of range: {mem}")
+
+    return ops, mem
+
+
+def format_profile(profile) -> str:
+    return f"{profile[0]}:{format_memlimit(profile[1])}"
+
 
 def kdf(password: bytes, salt: bytes, profile, out_enc: Encoder) -> bytes:
-    return argon2id.kdf(PrivateKey.SIZE, password, salt, *profile, encoder=out_enc)
+    labels = {"profile": format_profile(profile)}
+    with stage("kdf"), timer("soda_kdf_seconds", **labels):
+        key = argon2id.kdf(PrivateKey.SIZE, password, salt, *profile, encoder=out_enc)
+
+    count("soda_kdf_derivations", **labels)
+    return key
+
+
+def available_memory() -> int | None:
+    """MemAvailable on Linux, the free physical memory elsewhere."""
+    try:
+        with open("/proc/meminfo", "r", encoding="ascii") as fd:
+            for line in fd:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def kdf_workers(jobs: int, profile, memory: int | None = None) -> int:
+    """Caps the concurrent derivations by the CPUs and 80% of the free RAM."""
+    workers = min(jobs, os.cpu_count() or 1)
+    memory = available_memory() if memory is None else memory
+    if memory is not None:
+        workers = min(workers, memory * 4 // 5 // profile[1])
+
+    return max(1, workers)
+
+
+def kdf_many(
+    passwords: list,
+    salts: list,
+    profile,
+    out_enc: Encoder,
+    derive: Callable = kdf,
+) -> list:
+    """Derives the keys concurrently, libsodium releases the GIL."""
+    workers = kdf_workers(len(passwords), profile)
+    with stage("kdf"), ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                worker_context().run, derive, password, salt, profile, out_enc
+            )
+            for password, salt in zip(passwords, salts)
+        ]
+        return [future.result() for future in futures]
 
 
 def hash_salt(salt: bytes) -> bytes:
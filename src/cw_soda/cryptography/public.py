@@ -1,14 +1,103 @@
-from nacl.encoding import Encoder
+import threading
+from collections import OrderedDict
+
+from nacl.encoding import Encoder, RawEncoder
+from nacl.exceptions import CryptoError
+from nacl.hash import blake2b
 from nacl.public import Box, PrivateKey, PublicKey
 
-__all__ = ["encrypt", "decrypt"]
+from cw_soda.metrics import count
+from cw_soda.timings import stage
+
+__all__ = ["encrypt", "decrypt", "stream_key", "SharedKeyCache", "shared_keys"]
+
+
+def zeroize(buffer: bytearray):
+    buffer[:] = bytes(len(buffer))
+
+
+class SharedKeyCache:
+    """Bounded LRU of the precomputed Box keys, keyed by the keypair fingerprint.
+
+    Building a Box costs a Curve25519 scalar multiplication, the cached Box is
+    restored from its shared key. The evicted keys are overwritten with zeros.
+    The cache is thread-safe, so the batch workers can share it.
+    """
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self.keys = OrderedDict()
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def fingerprint(private: PrivateKey, public: PublicKey) -> bytes:
+        return blake2b(
+            bytes(private) + bytes(public),
+            digest_size=16,
+            person=b"cw-soda-box",
+            encoder=RawEncoder,
+        )
+
+    def box(self, private: PrivateKey, public: PublicKey) -> Box:
+        fingerprint = self.fingerprint(private, public)
+        with self.lock:
+            shared_key = self.keys.get(fingerprint)
+            if shared_key is not None:
+                self.keys.move_to_end(fingerprint)
+                return Box.decode(bytes(shared_key))
+
+        box = Box(private, public)
+        with self.lock:
+            previous = self.keys.pop(fingerprint, None)
+            if previous is not None:
+                zeroize(previous)
+
+            self.keys[fingerprint] = bytearray(box.shared_key())
+            while len(self.keys) > self.maxsize:
+                _, evicted = self.keys.popitem(last=False)
+                zeroize(evicted)
+
+        return box
+
+    def clear(self):
+        with self.lock:
+            for shared_key in self.keys.values():
+                zeroize(shared_key)
+
+            self.keys.clear()
+
+
+shared_keys = SharedKeyCache()
 
 
 def encrypt(private: PrivateKey, public: PublicKey, data: bytes, out_enc: Encoder):
-    box = Box(private, public)
-    return box.encrypt(data, encoder=out_enc)
+    with stage("encrypt"):
+        box = shared_keys.box(private, public)
+        encrypted = box.encrypt(data)
+
+    with stage("encode"):
+        return out_enc.encode(bytes(encrypted))
 
 
 def decrypt(private: PrivateKey, public: PublicKey, data: bytes, in_enc: Encoder):
-    box = Box(private, public)
-    return box.decrypt(data, encoder=in_enc)
+    with stage("decode"):
+        data = in_enc.decode(data)
+
+    with stage("decrypt"):
+        box = shared_keys.box(private, public)
+        try:
+            return box.decrypt(data)
+        except CryptoError:
+            count("soda_decrypt_failures", mode="public")
+            raise
+
+
+def stream_key(private: PrivateKey, public: PublicKey) -> bytes:
+    """Derives the secretstream key from the Box shared key."""
+    box = shared_keys.box(private, public)
+    return blake2b(
+        box.shared_key(), digest_size=32, person=b"cw-soda-stream", encoder=RawEncoder
+    )
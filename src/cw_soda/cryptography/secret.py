@@ -1,14 +1,30 @@
 from nacl.encoding import Encoder
+from nacl.exceptions import CryptoError
 from nacl.secret import SecretBox
 
+from cw_soda.metrics import count
+from cw_soda.timings import stage
+
 __all__ = ["encrypt", "decrypt"]
 
 
 def encrypt(key: bytes, data: bytes, key_enc: Encoder, out_enc: Encoder):
-    box = SecretBox(key, key_enc)
-    return box.encrypt(data, encoder=out_enc)
+    with stage("encrypt"):
+        box = SecretBox(key, key_enc)
+        encrypted = box.encrypt(data)
+
+    with stage("encode"):
+        return out_enc.encode(bytes(encrypted))
 
 
 def decrypt(key: bytes, data: bytes, key_enc: Encoder, in_enc: Encoder) -> bytes:
-    box = SecretBox(key, key_enc)
-    return box.decrypt(data, encoder=in_enc)
+    with stage("decode"):
+        data = in_enc.decode(data)
+
+    with stage("decrypt"):
+        box = SecretBox(key, key_enc)
+        try:
+            return box.decrypt(data)
+        except CryptoError:
+            count("soda_decrypt_failures", mode="secret")
+            raise
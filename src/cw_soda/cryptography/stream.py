@@ -0,0 +1,100 @@
+from collections.abc import Iterable, Iterator
+
+from nacl.bindings import (
+    crypto_secretstream_xchacha20poly1305_ABYTES,
+    crypto_secretstream_xchacha20poly1305_HEADERBYTES,
+    crypto_secretstream_xchacha20poly1305_init_pull,
+    crypto_secretstream_xchacha20poly1305_init_push,
+    crypto_secretstream_xchacha20poly1305_pull,
+    crypto_secretstream_xchacha20poly1305_push,
+    crypto_secretstream_xchacha20poly1305_state,
+    crypto_secretstream_xchacha20poly1305_TAG_FINAL,
+    crypto_secretstream_xchacha20poly1305_TAG_MESSAGE,
+)
+from nacl.exceptions import CryptoError
+
+from cw_soda.metrics import count
+
+__all__ = ["encrypt", "decrypt", "CHUNK_SIZE"]
+
+# The plaintext is encrypted in frames of up to CHUNK_SIZE bytes:
+# header | length | ciphertext | length | ciphertext | ...
+# The last frame carries the FINAL tag, which protects from truncation,
+# and the secretstream state protects from reordering.
+CHUNK_SIZE = 64 * 1024
+LENGTH_SIZE = 4
+MAX_FRAME = CHUNK_SIZE + crypto_secretstream_xchacha20poly1305_ABYTES
+HEADER_SIZE = crypto_secretstream_xchacha20poly1305_HEADERBYTES
+
+
+def split_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    for chunk in chunks:
+        for start in range(0, len(chunk), CHUNK_SIZE):
+            yield chunk[start : start + CHUNK_SIZE]
+
+
+def make_frame(state, data: bytes, tag: int) -> bytes:
+    encrypted = crypto_secretstream_xchacha20poly1305_push(state, data, tag=tag)
+    return len(encrypted).to_bytes(LENGTH_SIZE, byteorder="big") + encrypted
+
+
+def encrypt(key: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    state = crypto_secretstream_xchacha20poly1305_state()
+    yield crypto_secretstream_xchacha20poly1305_init_push(state, key)
+
+    previous = b""
+    for i, chunk in enumerate(split_chunks(chunks)):
+        if i > 0:
+            yield make_frame(
+                state, previous, crypto_secretstream_xchacha20poly1305_TAG_MESSAGE
+            )
+
+        previous = chunk
+
+    yield make_frame(state, previous, crypto_secretstream_xchacha20poly1305_TAG_FINAL)
+
+
+def decrypt_frames(key: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    state = crypto_secretstream_xchacha20poly1305_state()
+    buffer = bytearray()
+    started = final = False
+    for chunk in chunks:
+        buffer += chunk
+        if not started:
+            if len(buffer) < HEADER_SIZE:
+                continue
+
+            header = bytes(buffer[:HEADER_SIZE])
+            crypto_secretstream_xchacha20poly1305_init_pull(state, header, key)
+            del buffer[:HEADER_SIZE]
+            started = True
+
+        while len(buffer) >= LENGTH_SIZE:
+            if final:
+                raise CryptoError("Unexpected data after the final frame")
+
+            length = int.from_bytes(buffer[:LENGTH_SIZE], byteorder="big")
+            if length > MAX_FRAME:
+                raise CryptoError("The frame is too long")
+
+            end = LENGTH_SIZE + length
+            if len(buffer) < end:
+                break
+
+            encrypted = bytes(buffer[LENGTH_SIZE:end])
+            del buffer[:end]
+            data, tag = crypto_secretstream_xchacha20poly1305_pull(state, encrypted)
+            final = tag == crypto_secretstream_xchacha20poly1305_TAG_FINAL
+            if data:
+                yield data
+
+    if not final or buffer:
+        raise CryptoError("The stream is truncated")
+
+
+def decrypt(key: bytes, chunks: Iterable[bytes]) -> Iterator[bytes]:
+    try:
+        yield from decrypt_frames(key, chunks)
+    except CryptoError:
+        count("soda_decrypt_failures", mode="stream")
+        raise
@@ -0,0 +1,153 @@
+import re
+import threading
+import zlib
+from collections import Counter
+from collections.abc import Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+__all__ = [
+    "BUILTIN_DICTIONARY",
+    "MAX_DICTIONARY_SIZE",
+    "dictionary_id",
+    "dictionaries",
+    "using_dictionary",
+    "train_dictionary",
+]
+
+# Deflate only looks back 32K
+MAX_DICTIONARY_SIZE = 32768
+
+# The --dictionary of the running command, see using_dictionary
+active_dictionary = ContextVar("active_dictionary", default=None)
+
+# Deflate prefers the nearest matches, so the most common phrases go last
+BUILTIN_DICTIONARY = b" ".join(
+    [
+        b"ANTENNA VERTICAL LOOP WINDOM BEAM ELEVATION AZIMUTH HEADING LATITUDE",
+        b"SUNNY CLOUDY RAIN SNOW WINDY FOGGY COLD WARM HOT TEMP DEGREES",
+        b"POWER WATTS KW AMP DIPOLE YAGI GP EFHW DELTA INV VEE FT UP",
+        b"QRA QRB QRG QRH QRI QRJ QRK QRL QRM QRN QRO QRP QRQ QRS QRT QRU QRV",
+        b"QRX QRZ QSA QSB QSD QSK QSL QSO QSP QSY QTC QTH QTR QRV? QRZ? QSL?",
+        b"ALPHA BRAVO CHARLIE DELTA ECHO FOXTROT GOLF HOTEL INDIA JULIET KILO",
+        b"LIMA MIKE NOVEMBER OSCAR PAPA QUEBEC ROMEO SIERRA TANGO UNIFORM",
+        b"VICTOR WHISKEY XRAY YANKEE ZULU",
+        b"JAN FEB MAR APR MAY JUN JUL AUG SEP OCT NOV DEC UTC GMT Z",
+        b"PSE AGN HW CPY SRI BK NR ABT ADR AGE ALL ANT BCNU CFM CUL",
+        b"DR FB FER GA GB GE GM GN HPE HR HV INFO MNI NW OB OM OP",
+        b"PWR RCVD RIG RPT SIG SKED SOLID STN TKS TNX TU UR VY WID WKD WX XYL YL",
+        b"CONDX DX TEST CONTEST NAME IS HR QTH IS RIG IS ANT IS WX IS",
+        b"UR RST IS 599 5NN 579 559 449 339 ES TNX FER CALL",
+        b"BT AR SK KN AS HH 73 88 TU 73 GL ES HPE CUL",
+        b"CQ CQ CQ DE CQ CQ DE K DE K ",
+    ]
+)
+
+
+def dictionary_id(dictionary: bytes) -> int:
+    """A 2-byte id recorded in the compressed message."""
+    return zlib.crc32(dictionary) & 0xFFFF
+
+
+class DictionaryRegistry:
+    """The known dictionaries by id.
+
+    The dictionary of the running command is the default one, and it's
+    looked up first, see using_dictionary.
+    """
+
+    def __init__(self, builtin: bytes):
+        self.lock = threading.Lock()
+        self.dictionaries = {}
+        self.builtin = builtin
+        self.add(builtin)
+
+    def check(self, dictionary: bytes) -> int:
+        if not dictionary:
+            raise ValueError("The dictionary is empty")
+
+        number = dictionary_id(dictionary)
+        with self.lock:
+            if self.dictionaries.get(number, dictionary) != dictionary:
+                raise ValueError(f"Dictionary id collision: {number:04x}")
+
+        return number
+
+    def add(self, dictionary: bytes) -> int:
+        number = self.check(dictionary)
+        with self.lock:
+            self.dictionaries[number] = dictionary
+
+        return number
+
+    @property
+    def default(self) -> bytes:
+        return active_dictionary.get() or self.builtin
+
+    def get(self, number: int) -> bytes:
+        active = active_dictionary.get()
+        if active is not None and dictionary_id(active) == number:
+            return active
+
+        with self.lock:
+            dictionary = self.dictionaries.get(number)
+
+        if dictionary is None:
+            raise ValueError(
+                f"Unknown dictionary: {number:04x}, pass it with --dictionary"
+            )
+
+        return dictionary
+
+
+dictionaries = DictionaryRegistry(BUILTIN_DICTIONARY)
+
+
+@contextmanager
+def using_dictionary(dictionary: bytes):
+    """Compresses with the dictionary in the block, and decompresses with it.
+
+    It's held in a context variable, so it doesn't leak into the other
+    commands, e.g. in the tests and the benchmarks.
+    """
+    dictionaries.check(dictionary)
+    token = active_dictionary.set(dictionary)
+    try:
+        yield dictionary
+    finally:
+        active_dictionary.reset(token)
+
+
+def train_dictionary(samples: Iterable[bytes], size: int = 4096) -> bytes:
+    """Picks the phrases of 1-3 words that save the most bytes.
+
+    Deflate matches start at 3 bytes, so a phrase saves about its length
+    minus 3 every time it appears.
+    """
+    counts = Counter()
+    for sample in samples:
+        for line in sample.splitlines():
+            words = re.findall(rb"\S+", line)
+            for n in (1, 2, 3):
+                for i in range(len(words) - n + 1):
+                    counts[b" ".join(words[i : i + n]) + b" "] += 1
+
+    scores = {
+        phrase: count * (len(phrase) - 3)
+        for phrase, count in counts.items()
+        if count > 1 and len(phrase) > 3
+    }
+    chosen = []
+    length = 0
+    for phrase in sorted(scores, key=scores.get, reverse=True):
+        if length + len(phrase) > size:
+            continue
+
+        if any(phrase in other for other in chosen):
+            continue
+
+        chosen.append(phrase)
+        length += len(phrase)
+
+    chosen.sort(key=scores.get)
+    return b"".join(chosen)
@@ -1,28 +1,53 @@
 from nacl.encoding import Base64Encoder, RawEncoder
 
-from .base26_encoder import Base26Encoder
-from .base31_encoder import Base31Encoder
-from .base36_encoder import Base36Encoder
-from .base94_encoder import Base94Encoder
+from .base26_encoder import Base26BlockedEncoder, Base26Encoder
+from .base31_encoder import Base31BlockedEncoder, Base31Encoder
+from .base36_encoder import Base36BlockedEncoder, Base36Encoder
+from .base94_encoder import Base94BlockedEncoder, Base94Encoder
+from .codec import (
+    BlockedCodec,
+    Codec,
+    EncoderTable,
+    alphabets_path,
+    compile_codec,
+    load_alphabets,
+)
 from .functions import decode_bytes, encode_str
 
 __all__ = [
     "encoders",
     "encode_str",
     "decode_bytes",
+    "compile_codec",
+    "load_alphabets",
+    "alphabets_path",
+    "Codec",
+    "BlockedCodec",
+    "EncoderTable",
     "Base26Encoder",
+    "Base26BlockedEncoder",
     "Base31Encoder",
+    "Base31BlockedEncoder",
     "Base36Encoder",
+    "Base36BlockedEncoder",
     "Base64Encoder",
     "Base94Encoder",
+    "Base94BlockedEncoder",
     "RawEncoder",
 ]
 
-encoders = {
-    "base26": Base26Encoder,
-    "base31": Base31Encoder,
-    "base36": Base36Encoder,
-    "base64": Base64Encoder,
-    "base94": Base94Encoder,
-    "binary": RawEncoder,
-}
+# The user alphabets from the config are added on use, see EncoderTable
+encoders = EncoderTable(
+    {
+        "base26": Base26Encoder,
+        "base26-blocked": Base26BlockedEncoder,
+        "base31": Base31Encoder,
+        "base31-blocked": Base31BlockedEncoder,
+        "base36": Base36Encoder,
+        "base36-blocked": Base36BlockedEncoder,
+        "base64": Base64Encoder,
+        "base94": Base94Encoder,
+        "base94-blocked": Base94BlockedEncoder,
+        "binary": RawEncoder,
+    }
+)
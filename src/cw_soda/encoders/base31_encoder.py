@@ -1,17 +1,11 @@
-from nacl.encoding import Encoder
+from .codec import compile_codec
 
-from .functions import base_to_bytes, bytes_to_base, decode_bytes, encode_str
-
-__all__ = ["Base31Encoder", "ALPHABET"]
+__all__ = ["Base31Encoder", "Base31BlockedEncoder", "ALPHABET", "BLOCK_SIZE"]
 
 ALPHABET = "АБВГДЕЖЗИЙКЛМНОПРСТУФХЦЧШЩЫЬЭЮЯ"
 
+# Bytes per block, the digit blocks are fixed-width
+BLOCK_SIZE = 8
 
-class Base31Encoder(Encoder):
-    @staticmethod
-    def encode(data: bytes) -> bytes:
-        return encode_str(bytes_to_base(data, ALPHABET))
-
-    @staticmethod
-    def decode(data: bytes) -> bytes:
-        return base_to_bytes(decode_bytes(data), ALPHABET)
+Base31Encoder = compile_codec(ALPHABET, cw=True)
+Base31BlockedEncoder = compile_codec(ALPHABET, BLOCK_SIZE, cw=True)
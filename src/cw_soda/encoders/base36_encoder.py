@@ -1,19 +1,13 @@
 import string
 
-from nacl.encoding import Encoder
+from .codec import compile_codec
 
-from .functions import base_to_bytes, bytes_to_base, decode_bytes, encode_str
-
-__all__ = ["Base36Encoder", "ALPHABET"]
+__all__ = ["Base36Encoder", "Base36BlockedEncoder", "ALPHABET", "BLOCK_SIZE"]
 
 ALPHABET = string.digits + string.ascii_uppercase
 
+# Bytes per block, the digit blocks are fixed-width
+BLOCK_SIZE = 7
 
-class Base36Encoder(Encoder):
-    @staticmethod
-    def encode(data: bytes) -> bytes:
-        return encode_str(bytes_to_base(data, ALPHABET))
-
-    @staticmethod
-    def decode(data: bytes) -> bytes:
-        return base_to_bytes(decode_bytes(data), ALPHABET)
+Base36Encoder = compile_codec(ALPHABET, cw=True)
+Base36BlockedEncoder = compile_codec(ALPHABET, BLOCK_SIZE, cw=True)
@@ -1,17 +1,11 @@
-from nacl.encoding import Encoder
+from .codec import compile_codec
 
-from .functions import base_to_bytes, bytes_to_base, decode_bytes, encode_str
-
-__all__ = ["Base94Encoder", "ALPHABET"]
+__all__ = ["Base94Encoder", "Base94BlockedEncoder", "ALPHABET", "BLOCK_SIZE"]
 
 ALPHABET = "".join([chr(i) for i in range(33, 127)])
 
+# Bytes per block, the digit blocks are fixed-width
+BLOCK_SIZE = 8
 
-class Base94Encoder(Encoder):
-    @staticmethod
-    def encode(data: bytes) -> bytes:
-        return encode_str(bytes_to_base(data, ALPHABET))
-
-    @staticmethod
-    def decode(data: bytes) -> bytes:
-        return base_to_bytes(decode_bytes(data), ALPHABET)
+Base94Encoder = compile_codec(ALPHABET)
+Base94BlockedEncoder = compile_codec(ALPHABET, BLOCK_SIZE)
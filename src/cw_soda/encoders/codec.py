@@ -0,0 +1,187 @@
+import os
+import tomllib
+from collections.abc import Iterable, Iterator
+from functools import cache
+from pathlib import Path
+
+import click
+
+from .functions import (
+    base_to_bytes,
+    blocks_to_bytes,
+    bytes_to_base,
+    bytes_to_blocks,
+    decode_bytes,
+    encode_str,
+    stream_blocks_to_bytes,
+    stream_bytes_to_blocks,
+)
+
+__all__ = [
+    "Codec",
+    "BlockedCodec",
+    "EncoderTable",
+    "compile_codec",
+    "load_alphabets",
+    "alphabets_path",
+    "ALPHABETS_ENV",
+]
+
+ALPHABETS_ENV = "SODA_ALPHABETS"
+
+# Bytes per block of a user alphabet, unless set
+DEFAULT_BLOCK_SIZE = 8
+
+
+def check_alphabet(alphabet: str, cw: bool):
+    if len(alphabet) < 2:
+        raise ValueError("The alphabet needs at least 2 letters")
+
+    if len(set(alphabet)) != len(alphabet):
+        raise ValueError("The alphabet has repeated letters")
+
+    if any(letter.isspace() for letter in alphabet):
+        raise ValueError("The alphabet has whitespace")
+
+    # The CW input is uppercased, and ? marks an unreadable group
+    if cw and (alphabet != alphabet.upper() or "?" in alphabet):
+        raise ValueError("A CW alphabet must be uppercase, without ?")
+
+
+class Codec:
+    """An alphabet codec, see compile_codec.
+
+    The whole message is one big number. The cw codecs are sent in
+    groups, so the input is uppercased and the whitespace removed.
+    """
+
+    def __init__(self, alphabet: str, cw: bool = False):
+        check_alphabet(alphabet, cw)
+        self.alphabet = alphabet
+        self.cw = cw
+
+    def encode(self, data: bytes) -> bytes:
+        return encode_str(bytes_to_base(data, self.alphabet))
+
+    def decode(self, data: bytes) -> bytes:
+        return base_to_bytes(decode_bytes(data), self.alphabet)
+
+
+class BlockedCodec(Codec):
+    """Fixed-size byte blocks into fixed-width digit blocks."""
+
+    def __init__(self, alphabet: str, block_size: int, cw: bool = False):
+        if block_size not in range(1, 65):
+            raise ValueError("The block size must be 1-64 bytes")
+
+        super().__init__(alphabet, cw)
+        self.block_size = block_size
+
+    def encode(self, data: bytes) -> bytes:
+        return encode_str(bytes_to_blocks(data, self.alphabet, self.block_size))
+
+    def decode(self, data: bytes) -> bytes:
+        return blocks_to_bytes(decode_bytes(data), self.alphabet, self.block_size)
+
+    def encode_stream(self, chunks: Iterable[bytes]) -> Iterator[str]:
+        return stream_bytes_to_blocks(chunks, self.alphabet, self.block_size)
+
+    def decode_stream(self, chunks: Iterable[str]) -> Iterator[bytes]:
+        return stream_blocks_to_bytes(chunks, self.alphabet, self.block_size)
+
+
+@cache
+def compile_codec(alphabet: str, block_size: int = 0, cw: bool = False) -> Codec:
+    """The codec of the alphabet, blocked when the block size is set."""
+    if block_size:
+        return BlockedCodec(alphabet, block_size, cw)
+
+    return Codec(alphabet, cw)
+
+
+def alphabets_path() -> Path:
+    if ALPHABETS_ENV in os.environ:
+        return Path(os.environ[ALPHABETS_ENV])
+
+    config = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(config) / "cw-soda" / "alphabets.toml"
+
+
+def load_alphabets(path: Path, reserved: Iterable[str] = ()) -> dict:
+    """The user alphabets, each one as NAME and NAME-blocked.
+
+    [alphabets.NAME]
+    letters = "..."
+    block-size = 8  # optional
+    cw = true  # optional
+    """
+    if not path.is_file():
+        return {}
+
+    try:
+        with path.open("rb") as fd:
+            config = tomllib.load(fd)
+
+        codecs = {}
+        for name, options in config.get("alphabets", {}).items():
+            if name in reserved or name.endswith("-blocked"):
+                raise ValueError(f"Reserved encoding name: {name}")
+
+            if not isinstance(options.get("letters"), str):
+                raise ValueError(f"The letters of {name} must be a string")
+
+            letters = options["letters"]
+            block_size = options.get("block-size", DEFAULT_BLOCK_SIZE)
+            if not isinstance(block_size, int) or isinstance(block_size, bool):
+                raise ValueError(f"The block-size of {name} must be an integer")
+
+            cw = options.get("cw", False)
+            if not isinstance(cw, bool):
+                raise ValueError(f"The cw of {name} must be true or false")
+
+            codecs[name] = compile_codec(letters, cw=cw)
+            codecs[f"{name}-blocked"] = compile_codec(letters, block_size, cw)
+    except (ValueError, TypeError, AttributeError) as ex:
+        raise ValueError(f"{path}: {ex}") from None
+
+    return codecs
+
+
+class EncoderTable(dict):
+    """The built-in encoders, the user alphabets are loaded on the first miss.
+
+    So a broken config only fails the commands asking for an unknown
+    encoding, with a click error instead of a traceback.
+    """
+
+    def __init__(self, builtins: dict):
+        super().__init__(builtins)
+        self.loaded = False
+
+    def load(self):
+        if self.loaded:
+            return
+
+        try:
+            codecs = load_alphabets(alphabets_path(), reserved=list(self.keys()))
+        except ValueError as ex:
+            raise click.ClickException(str(ex)) from None
+
+        self.update(codecs)
+        self.loaded = True
+
+    def __missing__(self, name: str):
+        if self.loaded:
+            raise KeyError(name)
+
+        self.load()
+        return self[name]
+
+    def __contains__(self, name: object) -> bool:
+        if not super().__contains__(name):
+            self.load()
+
+        return super().__contains__(name)
+
+    def get(self, name: str, default=None):
+        return self[name] if name in self else default
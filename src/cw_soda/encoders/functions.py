@@ -1,4 +1,24 @@
-__all__ = ["base_to_bytes", "bytes_to_base", "encode_str", "decode_bytes"]
+import string
+from collections.abc import Iterable, Iterator
+from functools import cache
+
+from cw_soda.profiling import region
+
+__all__ = [
+    "base_to_bytes",
+    "bytes_to_base",
+    "blocks_to_bytes",
+    "bytes_to_blocks",
+    "stream_blocks_to_bytes",
+    "stream_bytes_to_blocks",
+    "encode_str",
+    "decode_bytes",
+    "to_digits",
+    "digits_to_int",
+]
+
+# Below this many digits the schoolbook loop beats splitting the number
+LEAF_DIGITS = 32
 
 
 def encode_str(data: str) -> bytes:
@@ -9,40 +29,226 @@ def decode_bytes(data: bytes) -> str:
     return data.decode(encoding="utf-8", errors="strict")
 
 
-def int_to_base(number: int, alphabet: str) -> str:
+# The digit values are kept as bytes, so the alphabet is up to 255 letters
+INVALID = 0xFF
+
+# A digit value to the digit of int(), up to base 36
+INT_DIGITS = bytes.maketrans(
+    bytes(range(36)), (string.digits + string.ascii_lowercase).encode("ascii")
+)
+
+
+@cache
+def digit_table(alphabet: str) -> dict:
+    """The str.translate table of the letters to their values.
+
+    The other Latin-1 characters map to INVALID, and the rest can't be
+    encoded to Latin-1, so the input is validated in a single pass.
+    """
+    if len(alphabet) >= INVALID:
+        raise ValueError(f"The alphabet is longer than {INVALID - 1} letters")
+
+    table = dict.fromkeys(range(256), INVALID)
+    table.update((ord(digit), value) for value, digit in enumerate(alphabet))
+    return table
+
+
+@cache
+def pair_table(alphabet: str) -> list:
+    """Every two-digit number, so the encoding divides once per two digits."""
+    return [high + low for high in alphabet for low in alphabet]
+
+
+def to_digits(source: str, alphabet: str) -> bytes:
+    """The digit values of the source, a byte per digit."""
+    try:
+        digits = source.translate(digit_table(alphabet)).encode("latin-1")
+    except UnicodeEncodeError as ex:
+        raise ValueError(f"Invalid digit: {source[ex.start]!r}") from None
+
+    position = digits.find(INVALID)
+    if position >= 0:
+        raise ValueError(f"Invalid digit: {source[position]!r}")
+
+    return digits
+
+
+def digits_to_int(digits: bytes, base: int) -> int:
+    if not digits:
+        return 0
+
+    if base <= 36:
+        return int(digits.translate(INT_DIGITS), base)
+
+    number = 0
+    for digit in digits:
+        number = number * base + digit
+
+    return number
+
+
+@cache
+def power(base: int, exponent: int) -> int:
+    return base**exponent
+
+
+def leaf_to_base(number: int, alphabet: str, width: int) -> list:
+    """Converts a number below base**width into exactly width digits."""
     result = []
+    pairs = pair_table(alphabet)
     base = len(alphabet)
+    square = base * base
+    for _ in range(width // 2):
+        number, remainder = divmod(number, square)
+        result.append(pairs[remainder])
+
+    if width % 2:
+        result.append(alphabet[number % base])
+
+    result.reverse()
+    return result
+
+
+def split_to_base(number: int, alphabet: str, level: int, result: list):
+    """Appends exactly LEAF_DIGITS * 2**level digits of the number."""
+    if level == 0:
+        result.extend(leaf_to_base(number, alphabet, LEAF_DIGITS))
+        return
+
+    high, low = divmod(number, power(len(alphabet), LEAF_DIGITS << (level - 1)))
+    split_to_base(high, alphabet, level - 1, result)
+    split_to_base(low, alphabet, level - 1, result)
+
+
+def int_to_base(number: int, alphabet: str) -> str:
     abs_number = abs(number)
-    while abs_number:
-        abs_number, remainder = divmod(abs_number, base)
-        result.append(alphabet[remainder])
+    if not abs_number:
+        return ""
+
+    base = len(alphabet)
+    level = 0
+    while power(base, LEAF_DIGITS << level) <= abs_number:
+        level += 1
 
-    return "".join(reversed(result))
+    result = []
+    split_to_base(abs_number, alphabet, level, result)
+    return "".join(result).lstrip(alphabet[0])
 
 
 def base_to_int(source: str, alphabet: str) -> int:
-    number = 0
     base = len(alphabet)
-    for index, digit in enumerate(reversed(source)):
-        number += alphabet.index(digit) * (base**index)
+    padding = -len(source) % LEAF_DIGITS
+    digits = bytes(padding) + to_digits(source, alphabet)
+    numbers = [
+        digits_to_int(digits[start : start + LEAF_DIGITS], base)
+        for start in range(0, len(digits), LEAF_DIGITS)
+    ]
 
-    return number
+    # Merge the neighbouring leaves pairwise, doubling the width every round
+    width = LEAF_DIGITS
+    while len(numbers) > 1:
+        if len(numbers) % 2:
+            numbers.insert(0, 0)
 
+        shift = power(base, width)
+        numbers = [hi * shift + lo for hi, lo in zip(numbers[::2], numbers[1::2])]
+        width *= 2
 
+    return numbers[0] if numbers else 0
+
+
+@region("encode:base")
 def bytes_to_base(source: bytes, alphabet: str) -> str:
     number = int.from_bytes(source, byteorder="big", signed=False)
     return int_to_base(number, alphabet)
 
 
 def int_to_bytes(number: int) -> bytes:
-    buffer = bytearray()
-    while number:
-        buffer.append(number & 0xFF)
-        number //= 256
-
-    buffer.reverse()
-    return bytes(buffer)
+    return number.to_bytes((number.bit_length() + 7) // 8, byteorder="big")
 
 
+@region("decode:base")
 def base_to_bytes(source: str, alphabet: str) -> bytes:
     return int_to_bytes(base_to_int(source, alphabet))
+
+
+@cache
+def block_width(size: int, base: int) -> int:
+    """The number of digits that holds any block of size bytes."""
+    width = 0
+    while base**width < 256**size:
+        width += 1
+
+    return width
+
+
+@cache
+def block_sizes(block_size: int, base: int) -> dict:
+    """Maps the digit width back to the block size, the last block may be short."""
+    return {block_width(size, base): size for size in range(1, block_size + 1)}
+
+
+@region("encode:blocks")
+def bytes_to_blocks(source: bytes, alphabet: str, block_size: int) -> str:
+    result = []
+    base = len(alphabet)
+    for start in range(0, len(source), block_size):
+        block = source[start : start + block_size]
+        number = int.from_bytes(block, byteorder="big", signed=False)
+        width = block_width(len(block), base)
+        result.extend(leaf_to_base(number, alphabet, width))
+
+    return "".join(result)
+
+
+@region("decode:blocks")
+def blocks_to_bytes(source: str, alphabet: str, block_size: int) -> bytes:
+    digits = to_digits(source, alphabet)
+    base = len(alphabet)
+    sizes = block_sizes(block_size, base)
+    width = block_width(block_size, base)
+    result = bytearray()
+    for start in range(0, len(digits), width):
+        block = digits[start : start + width]
+        size = sizes.get(len(block))
+        if size is None:
+            raise ValueError(f"Truncated block: {source[start : start + width]!r}")
+
+        number = digits_to_int(block, base)
+        if number >= 256**size:
+            raise ValueError(f"Block out of range: {source[start : start + width]!r}")
+
+        result += number.to_bytes(size, byteorder="big")
+
+    return bytes(result)
+
+
+def stream_bytes_to_blocks(
+    chunks: Iterable[bytes], alphabet: str, block_size: int
+) -> Iterator[str]:
+    buffer = b""
+    for chunk in chunks:
+        buffer += chunk
+        complete = len(buffer) - len(buffer) % block_size
+        if complete:
+            yield bytes_to_blocks(buffer[:complete], alphabet, block_size)
+            buffer = buffer[complete:]
+
+    if buffer:
+        yield bytes_to_blocks(buffer, alphabet, block_size)
+
+
+def stream_blocks_to_bytes(
+    chunks: Iterable[str], alphabet: str, block_size: int
+) -> Iterator[bytes]:
+    width = block_width(block_size, len(alphabet))
+    buffer = ""
+    for chunk in chunks:
+        buffer += chunk
+        complete = len(buffer) - len(buffer) % width
+        if complete:
+            yield blocks_to_bytes(buffer[:complete], alphabet, block_size)
+            buffer = buffer[complete:]
+
+    if buffer:
+        yield blocks_to_bytes(buffer, alphabet, block_size)
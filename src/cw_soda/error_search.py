@@ -1,35 +1,233 @@
+from collections.abc import Iterable
+
 import click
-from crc import Calculator, Crc8, Crc16, Crc32
+from crc import Crc8, Crc16, Crc32
 
+from cw_soda.checksums import PrefixChecksums, TableCrc, ZlibCrc32
 from cw_soda.encoders import encode_str
 
-__all__ = ["error_search", "checksum_calculators"]
+__all__ = [
+    "error_search",
+    "checksum_calculators",
+    "checksum_configs",
+    "checksum_widths",
+    "ChecksumTree",
+    "split_ranges",
+    "grid_parity",
+    "parity_search",
+]
+
+# The crc32 is the POSIX (cksum) variant, crc32-iso is the zlib one
+checksum_configs = {
+    "crc8": Crc8.CCITT,
+    "crc16": Crc16.X25,
+    "crc32": Crc32.POSIX,
+    "crc32-iso": Crc32.CRC32,
+}
 
 checksum_calculators = {
-    "crc8": Calculator(Crc8.CCITT),
-    "crc16": Calculator(Crc16.X25),
-    "crc32": Calculator(Crc32.POSIX),
+    name: (ZlibCrc32 if name == "crc32-iso" else TableCrc)(config.value)
+    for name, config in checksum_configs.items()
 }
 
+# Bytes
+checksum_widths = {name: calc.width // 8 for name, calc in checksum_calculators.items()}
+
+
+def error_search(lines: Iterable, calc: TableCrc, single: bool = False) -> list:
+    """Returns the indexes of the wrong groups.
+
+    Descends into every half with a wrong checksum. When the parent is
+    wrong and the left half is correct, the right half is wrong without
+    asking. Single: assumes one error, so the right half isn't asked
+    after the wrong left one.
+
+    The prefix checksums take one pass, a half's checksum is derived
+    from them.
+    """
+    prefixes = PrefixChecksums(calc, (encode_str(ln) for ln in lines))
+    errors = []
+
+    def checksum(start: int, end: int) -> int:
+        return prefixes.segment(start, end)
+
+    def is_correct(start: int, end: int) -> bool:
+        click.echo(f"Checksum: {checksum(start, end):X}")
+        return click.confirm("Is it correct?", default=None)
+
+    def search(start: int, end: int, wrong: bool):
+        if end - start == 1:
+            errors.append(start)
+            return
+
+        mid = start + (end - start) // 2
+        left_wrong = not is_correct(start, mid)
+        if left_wrong and single:
+            right_wrong = False
+        elif not left_wrong and wrong:
+            right_wrong = True
+        else:
+            right_wrong = not is_correct(mid, end)
+
+        if left_wrong:
+            search(start, mid, True)
+
+        if right_wrong:
+            search(mid, end, True)
+
+    size = len(prefixes)
+    if size:
+        search(0, size, False)
+
+    return errors
+
+
+def split_ranges(size: int, depth: int) -> list:
+    """The (start, end) ranges after depth splits, a single group isn't split.
+
+    The halves are split like in error_search.
+    """
+    ranges = [(0, size)] if size else []
+    for _ in range(depth):
+        split = []
+        for start, end in ranges:
+            if end - start == 1:
+                split.append((start, end))
+            else:
+                mid = start + (end - start) // 2
+                split += [(start, mid), (mid, end)]
+
+        ranges = split
+
+    return ranges
+
+
+class ChecksumTree:
+    """A Merkle-style tree of checksums over the groups.
+
+    The leaves are the group checksums, a node is the checksum of its
+    children's checksums, so a level is computed in one linear pass.
+    The halves are split like in error_search.
+    """
 
-def error_search(lines: list, calc: Calculator):
-    if len(lines) == 0:
+    def __init__(self, groups: Iterable, calc: TableCrc, width: int):
+        self.groups = groups
+        self.calc = calc
+        self.width = width
+        self.size = len(groups)
+
+    def checksums(self, depth: int) -> dict:
+        """The node checksums down to the depth, by (start, end)."""
+        checksums = {}
+        groups = iter(self.groups)
+
+        def build(start: int, end: int, level: int) -> int:
+            if end - start == 1:
+                checksum = self.calc.checksum(encode_str(next(groups)))
+            else:
+                mid = start + (end - start) // 2
+                left = build(start, mid, level + 1).to_bytes(self.width, "big")
+                right = build(mid, end, level + 1).to_bytes(self.width, "big")
+                checksum = self.calc.checksum(left + right)
+
+            if level <= depth:
+                checksums[start, end] = checksum
+
+            return checksum
+
+        if self.size:
+            build(0, self.size, 0)
+
+        return checksums
+
+    def level(self, depth: int) -> list:
+        return split_ranges(self.size, depth)
+
+    def digest(self, depth: int) -> str:
+        checksums = self.checksums(depth)
+        return "".join(
+            f"{checksums[node]:0{self.width * 2}X}" for node in self.level(depth)
+        )
+
+    def compare(self, digest: str) -> list:
+        """Returns the ranges that don't match the sender's digest.
+
+        The depth is found by the digest length.
+        """
+        digits = self.width * 2
+        if not digest or len(digest) % digits:
+            raise ValueError("The digest length doesn't match the checksum")
+
+        try:
+            checksums = [
+                int(digest[i : i + digits], 16) for i in range(0, len(digest), digits)
+            ]
+        except ValueError as ex:
+            raise ValueError("The digest is not hexadecimal") from ex
+
+        depth = 0
+        ranges = self.level(depth)
+        while len(ranges) < len(checksums) and len(ranges) < self.size:
+            depth += 1
+            ranges = self.level(depth)
+
+        if len(ranges) != len(checksums):
+            raise ValueError("The digest doesn't match the number of groups")
+
+        local = self.checksums(depth)
+        return [
+            node for node, checksum in zip(ranges, checksums) if local[node] != checksum
+        ]
+
+
+def grid_parity(groups: Iterable, calc: TableCrc, width: int, column_height: int):
+    """The row and column checksums of the table, in hex, in one pass."""
+    rows = [calc.init] * column_height
+    columns = []
+    for i, group in enumerate(groups):
+        data = encode_str(group)
+        row, column = i % column_height, i // column_height
+        rows[row] = calc.update(rows[row], data)
+        if row == 0:
+            columns.append(calc.init)
+
+        columns[column] = calc.update(columns[column], data)
+
+    return (
+        [f"{calc.finalize(row):0{width * 2}X}" for row in rows],
+        [f"{calc.finalize(column):0{width * 2}X}" for column in columns],
+    )
+
+
+def parity_mismatches(local: list, remote: list | None) -> set | None:
+    """The indexes of the different checksums, None when all match."""
+    if remote is None:
         return None
 
-    if len(lines) == 1:
-        return lines[0]
+    if len(remote) != len(local):
+        raise ValueError("The parity doesn't match the table size")
+
+    return {i for i, (a, b) in enumerate(zip(local, remote)) if a != b} or None
+
 
-    mid = len(lines) // 2
-    left = lines[:mid]
-    right = lines[mid:]
-    left_sum = calc.checksum([encode_str(ln) for ln in left])
-    right_sum = calc.checksum([encode_str(ln) for ln in right])
+def parity_search(
+    groups: Iterable, parity: tuple, remote_rows: list, remote_columns: list
+) -> list:
+    """Returns the indexes of the groups in the wrong rows and columns.
 
-    click.echo(f"Checksum: {left_sum:X}")
-    if click.confirm("Is it correct?", default=None):
-        click.echo(f"Checksum: {right_sum:X}")
-        if click.confirm("Is it correct?", default=None):
-            return None
+    Either side may be None. The side without a mismatch doesn't narrow
+    the search, so an error in the parity line itself is still shown.
+    """
+    rows, columns = parity
+    column_height = len(rows)
+    wrong_rows = parity_mismatches(rows, remote_rows)
+    wrong_columns = parity_mismatches(columns, remote_columns)
+    if wrong_rows is None and wrong_columns is None:
+        return []
 
-        return error_search(right, calc)
-    return error_search(left, calc)
+    return [
+        i
+        for i in range(len(groups))
+        if (wrong_rows is None or i % column_height in wrong_rows)
+        and (wrong_columns is None or i // column_height in wrong_columns)
+    ]
@@ -0,0 +1,270 @@
+from functools import cache
+
+from cw_soda.encoders import encoders
+from cw_soda.encoders.functions import digits_to_int, to_digits
+
+__all__ = ["add_fec", "repair", "fec_alphabet", "GROUP_SIZE"]
+
+# Reed-Solomon over GF(p), the symbols are the 5-letter groups.
+# The message is padded to whole groups and followed by a tweak group
+# (pad + 5 * tweak) and the parity groups. The tweak is picked so every
+# parity symbol fits in 5 letters, since p is a bit larger than base^5.
+GROUP_SIZE = 5
+
+
+def fec_alphabet(encoding: str) -> str | None:
+    """The alphabet of a CW encoding, including the user alphabets."""
+    enc = encoders.get(encoding)
+    if not getattr(enc, "cw", False):
+        return None
+
+    return enc.alphabet
+
+
+def is_prime(number: int) -> bool:
+    if number < 2:
+        return False
+
+    i = 2
+    while i * i <= number:
+        if number % i == 0:
+            return False
+
+        i += 1
+
+    return True
+
+
+def prime_factors(number: int) -> set:
+    factors = set()
+    i = 2
+    while i * i <= number:
+        while number % i == 0:
+            factors.add(i)
+            number //= i
+
+        i += 1
+
+    if number > 1:
+        factors.add(number)
+
+    return factors
+
+
+@cache
+def galois_field(base: int) -> tuple:
+    """The prime above base^5 and its primitive root."""
+    prime = base**GROUP_SIZE
+    while not is_prime(prime):
+        prime += 1
+
+    factors = prime_factors(prime - 1)
+    root = 2
+    while any(pow(root, (prime - 1) // q, prime) == 1 for q in factors):
+        root += 1
+
+    return prime, root
+
+
+def poly_mul(a: list, b: list, p: int) -> list:
+    """The coefficients go from the lowest degree."""
+    result = [0] * (len(a) + len(b) - 1)
+    for i, x in enumerate(a):
+        if x:
+            for j, y in enumerate(b):
+                result[i + j] = (result[i + j] + x * y) % p
+
+    return result
+
+
+def poly_eval(poly: list, x: int, p: int) -> int:
+    result = 0
+    for coefficient in reversed(poly):
+        result = (result * x + coefficient) % p
+
+    return result
+
+
+def generator_poly(parity: int, p: int, root: int) -> list:
+    generator = [1]
+    for j in range(1, parity + 1):
+        generator = poly_mul(generator, [-pow(root, j, p) % p, 1], p)
+
+    return generator
+
+
+def remainder(symbols: list, generator: list, p: int) -> list:
+    """The message * x^K mod generator, from the highest degree.
+
+    The symbols go from the highest degree.
+    """
+    parity = len(generator) - 1
+    divisor = generator[::-1]
+    result = list(symbols) + [0] * parity
+    for i in range(len(symbols)):
+        coefficient = result[i]
+        if coefficient:
+            for j in range(1, parity + 1):
+                result[i + j] = (result[i + j] - divisor[j] * coefficient) % p
+
+    return result[len(symbols) :]
+
+
+def berlekamp_massey(sequence: list, p: int) -> list:
+    """The shortest LFSR that generates the sequence, from the lowest degree."""
+    current = [1]
+    previous = [1]
+    length = 0
+    shift = 1
+    last_discrepancy = 1
+    for n, value in enumerate(sequence):
+        discrepancy = value
+        for i in range(1, length + 1):
+            if i < len(current):
+                discrepancy = (discrepancy + current[i] * sequence[n - i]) % p
+
+        if discrepancy == 0:
+            shift += 1
+            continue
+
+        factor = discrepancy * pow(last_discrepancy, -1, p) % p
+        updated = current + [0] * max(0, len(previous) + shift - len(current))
+        for i, coefficient in enumerate(previous):
+            updated[i + shift] = (updated[i + shift] - factor * coefficient) % p
+
+        if 2 * length <= n:
+            previous = current
+            length = n + 1 - length
+            last_discrepancy = discrepancy
+            shift = 1
+        else:
+            shift += 1
+
+        current = updated
+
+    while len(current) > 1 and current[-1] == 0:
+        current.pop()
+
+    return current
+
+
+def group_value(group: str, alphabet: str) -> int:
+    return digits_to_int(to_digits(group, alphabet), len(alphabet))
+
+
+def value_group(value: int, alphabet: str) -> str:
+    letters = []
+    for _ in range(GROUP_SIZE):
+        value, digit = divmod(value, len(alphabet))
+        letters.append(alphabet[digit])
+
+    return "".join(reversed(letters))
+
+
+def add_fec(text: str, alphabet: str, parity: int) -> str:
+    """Appends the tweak and parity groups to the encoded message."""
+    base = len(alphabet)
+    limit = base**GROUP_SIZE
+    p, root = galois_field(base)
+    pad = -len(text) % GROUP_SIZE
+    text += alphabet[0] * pad
+    symbols = [
+        group_value(text[i : i + GROUP_SIZE], alphabet)
+        for i in range(0, len(text), GROUP_SIZE)
+    ]
+
+    # The parity is linear in the tweak
+    generator = generator_poly(parity, p, root)
+    zero = remainder(symbols + [pad], generator, p)
+    unit = remainder([0] * len(symbols) + [GROUP_SIZE], generator, p)
+    tweak = 0
+    while pad + GROUP_SIZE * tweak < limit:
+        checks = [(-(z + tweak * u)) % p for z, u in zip(zero, unit)]
+        if all(check < limit for check in checks):
+            break
+
+        tweak += 1
+    else:
+        raise ValueError("No tweak fits the parity")
+
+    symbols += [pad + GROUP_SIZE * tweak] + checks
+    return text + "".join(
+        value_group(symbol, alphabet) for symbol in symbols[-parity - 1 :]
+    )
+
+
+def repair(text: str, alphabet: str, parity: int) -> tuple:
+    """Corrects e wrong and f erased groups, 2e + f <= parity.
+
+    A group with a letter outside the alphabet (e.g. ?) is erased.
+    Returns the message without the FEC groups, and the corrected indexes.
+    """
+    base = len(alphabet)
+    p, root = galois_field(base)
+    if len(text) % GROUP_SIZE:
+        raise ValueError("The message is not whole groups")
+
+    groups = [text[i : i + GROUP_SIZE] for i in range(0, len(text), GROUP_SIZE)]
+    length = len(groups)
+    if length < parity + 1:
+        raise ValueError("The message is shorter than the FEC groups")
+
+    symbols = []
+    erasures = []
+    for index, group in enumerate(groups):
+        try:
+            symbols.append(group_value(group, alphabet))
+        except ValueError:
+            symbols.append(0)
+            erasures.append(index)
+
+    if len(erasures) > parity:
+        raise ValueError("Too many erased groups to repair")
+
+    # The first group is the highest degree
+    locators = [pow(root, length - 1 - index, p) for index in range(length)]
+    syndromes = [
+        poly_eval(symbols[::-1], pow(root, j, p), p) for j in range(1, parity + 1)
+    ]
+    corrected = []
+    if any(syndromes):
+        erasure_locator = [1]
+        for index in erasures:
+            erasure_locator = poly_mul(erasure_locator, [1, -locators[index] % p], p)
+
+        # The Forney syndromes don't depend on the erased groups
+        forney = poly_mul(erasure_locator, syndromes, p)[len(erasures) : parity]
+        error_locator = berlekamp_massey(forney, p)
+        if 2 * (len(error_locator) - 1) + len(erasures) > parity:
+            raise ValueError("Too many errors to repair")
+
+        locator = poly_mul(error_locator, erasure_locator, p)
+        positions = [
+            index
+            for index in range(length)
+            if poly_eval(locator, pow(locators[index], -1, p), p) == 0
+        ]
+        if len(positions) != len(locator) - 1:
+            raise ValueError("Too many errors to repair")
+
+        evaluator = poly_mul(syndromes, locator, p)[:parity]
+        derivative = [i * c % p for i, c in enumerate(locator)][1:]
+        for index in positions:
+            x = pow(locators[index], -1, p)
+            numerator = poly_eval(evaluator, x, p)
+            value = numerator * pow(poly_eval(derivative, x, p), -1, p) % p
+            symbols[index] = (symbols[index] + value) % p
+            corrected.append(index)
+
+        check = [
+            poly_eval(symbols[::-1], pow(root, j, p), p) for j in range(1, parity + 1)
+        ]
+        if any(check) or any(symbol >= base**GROUP_SIZE for symbol in symbols):
+            raise ValueError("Too many errors to repair")
+
+    corrected = sorted(set(corrected).union(erasures))
+    message = "".join(
+        value_group(symbol, alphabet) for symbol in symbols[: -parity - 1]
+    )
+    pad = symbols[-parity - 1] % GROUP_SIZE
+    return message[: len(message) - pad], corrected
@@ -1,6 +1,7 @@
 import itertools
 import math
 import string
+from collections.abc import Container, Iterator, Sequence
 
 import click
 
@@ -17,14 +18,8 @@ def yield_letters():
 
 
 def get_header(columns: int, delimiter: str) -> str:
-    result = ""
-    letters = yield_letters()
-    for _ in range(columns):
-        title = next(letters)
-        title += " " * (5 - len(title))
-        result += f"{title}{delimiter}"
-
-    return result
+    titles = itertools.islice(yield_letters(), columns)
+    return "".join(f"{title:5}{delimiter}" for title in titles)
 
 
 def highlight_text(output_format: str, text: str) -> str:
@@ -38,36 +33,52 @@ table_delimiters = {"fixed": "\t", "csv": ";"}
 
 
 def format_table(
-    groups: list,
+    groups: Sequence,
     output_format: str,
     column_height: int,
     add_header: bool,
-    highlight: str = None,
-) -> str:
-    result = ""
+    highlight: Container = (),
+    parity: tuple = None,
+) -> Iterator[str]:
+    """Yields the lines of the table, one row at a time.
+
+    Highlight: the indexes of the groups.
+
+    Parity: the row and column checksums, added as the last column and row.
+    """
     columns = math.ceil(len(groups) / column_height)
     delimiter = table_delimiters[output_format]
+    cell_width = 5 if output_format == "fixed" else 0
 
     if add_header:
         header = get_header(columns, delimiter)
-        result += f"#{delimiter}{header}\n"
+        if parity:
+            header += f"P    {delimiter}"
+
+        yield f"#{delimiter}{header}\n"
 
     for row in range(column_height):
+        cells = []
         if add_header:
-            line = f"{row + 1}{delimiter}"
-        else:
-            line = ""
+            cells.append(str(row + 1))
 
-        for column in range(columns):
-            i = row + column * column_height
-            if i >= len(groups):
-                break
-
-            cell = groups[i]
-            if cell == highlight:
+        # The table is column-major, the row takes every column_height group
+        row_groups = groups[row::column_height]
+        for column, cell in enumerate(row_groups):
+            if row + column * column_height in highlight:
                 cell = highlight_text(output_format, cell)
 
-            line += f"{cell}{delimiter}"
+            cells.append(cell)
+
+        if parity:
+            # Keeps the parity column aligned
+            filled = len(cells) - add_header
+            cells += [f"{'':{cell_width}}"] * (columns - filled)
+            cells.append(parity[0][row])
+
+        yield "".join(f"{cell}{delimiter}" for cell in cells) + "\n"
 
-        result += f"{line}\n"
-    return result
+    if parity:
+        cells = ["P"] if add_header else []
+        cells += [f"{checksum:{cell_width}}" for checksum in parity[1]]
+        yield "".join(f"{cell}{delimiter}" for cell in cells) + "\n"
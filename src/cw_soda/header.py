@@ -0,0 +1,76 @@
+__all__ = [
+    "pack_header",
+    "unpack_header",
+    "compression_ids",
+    "HeaderError",
+    "HEADER_MAGIC",
+    "HEADER_VERSION",
+]
+
+# The optional header goes first in the plaintext, so it's authenticated:
+# magic (1 byte)
+# version << 4 | compression id (1 byte)
+# chunk size (varint), 0 when the message is a single piece
+# plaintext length (varint), 0 when unknown in advance (streaming)
+HEADER_VERSION = 1
+
+# No UTF-8 text starts with it, since the version byte isn't a continuation
+HEADER_MAGIC = 0xC5
+
+compression_ids = {"raw": 0, "zlib": 1, "bz2": 2, "lzma": 3, "zdict": 4}
+compression_names = {value: name for name, value in compression_ids.items()}
+
+
+class HeaderError(ValueError):
+    """The message has no valid header, e.g. it was sent without one."""
+
+
+def encode_varint(number: int) -> bytes:
+    result = bytearray()
+    while True:
+        byte = number & 0x7F
+        number >>= 7
+        if number:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def decode_varint(data: bytes, offset: int) -> tuple:
+    number = 0
+    shift = 0
+    while True:
+        if offset >= len(data) or shift > 63:
+            raise HeaderError("Malformed header")
+
+        byte = data[offset]
+        number |= (byte & 0x7F) << shift
+        offset += 1
+        shift += 7
+        if not byte & 0x80:
+            return number, offset
+
+
+def pack_header(compression: str, length: int, chunk_size: int = 0) -> bytes:
+    first = HEADER_VERSION << 4 | compression_ids[compression]
+    return (
+        bytes([HEADER_MAGIC, first]) + encode_varint(chunk_size) + encode_varint(length)
+    )
+
+
+def unpack_header(data: bytes) -> tuple:
+    """Returns the compression, length, chunk size, and the payload offset."""
+    if len(data) < 2 or data[0] != HEADER_MAGIC:
+        raise HeaderError("Missing header, pass the --compression of the message")
+
+    version, compression_id = divmod(data[1], 16)
+    if version != HEADER_VERSION:
+        raise HeaderError(f"Unsupported header version: {version}")
+
+    if compression_id not in compression_names:
+        raise HeaderError(f"Unknown compression id: {compression_id}")
+
+    chunk_size, offset = decode_varint(data, 2)
+    length, offset = decode_varint(data, offset)
+    return compression_names[compression_id], length, chunk_size, offset
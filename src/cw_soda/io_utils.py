@@ -1,27 +1,26 @@
+import codecs
+import itertools
 import re
+from collections.abc import Iterable, Iterator
+from functools import partial
 from io import TextIOBase
 from pathlib import Path
 from typing import BinaryIO, TextIO
 
 import click
 from nacl.encoding import Encoder
-from nacl.public import PrivateKey, PublicKey
-
-from cw_soda.cryptography.kdf import align_salt, hash_salt
-from cw_soda.encoders import (
-    Base26Encoder,
-    Base31Encoder,
-    Base36Encoder,
-    RawEncoder,
-    decode_bytes,
-    encode_str,
-)
+
+from cw_soda.encoders import RawEncoder, decode_bytes, encode_str
+from cw_soda.profiling import region
+from cw_soda.timings import stage
 
 __all__ = [
     "read_str",
     "read_bytes",
     "read_bytes_formatted",
     "read_groups",
+    "tokenize_groups",
+    "LazyGroups",
     "read_message",
     "read_ciphertext",
     "remove_whitespace",
@@ -30,8 +29,17 @@ __all__ = [
     "init_keypair",
     "get_salt",
     "print_stats",
+    "print_throughput",
     "write_output",
+    "output_conflict",
     "read_arg_groups",
+    "read_chunks",
+    "read_ciphertext_stream",
+    "encode_stream",
+    "check_stream_encoding",
+    "write_stream",
+    "write_lines",
+    "StreamCounter",
 ]
 
 
@@ -58,7 +66,7 @@ def format_cw_input(data: str) -> str:
 
 
 def format_input(data: str, in_enc: Encoder) -> str:
-    if in_enc in (Base26Encoder, Base31Encoder, Base36Encoder):
+    if getattr(in_enc, "cw", False):
         return format_cw_input(data)
 
     return data
@@ -75,14 +83,92 @@ def break_into_groups(data: str) -> list:
     return [data[i : i + 5] for i in range(0, len(data), 5)]
 
 
-def read_groups(source: TextIO) -> list:
-    """Reads the input as 5-letter groups."""
-    text = read_str(source)
-    text = format_cw_input(text)
-    return break_into_groups(text)
+def tokenize_groups(
+    source: TextIO, chunk_size: int = 64 * 1024
+) -> Iterator[tuple[int, str]]:
+    """Yields the 5-letter groups with their index, reading the text in chunks."""
+    index = 0
+    tail = ""
+    while chunk := source.read(chunk_size):
+        tail += format_cw_input(chunk)
+        whole = len(tail) - len(tail) % 5
+        for i in range(0, whole, 5):
+            yield index, tail[i : i + 5]
+            index += 1
+
+        tail = tail[whole:]
+
+    if tail:
+        yield index, tail
+
+
+class LazyGroups:
+    """The 5-letter groups of a text file, re-read on every pass.
+
+    A pipe is spooled to a temporary file first, so it can be re-read.
+    One pass at a time, the passes share the file position. The spool is
+    closed on exit, the source is left to its owner.
+    """
+
+    def __init__(self, source: TextIO):
+        self.spool = None
+        if not source.seekable():
+            # pylint: disable=import-outside-toplevel
+            import shutil
+            import tempfile
+
+            # pylint: disable-next=consider-using-with
+            spool = self.spool = tempfile.SpooledTemporaryFile(
+                max_size=1024 * 1024, mode="w+", encoding="utf-8"
+            )
+            shutil.copyfileobj(source, spool)
+            spool.seek(0)
+            source = spool
+
+        self.source = source
+        self.start = source.tell()
+        self.size = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        if self.spool is not None:
+            self.spool.close()
+
+    def __iter__(self) -> Iterator[str]:
+        self.source.seek(self.start)
+        return (group for _, group in tokenize_groups(self.source))
+
+    def __len__(self) -> int:
+        if self.size is None:
+            self.size = sum(1 for _ in self)
+
+        return self.size
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(itertools.islice(self, key.start, key.stop, key.step))
+
+        try:
+            return next(itertools.islice(self, key, None))
+        except StopIteration as ex:
+            raise IndexError(key) from ex
+
+
+def read_groups(source: TextIO) -> LazyGroups:
+    """Reads the input as 5-letter groups, lazily, see LazyGroups."""
+    return LazyGroups(source)
 
 
 def init_keypair(private_key: TextIO, public_key: TextIO, in_enc: Encoder):
+    # The crypto bindings are imported on use, for the startup of the other commands
+    # pylint: disable-next=import-outside-toplevel
+    from nacl.public import PrivateKey, PublicKey
+
     priv = read_bytes_formatted(private_key, in_enc)
     priv = PrivateKey(priv, in_enc)
     pub = read_bytes_formatted(public_key, in_enc)
@@ -91,6 +177,9 @@ def init_keypair(private_key: TextIO, public_key: TextIO, in_enc: Encoder):
 
 
 def get_salt(file: TextIO, decode: bool, in_enc: Encoder) -> bytes:
+    # pylint: disable-next=import-outside-toplevel
+    from cw_soda.cryptography.kdf import align_salt, hash_salt
+
     if decode:
         salt = read_bytes_formatted(file, in_enc)
         salt = in_enc.decode(salt)
@@ -100,30 +189,59 @@ def get_salt(file: TextIO, decode: bool, in_enc: Encoder) -> bytes:
     return hash_salt(salt)
 
 
-def print_stats(plain, cipher):
+def print_stats(plain, cipher, fec_groups: int = 0):
     click.echo(f"Plaintext length: {len(plain)}", err=True)
     click.echo(f"Ciphertext length: {len(cipher)}", err=True)
     overhead = len(cipher) / len(plain)
     click.echo(f"Overhead: {overhead:.3f}", err=True)
+    if fec_groups:
+        letters = len(decode_bytes(cipher))
+        fec_overhead = letters / (letters - fec_groups * 5)
+        click.echo(f"FEC groups: {fec_groups}", err=True)
+        click.echo(f"FEC overhead: {fec_overhead:.3f}", err=True)
 
 
-def write_output(output_file: Path | None, data: bytes, out_enc: Encoder):
-    if output_file is not None:
-        if output_file.exists():
-            click.confirm(
-                f"Overwrite the output file? ({output_file})", default=False, abort=True
-            )
+def print_throughput(messages: int, plain, elapsed: float):
+    elapsed = max(elapsed, 1e-9)
+    click.echo(f"Messages: {messages}", err=True)
+    click.echo(f"Elapsed: {elapsed:.3f}s", err=True)
+    click.echo(f"Throughput: {messages / elapsed:.1f} msg/s", err=True)
+    click.echo(f"Throughput: {len(plain) / elapsed / 1024:.1f} KiB/s", err=True)
 
-        output_file.write_bytes(data)
-    elif out_enc == RawEncoder:
-        click.confirm("Print binary file to the terminal?", default=False, abort=True)
-        click.echo(data)
-    else:
-        click.echo(decode_bytes(data))
+
+def output_conflict(output_file: Path | None, out_enc: Encoder) -> str | None:
+    """The question to ask before writing the output, if any."""
+    if output_file is not None and output_file.exists():
+        return f"Overwrite the output file? ({output_file})"
+
+    if output_file is None and out_enc == RawEncoder:
+        return "Print binary file to the terminal?"
+
+    return None
 
 
+@region("io:write")
+def write_output(
+    output_file: Path | None, data: bytes, out_enc: Encoder, force: bool = False
+):
+    question = output_conflict(output_file, out_enc)
+    if question and not force:
+        click.confirm(question, default=False, abort=True)
+
+    with stage("write"):
+        if output_file is not None:
+            output_file.write_bytes(data)
+        elif out_enc == RawEncoder:
+            click.echo(data)
+        else:
+            click.echo(decode_bytes(data))
+
+
+@region("io:read")
 def read_message(message_file: BinaryIO, in_enc: Encoder):
-    data = message_file.read()
+    with stage("read"):
+        data = message_file.read()
+
     if in_enc == RawEncoder:
         return data
 
@@ -131,8 +249,11 @@ def read_message(message_file: BinaryIO, in_enc: Encoder):
     return encode_str(data)
 
 
+@region("io:read")
 def read_ciphertext(message_file: BinaryIO, in_enc: Encoder):
-    data = message_file.read()
+    with stage("read"):
+        data = message_file.read()
+
     if in_enc == RawEncoder:
         return data
 
@@ -150,3 +271,98 @@ def read_arg_groups(args: tuple[Path], group_size: int):
         result.append(args[i * group_size : i * group_size + group_size])
 
     return result
+
+
+def read_chunks(source: BinaryIO, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    return iter(partial(source.read, chunk_size), b"")
+
+
+def check_stream_encoding(enc: Encoder):
+    if enc != RawEncoder and not hasattr(enc, "encode_stream"):
+        raise click.BadParameter("Streaming requires binary or a blocked encoding")
+
+
+def encode_stream(chunks: Iterable[bytes], out_enc: Encoder) -> Iterator[bytes]:
+    if out_enc == RawEncoder:
+        yield from chunks
+        return
+
+    for text in out_enc.encode_stream(chunks):
+        yield encode_str(text)
+
+
+def read_ciphertext_stream(message_file: BinaryIO, in_enc: Encoder) -> Iterator[bytes]:
+    chunks = read_chunks(message_file)
+    if in_enc == RawEncoder:
+        yield from chunks
+        return
+
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="strict")
+    texts = (decoder.decode(chunk) for chunk in chunks)
+    texts = (remove_whitespace(format_input(text, in_enc)) for text in texts)
+    yield from in_enc.decode_stream(texts)
+    decoder.decode(b"", final=True)
+
+
+class StreamCounter:
+    """Counts the bytes passing through, stands in for the data in print_stats."""
+
+    def __init__(self):
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def count(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        for chunk in chunks:
+            self.length += len(chunk)
+            yield chunk
+
+
+def write_stream(output_file: Path | None, chunks: Iterable[bytes], out_enc: Encoder):
+    if output_file is None:
+        if out_enc == RawEncoder:
+            click.confirm(
+                "Print binary file to the terminal?", default=False, abort=True
+            )
+
+        stdout = click.get_binary_stream("stdout")
+        for chunk in chunks:
+            stdout.write(chunk)
+
+        if out_enc != RawEncoder:
+            stdout.write(b"\n")
+
+        stdout.flush()
+        return
+
+    if output_file.exists():
+        click.confirm(
+            f"Overwrite the output file? ({output_file})", default=False, abort=True
+        )
+
+    try:
+        with output_file.open("wb") as fd:
+            for chunk in chunks:
+                fd.write(chunk)
+    except Exception:
+        output_file.unlink(missing_ok=True)
+        raise
+
+
+def write_lines(output_file: Path | None, lines: Iterable[str], pager: bool = False):
+    """Writes the lines as they come, without joining them in memory."""
+    if output_file is not None:
+        if output_file.exists():
+            click.confirm(
+                f"Overwrite the output file? ({output_file})", default=False, abort=True
+            )
+
+        with output_file.open("w", encoding="utf-8") as fd:
+            for line in lines:
+                click.echo(line, file=fd, nl=False)
+    elif pager:
+        click.echo_via_pager(lines)
+    else:
+        for line in lines:
+            click.echo(line, nl=False)
@@ -1,398 +1,108 @@
+import importlib
 from pathlib import Path
-from typing import BinaryIO, TextIO
 
 import click
-from nacl.public import PrivateKey
-from steganon import LSB_MWS, Image
 
-from cw_soda.archivers import archivers, unarchivers
-from cw_soda.cryptography import public, secret
-from cw_soda.cryptography.kdf import hash_salt, kdf, kdf_profiles
-from cw_soda.encoders import RawEncoder, decode_bytes, encoders
-from cw_soda.error_search import checksum_calculators, error_search
-from cw_soda.format_table import format_table
-from cw_soda.io_utils import (
-    get_salt,
-    init_keypair,
-    print_stats,
-    read_arg_groups,
-    read_bytes,
-    read_bytes_formatted,
-    read_ciphertext,
-    read_groups,
-    read_message,
-    write_output,
+# The command: module, function, short help.
+# The module is imported when the command is invoked, so the startup
+# doesn't pay for the crypto, steganography, and benchmark imports.
+lazy_commands = {
+    "agent": ("agent", "agent_cmd", "Key Agent."),
+    "batch-decrypt": ("batch", "batch_decrypt_cmd", "Decrypt Messages in batch."),
+    "batch-encrypt": ("batch", "batch_encrypt_cmd", "Encrypt Messages in batch."),
+    "bench": ("bench", "bench_cmd", "Benchmark."),
+    "decrypt": ("crypto", "decrypt_cmd", "Decrypt Message."),
+    "decrypt-secret": ("crypto", "decrypt_secret_cmd", "Decrypt Message (symmetric)."),
+    "digest": ("groups", "digest_cmd", "Checksum Digest."),
+    "encrypt": ("crypto", "encrypt_cmd", "Encrypt Message."),
+    "encrypt-secret": ("crypto", "encrypt_secret_cmd", "Encrypt Message (symmetric)."),
+    "find-error": ("groups", "find_error_cmd", "Find Error."),
+    "genkey": ("keys", "genkey_cmd", "Key Generator."),
+    "hide-secret": ("stego", "hide_secret_cmd", "Hide Data (symmetric)."),
+    "kdf": ("keys", "kdf_cmd", "Key Derivation Function."),
+    "kdf-bench": ("bench", "kdf_bench_cmd", "KDF Benchmark."),
+    "print": ("table", "print_cmd", "Print Table."),
+    "pubkey": ("keys", "pubkey_cmd", "Get Public Key."),
+    "repair": ("groups", "repair_cmd", "Repair Message."),
+    "reveal-secret": ("stego", "reveal_secret_cmd", "Reveal Data (symmetric)."),
+    "stego-plan": ("stego", "stego_plan_cmd", "Plan Hiding Data."),
+    "train-dict": ("crypto", "train_dict_cmd", "Train Dictionary."),
+}
+
+
+class LazyGroup(click.Group):
+    """Imports the command module on invocation, the help is stored."""
+
+    def __init__(self, *args, lazy: dict, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lazy = lazy
+
+    def list_commands(self, ctx):
+        return sorted([*self.commands, *self.lazy])
+
+    def get_command(self, ctx, cmd_name):
+        if cmd_name not in self.lazy:
+            return super().get_command(ctx, cmd_name)
+
+        module, name, _ = self.lazy[cmd_name]
+        module = importlib.import_module(f"cw_soda.commands.{module}")
+        return getattr(module, name)
+
+    def format_commands(self, ctx, formatter):
+        rows = []
+        for cmd_name in self.list_commands(ctx):
+            if cmd_name in self.lazy:
+                rows.append((cmd_name, self.lazy[cmd_name][2]))
+            else:
+                command = self.commands[cmd_name]
+                rows.append((cmd_name, command.get_short_help_str()))
+
+        if rows:
+            with formatter.section("Commands"):
+                formatter.write_dl(rows)
+
+
+@click.group(
+    cls=LazyGroup,
+    lazy=lazy_commands,
+    context_settings={"help_option_names": ["-h", "--help"]},
 )
-
-text_file = click.File(mode="r", encoding="utf-8", errors="strict")
-bin_file = click.File(mode="rb")
-in_path = click.Path(dir_okay=False, readable=True, path_type=Path)
-out_path = click.Path(dir_okay=False, writable=True, path_type=Path)
-
-
-@click.group(context_settings={"help_option_names": ["-h", "--help"]})
 @click.version_option(package_name="cw-soda")
-def cli():
-    pass
-
-
-@click.command()
-@click.option("--encoding", default="base36", show_default=True)
-def genkey_cmd(encoding: str):
-    """Key Generator.
-
-    Encoding: base26 | base31 | base36 | base64 | base94
-    """
-    enc = encoders[encoding]
-    key = PrivateKey.generate().encode(enc)
-    click.echo(decode_bytes(key))
-
-
-@click.command()
-@click.argument("private_key_file", type=text_file)
-@click.option("--encoding", default="base36", show_default=True)
-def pubkey_cmd(private_key_file: TextIO, encoding: str):
-    """Get Public Key.
-
-    Encoding: base26 | base31 | base36 | base64 | base94
-    """
-    enc = encoders[encoding]
-    pk = read_bytes_formatted(private_key_file, enc)
-    pk = PrivateKey(pk, enc)
-    pub = pk.public_key.encode(enc)
-    click.echo(decode_bytes(pub))
-
-
-@click.command()
-@click.argument("password_file", type=text_file)
-@click.argument("salt_file", type=text_file)
-@click.option("--encoding", default="base36", show_default=True)
-@click.option("--profile", default="interactive", show_default=True)
-@click.option("--raw-salt", is_flag=True, help="Decode the salt as bytes")
-def kdf_cmd(
-    password_file: TextIO,
-    salt_file: TextIO,
-    encoding: str,
-    profile: str,
-    raw_salt: bool,
-):
-    """Key Derivation Function.
-
-    Encoding: base26 | base31 | base36 | base64 | base94
-
-    Profile: interactive | moderate | sensitive
-    """
-    enc = encoders[encoding]
-    prof = kdf_profiles[profile]
-    password = read_bytes(password_file)
-    salt = get_salt(salt_file, raw_salt, enc)
-    key = kdf(password, salt, prof, enc)
-    click.echo(decode_bytes(key))
-
-
-@click.command()
-@click.argument("private_key_file", type=text_file)
-@click.argument("public_key_file", type=text_file)
-@click.argument("message_file", type=bin_file)
-@click.option("--output-file", type=out_path, help="(Optional)")
-@click.option("--key-encoding", default="base36", show_default=True)
-@click.option("--data-encoding", default="base36", show_default=True)
-@click.option("--compression", default="zlib", show_default=True)
-def encrypt_cmd(
-    private_key_file: TextIO,
-    public_key_file: TextIO,
-    message_file: BinaryIO,
-    output_file: Path,
-    key_encoding: str,
-    data_encoding: str,
-    compression: str,
-):
-    """Encrypt Message.
-
-    Key encoding: base26 | base31 | base36 | base64 | base94
-
-    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
-
-    Compression: zlib | bz2 | lzma | raw
-    """
-    key_enc = encoders[key_encoding]
-    data_enc = encoders[data_encoding]
-    archiver = archivers[compression]
-    data = data_stat = read_message(message_file, data_enc)
-    data = archiver(data)
-    priv, pub = init_keypair(private_key_file, public_key_file, key_enc)
-    encrypted = public.encrypt(priv, pub, data, data_enc)
-    write_output(output_file, encrypted, data_enc)
-    print_stats(data_stat, encrypted)
-
-
-@click.command()
-@click.argument("key_file", type=text_file)
-@click.argument("message_file", type=bin_file)
-@click.option("--output-file", type=out_path, help="(Optional)")
-@click.option("--key-encoding", default="base36", show_default=True)
-@click.option("--data-encoding", default="base36", show_default=True)
-@click.option("--compression", default="zlib", show_default=True)
-def encrypt_secret_cmd(
-    key_file: TextIO,
-    message_file: BinaryIO,
-    output_file: Path,
-    key_encoding: str,
-    data_encoding: str,
-    compression: str,
-):
-    """Encrypt Message (symmetric).
-
-    Key encoding: base26 | base31 | base36 | base64 | base94
-
-    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
-
-    Compression: zlib | bz2 | lzma | raw
-    """
-    key_enc = encoders[key_encoding]
-    data_enc = encoders[data_encoding]
-    archiver = archivers[compression]
-    data = data_stat = read_message(message_file, data_enc)
-    data = archiver(data)
-    key = read_bytes_formatted(key_file, key_enc)
-    encrypted = secret.encrypt(key, data, key_enc, data_enc)
-    write_output(output_file, encrypted, data_enc)
-    print_stats(data_stat, encrypted)
-
-
-@click.command()
-@click.argument("private_key_file", type=text_file)
-@click.argument("public_key_file", type=text_file)
-@click.argument("message_file", type=bin_file)
-@click.option("--output-file", type=out_path, help="(Optional)")
-@click.option("--key-encoding", default="base36", show_default=True)
-@click.option("--data-encoding", default="base36", show_default=True)
-@click.option("--compression", default="zlib", show_default=True)
-def decrypt_cmd(
-    private_key_file: TextIO,
-    public_key_file: TextIO,
-    message_file: BinaryIO,
-    output_file: Path,
-    key_encoding: str,
-    data_encoding: str,
-    compression: str,
-):
-    """Decrypt Message.
-
-    Key encoding: base26 | base31 | base36 | base64 | base94
-
-    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
-
-    Compression: zlib | bz2 | lzma | raw
-    """
-    key_enc = encoders[key_encoding]
-    data_enc = encoders[data_encoding]
-    unarchiver = unarchivers[compression]
-    data = data_stat = read_ciphertext(message_file, data_enc)
-    priv, pub = init_keypair(private_key_file, public_key_file, key_enc)
-    plain = public.decrypt(priv, pub, data, data_enc)
-    plain = unarchiver(plain)
-    write_output(output_file, plain, data_enc)
-    print_stats(plain, data_stat)
-
-
-@click.command()
-@click.argument("key_file", type=text_file)
-@click.argument("message_file", type=bin_file)
-@click.option("--output-file", type=out_path, help="(Optional)")
-@click.option("--key-encoding", default="base36", show_default=True)
-@click.option("--data-encoding", default="base36", show_default=True)
-@click.option("--compression", default="zlib", show_default=True)
-def decrypt_secret_cmd(
-    key_file: TextIO,
-    message_file: BinaryIO,
-    output_file: Path,
-    key_encoding: str,
-    data_encoding: str,
-    compression: str,
-):
-    """Decrypt Message (symmetric).
-
-    Key encoding: base26 | base31 | base36 | base64 | base94
-
-    Data encoding: base26 | base31 | base36 | base64 | base94 | binary
-
-    Compression: zlib | bz2 | lzma | raw
-    """
-    key_enc = encoders[key_encoding]
-    data_enc = encoders[data_encoding]
-    unarchiver = unarchivers[compression]
-    data = data_stat = read_ciphertext(message_file, data_enc)
-    key = read_bytes_formatted(key_file, key_enc)
-    plain = secret.decrypt(key, data, key_enc, data_enc)
-    plain = unarchiver(plain)
-    write_output(output_file, plain, data_enc)
-    print_stats(plain, data_stat)
-
-
-@click.command()
-@click.argument("message_file", type=text_file)
-@click.option("--output-format", default="fixed", show_default=True)
-@click.option("--column-height", default=10, show_default=True)
-@click.option("--no-header", is_flag=True)
-def print_cmd(
-    message_file: TextIO, output_format: str, column_height: int, no_header: bool
-):
-    """Print Table.
-
-    This only works with Base26, Base31, and Base36.
-
-    Output format: fixed | csv
-    """
-    add_header = not no_header
-    groups = read_groups(message_file)
-    table = format_table(groups, output_format, column_height, add_header)
-    click.echo(table)
-
-
-@click.command()
-@click.argument("message_file", type=text_file)
-@click.option("--checksum", default="crc8", show_default=True)
-@click.option("--output-format", default="fixed", show_default=True)
-@click.option("--column-height", default=10, show_default=True)
-@click.option("--no-header", is_flag=True)
-def find_error_cmd(
-    message_file: TextIO,
-    checksum: str,
-    output_format: str,
-    column_height: int,
-    no_header: bool,
-):
-    """Find Error.
-
-    This only works with Base26, Base31, and Base36.
-
-    Checksum: crc8 | crc16 | crc32
-
-    Output format: fixed | csv
-    """
-    add_header = not no_header
-    calc = checksum_calculators[checksum]
-    groups = read_groups(message_file)
-    error = error_search(groups, calc)
-    if error is None:
-        click.echo("The file is correct")
-    else:
-        click.echo(f"The error is in: {error}")
-        table = format_table(groups, output_format, column_height, add_header, error)
-        click.echo(table)
-
-
-@click.command()
-@click.argument("input_image", type=in_path)
-@click.argument("output_image", type=out_path)
-@click.argument("files", type=in_path, nargs=-1)
-@click.option("--profile", default="interactive", show_default=True)
-@click.option("--compression", default="zlib", show_default=True)
-def hide_secret_cmd(
-    input_image: Path,
-    output_image: Path,
-    files: tuple[Path],
-    profile: str,
-    compression: str,
-):
-    """Hide Data (symmetric).
-
-    Files: seed password salt plaintext [seed password salt plaintext]...
-
-    Profile: interactive | moderate | sensitive
-
-    Compression: zlib | bz2 | lzma | raw
-    """
-    profile = kdf_profiles[profile]
-    archiver = archivers[compression]
-
-    args = read_arg_groups(files, 4)
-    seeds = [read_bytes(group[0]) for group in args]
-    passwords = [read_bytes(group[1]) for group in args]
-    hashes = [hash_salt(read_bytes(group[2])) for group in args]
-    keys = [kdf(pw, salt, profile, RawEncoder) for pw, salt in zip(passwords, hashes)]
-    encrypted = []
-    for key, group in zip(keys, args):
-        data = archiver(group[3].read_bytes())
-        data = secret.encrypt(key, data, RawEncoder, RawEncoder)
-        encrypted.append(data)
-
-    image = Image.open(input_image)
-    lsb_mws = LSB_MWS(image, seeds)
-    groups = len(args)
-    for i in range(groups):
-        lsb_mws.hide(encrypted[i])
-        if i < groups - 1:
-            lsb_mws.next()
-
-    lsb_mws.finalize()
-    if output_image.exists():
-        click.confirm(
-            f"Overwrite the output file? ({output_image})", default=False, abort=True
-        )
-
-    image.save(output_image)
-
-
-@click.command()
-@click.argument("input_image", type=in_path)
-@click.argument("files", type=in_path, nargs=-1)
-@click.option("--profile", default="interactive", show_default=True)
-@click.option("--compression", default="zlib", show_default=True)
-def reveal_secret_cmd(
-    input_image: Path,
-    files: tuple[Path],
-    profile: str,
-    compression: str,
+@click.option(
+    "--profile-out",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Profile the command into the file",
+)
+@click.option(
+    "--profile-format",
+    type=click.Choice(["pstats", "collapsed"]),
+    default="pstats",
+    show_default=True,
+    help="cProfile stats, or sampled stacks for the flame graphs",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, writable=True, path_type=Path),
+    help="Add the OpenMetrics counters of the command to the file",
+)
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    profile_out: Path | None,
+    profile_format: str,
+    metrics_file: Path | None,
 ):
-    """Reveal Data (symmetric).
-
-    Files: seed password salt output [seed password salt output]...
-
-    Profile: interactive | moderate | sensitive
-
-    Compression: zlib | bz2 | lzma | raw
-    """
-    profile = kdf_profiles[profile]
-    unarchiver = unarchivers[compression]
-
-    args = read_arg_groups(files, 4)
-    seeds = [read_bytes(group[0]) for group in args]
-    passwords = [read_bytes(group[1]) for group in args]
-    hashes = [hash_salt(read_bytes(group[2])) for group in args]
-    keys = [kdf(pw, salt, profile, RawEncoder) for pw, salt in zip(passwords, hashes)]
-    outputs = [group[3] for group in args]
-
-    image = Image.open(input_image)
-    lsb_mws = LSB_MWS(image, seeds)
-    groups = len(args)
-    for i in range(groups):
-        encrypted = lsb_mws.extract()
-        if i < groups - 1:
-            lsb_mws.next()
+    # pylint: disable=import-outside-toplevel
+    if metrics_file is not None:
+        from cw_soda.metrics import collecting
 
-        data = secret.decrypt(keys[i], encrypted, RawEncoder, RawEncoder)
-        data = unarchiver(data)
-        if outputs[i].exists():
-            click.confirm(
-                f"Overwrite the output file? ({outputs[i]})", default=False, abort=True
-            )
+        ctx.with_resource(collecting(metrics_file, ctx.invoked_subcommand))
 
-        outputs[i].write_bytes(data)
+    if profile_out is not None:
+        from cw_soda.profiling import start_profile
 
+        ctx.call_on_close(start_profile(profile_format, profile_out))
 
-cli.add_command(genkey_cmd)
-cli.add_command(pubkey_cmd)
-cli.add_command(kdf_cmd)
-cli.add_command(encrypt_cmd)
-cli.add_command(encrypt_secret_cmd)
-cli.add_command(decrypt_cmd)
-cli.add_command(decrypt_secret_cmd)
-cli.add_command(print_cmd)
-cli.add_command(find_error_cmd)
-cli.add_command(hide_secret_cmd)
-cli.add_command(reveal_secret_cmd)
 
 if __name__ == "__main__":
-    cli()
+    cli()  # pylint: disable=no-value-for-parameter
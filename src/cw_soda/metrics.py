@@ -0,0 +1,259 @@
+import fcntl
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import Context, ContextVar
+from pathlib import Path
+
+from cw_soda.timings import Timings, active_timings
+
+__all__ = [
+    "Registry",
+    "collecting",
+    "count",
+    "observe",
+    "timer",
+    "count_bytes",
+    "observe_ratio",
+    "flush",
+    "worker_context",
+    "metric_families",
+]
+
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+kdf_buckets = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32)
+ratio_buckets = (0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1, 1.25, 1.5, 2)
+
+# The family: type, help, histogram buckets
+metric_families = {
+    "soda_bytes": ("counter", "Message bytes read and written", ()),
+    "soda_compression_ratio": (
+        "histogram",
+        "Compressed size over the plaintext size",
+        ratio_buckets,
+    ),
+    "soda_stage_seconds": (
+        "histogram",
+        "Wall time of a stage per run",
+        latency_buckets,
+    ),
+    "soda_kdf_derivations": ("counter", "Argon2 derivations", ()),
+    "soda_kdf_seconds": ("histogram", "Argon2 derivation time", kdf_buckets),
+    "soda_decrypt_failures": ("counter", "Messages that failed to decrypt", ()),
+    "soda_batch_jobs": ("counter", "Batch jobs by outcome", ()),
+    "soda_batch_job_seconds": ("histogram", "Batch job time", latency_buckets),
+    "soda_agent_requests": ("counter", "Agent requests by outcome", ()),
+}
+
+suffix_order = {"_total": 0, "_bucket": 0, "_count": 1, "_sum": 2}
+
+sample_re = re.compile(r"^(\w+?)(_total|_bucket|_count|_sum)(\{.*\})? (\S+)$")
+label_re = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+# The registry of the running command, the worker threads get it from
+# worker_context
+active_registry = ContextVar("active_registry", default=None)
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def unescape(value: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m[1] == "n" else m[1], value)
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+
+    if float(value).is_integer() and abs(value) < 2**53:
+        return str(int(value))
+
+    return repr(float(value))
+
+
+def format_sample(key: tuple, value: float) -> str:
+    family, suffix, labels, le = key
+    pairs = [*labels, *([("le", format_value(le))] if le is not None else [])]
+    if not pairs:
+        return f"{family}{suffix} {format_value(value)}"
+
+    text = ",".join(f'{name}="{escape(label)}"' for name, label in pairs)
+    return f"{family}{suffix}{{{text}}} {format_value(value)}"
+
+
+def parse_sample(line: str) -> tuple | None:
+    match = sample_re.match(line)
+    if match is None or match[1] not in metric_families:
+        return None
+
+    labels = dict(
+        (name, unescape(value)) for name, value in label_re.findall(match[3] or "")
+    )
+    le = labels.pop("le", None)
+    le = float(le) if le is not None else None
+    return (match[1], match[2], tuple(sorted(labels.items())), le), float(match[4])
+
+
+def read_samples(path: Path) -> dict:
+    samples = {}
+    if not path.is_file():
+        return samples
+
+    with path.open("r", encoding="utf-8") as fd:
+        for line in fd:
+            sample = parse_sample(line.strip())
+            if sample is not None:
+                samples[sample[0]] = sample[1]
+
+    return samples
+
+
+def format_samples(samples: dict) -> str:
+    lines = []
+    for family, (kind, help_text, _) in metric_families.items():
+        keys = [key for key in samples if key[0] == family]
+        if not keys:
+            continue
+
+        lines.append(f"# TYPE {family} {kind}")
+        unit = family.rpartition("_")[2]
+        if unit in ("seconds", "bytes"):
+            lines.append(f"# UNIT {family} {unit}")
+
+        lines.append(f"# HELP {family} {help_text}")
+        keys.sort(key=lambda k: (k[2], suffix_order[k[1]], k[3] or 0))
+        lines.extend(format_sample(key, samples[key]) for key in keys)
+
+    lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+class Registry:
+    """The counters and histograms, added to the OpenMetrics file on flush.
+
+    The file keeps the totals of all the runs, so the counters only grow,
+    and it's replaced atomically for the node_exporter textfile collector.
+    """
+
+    def __init__(self, path: Path, command: str | None = None):
+        self.path = path
+        self.command = command
+        self.samples = {}
+        self.lock = threading.Lock()
+
+    def add(self, key: tuple, value: float):
+        self.samples[key] = self.samples.get(key, 0) + value
+
+    def count(self, family: str, value: float = 1, **labels):
+        labels = tuple(sorted(labels.items()))
+        with self.lock:
+            self.add((family, "_total", labels, None), value)
+
+    def observe(self, family: str, value: float, **labels):
+        buckets = metric_families[family][2]
+        labels = tuple(sorted(labels.items()))
+        with self.lock:
+            for bound in (*buckets, math.inf):
+                self.add((family, "_bucket", labels, bound), value <= bound)
+
+            self.add((family, "_count", labels, None), 1)
+            self.add((family, "_sum", labels, None), value)
+
+    def flush(self):
+        with self.lock:
+            samples, self.samples = self.samples, {}
+
+        if not samples:
+            return
+
+        lock_path = self.path.with_name(f"{self.path.name}.lock")
+        with open(lock_path, "a", encoding="utf-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            totals = read_samples(self.path)
+            for key, value in samples.items():
+                totals[key] = totals.get(key, 0) + value
+
+            temp = self.path.with_name(f".{self.path.name}.tmp")
+            temp.write_text(format_samples(totals), encoding="utf-8")
+            os.chmod(temp, 0o644)
+            os.replace(temp, self.path)
+
+
+@contextmanager
+def collecting(path: Path, command: str | None):
+    """Records the metrics of the command, then adds them to the file.
+
+    The stage times come from the timings, see cw_soda.timings.
+    """
+    registry = Registry(path, command)
+    timings = Timings()
+    registry_token = active_registry.set(registry)
+    token = active_timings.set(timings)
+    try:
+        yield registry
+    finally:
+        active_timings.reset(token)
+        active_registry.reset(registry_token)
+        for name, stats in timings.stages.items():
+            registry.observe(
+                "soda_stage_seconds", stats["wall"], command=command, stage=name
+            )
+
+        registry.flush()
+
+
+def count(family: str, value: float = 1, **labels):
+    registry = active_registry.get()
+    if registry is not None:
+        registry.count(family, value, **labels)
+
+
+def observe(family: str, value: float, **labels):
+    registry = active_registry.get()
+    if registry is not None:
+        registry.observe(family, value, **labels)
+
+
+@contextmanager
+def timer(family: str, **labels):
+    """Observes the time of the block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(family, time.perf_counter() - start, **labels)
+
+
+def count_bytes(encoding: str, read: int, written: int):
+    registry = active_registry.get()
+    if registry is not None:
+        labels = {"command": registry.command, "encoding": encoding}
+        registry.count("soda_bytes", read, direction="in", **labels)
+        registry.count("soda_bytes", written, direction="out", **labels)
+
+
+def observe_ratio(archiver: str, plain: int, compressed: int):
+    if plain:
+        observe("soda_compression_ratio", compressed / plain, archiver=archiver)
+
+
+def flush():
+    """Adds the metrics so far to the file, for the long-running commands."""
+    registry = active_registry.get()
+    if registry is not None:
+        registry.flush()
+
+
+def worker_context() -> Context:
+    """The context of a worker thread, with the registry of the command.
+
+    The timings aren't shared, they aren't thread-safe.
+    """
+    context = Context()
+    context.run(active_registry.set, active_registry.get())
+    return context
@@ -0,0 +1,99 @@
+import functools
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+__all__ = ["region", "start_profile", "Sampler"]
+
+# Seconds between the stack samples
+SAMPLE_INTERVAL = 0.001
+
+
+def region(name: str):
+    """Tags the function as a named region of the profiles.
+
+    The wrapper's code is renamed, so both cProfile and the sampler show
+    the region as a frame of its own, e.g. encode:blocks.
+    """
+
+    def decorate(func):
+        def wrapper(*args, **kwargs):
+            return func(*args, **kwargs)
+
+        wrapper.__code__ = wrapper.__code__.replace(co_name=name, co_qualname=name)
+        return functools.wraps(func)(wrapper)
+
+    return decorate
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """Samples the stack of the thread that started it, in collapsed form.
+
+    A line is the frames from the root separated by ; and the sample
+    count, the input of flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.target = threading.get_ident()
+        self.samples = Counter()
+        self.running = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        while self.running.is_set():
+            time.sleep(self.interval)
+            # pylint: disable-next=protected-access
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame))
+                frame = frame.f_back
+
+            if stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self.running.set()
+        self.thread.start()
+
+    def stop(self):
+        self.running.clear()
+        self.thread.join()
+
+    def write(self, path: Path):
+        with path.open("w", encoding="utf-8") as fd:
+            for stack, count in self.samples.most_common():
+                fd.write(f"{stack} {count}\n")
+
+
+def start_profile(output_format: str, path: Path):
+    """Profiles the current thread, returns the function that stops it."""
+    if output_format == "collapsed":
+        sampler = Sampler()
+        sampler.start()
+
+        def stop_sampler():
+            sampler.stop()
+            sampler.write(path)
+
+        return stop_sampler
+
+    # Imported here, the regions are tagged at every startup
+    import cProfile  # pylint: disable=import-outside-toplevel
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    def stop_profiler():
+        profiler.disable()
+        profiler.dump_stats(path)
+
+    return stop_profiler
@@ -0,0 +1,31 @@
+from nacl.secret import SecretBox
+
+__all__ = ["carrier_capacity", "sealed_size", "check_carrier"]
+
+# LSB_MWS hides 3 bits per pixel, and caps the data at a byte per 3 pixels.
+# Every seed takes 12 pixels for its 4-byte data size, and its last pixel
+# may be used partly.
+BITS_PER_PIXEL = 3
+SEED_PIXELS = 13
+
+
+def carrier_capacity(width: int, height: int, seeds: int) -> int:
+    """The bytes LSB_MWS fits into the image, shared by all the seeds."""
+    pixels = width * height
+    free = (pixels - SEED_PIXELS * seeds) * BITS_PER_PIXEL // 8
+    return max(0, min(pixels // 3, free))
+
+
+def sealed_size(compressed: int) -> int:
+    """The SecretBox size: nonce, MAC, and the compressed data."""
+    return SecretBox.NONCE_SIZE + SecretBox.MACBYTES + compressed
+
+
+def check_carrier(bands: int, capacity: int, payloads: list):
+    """Raises ValueError, unless the image holds the sealed payloads."""
+    if bands < 3:
+        raise ValueError("The image needs 3 color channels or more, e.g. RGB")
+
+    total = sum(payloads)
+    if total > capacity:
+        raise ValueError(f"The payloads take {total} bytes, the image holds {capacity}")
@@ -0,0 +1,154 @@
+import json
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+import click
+
+__all__ = ["stage", "timed", "recording", "Timings", "timings_formats"]
+
+timings_formats = ["table", "json"]
+
+# The worker threads don't inherit the context, so they aren't recorded
+active_timings = ContextVar("active_timings", default=None)
+
+
+class Frame:
+    def __init__(self, stats: dict, wall: float, cpu: float, memory: int):
+        self.stats = stats
+        self.wall = wall
+        self.cpu = cpu
+        self.memory = memory
+        self.peak = memory
+
+
+class Timings:
+    """The wall time, CPU time, and tracemalloc peak of every stage.
+
+    The time is exclusive: a nested stage pauses its parent, so a chain
+    of generators splits the time between its stages. The peak is the
+    Python allocations above the memory at the stage start, including
+    the nested stages.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.stack = []
+
+    @contextmanager
+    def stage(self, name: str):
+        # tracemalloc imports pickle, the commands without timings don't pay for it
+        import tracemalloc  # pylint: disable=import-outside-toplevel
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        memory, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            self.pause(self.stack[-1], wall, cpu, peak)
+
+        stats = self.stages.setdefault(
+            name, {"wall": 0.0, "cpu": 0.0, "peak": 0, "calls": 0}
+        )
+        stats["calls"] += 1
+        tracemalloc.reset_peak()
+        frame = Frame(stats, wall, cpu, memory)
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            wall, cpu = time.perf_counter(), time.process_time()
+            _, peak = tracemalloc.get_traced_memory()
+            self.stack.pop()
+            self.pause(frame, wall, cpu, peak)
+            stats["peak"] = max(stats["peak"], frame.peak - frame.memory)
+            if self.stack:
+                parent = self.stack[-1]
+                parent.wall, parent.cpu = wall, cpu
+                parent.peak = max(parent.peak, frame.peak)
+                tracemalloc.reset_peak()
+
+    @staticmethod
+    def pause(frame: Frame, wall: float, cpu: float, peak: int):
+        frame.stats["wall"] += wall - frame.wall
+        frame.stats["cpu"] += cpu - frame.cpu
+        frame.peak = max(frame.peak, peak)
+
+    def total(self) -> dict:
+        return {
+            "wall": sum(stats["wall"] for stats in self.stages.values()),
+            "cpu": sum(stats["cpu"] for stats in self.stages.values()),
+            "peak": max((stats["peak"] for stats in self.stages.values()), default=0),
+            "calls": sum(stats["calls"] for stats in self.stages.values()),
+        }
+
+    def format_table(self) -> Iterator[str]:
+        yield f"{'Stage':<12}{'Wall, s':>10}{'CPU, s':>10}{'Peak, KiB':>12}{'Calls':>8}"
+        rows = [*self.stages.items(), ("total", self.total())]
+        for name, stats in rows:
+            yield (
+                f"{name:<12}{stats['wall']:>10.4f}{stats['cpu']:>10.4f}"
+                f"{stats['peak'] / 1024:>12.1f}{stats['calls']:>8}"
+            )
+
+    def format_json(self) -> str:
+        return json.dumps({"stages": self.stages, "total": self.total()}, indent=2)
+
+
+def stage(name: str):
+    """Records the block as a stage of the running command, if any."""
+    timings = active_timings.get()
+    if timings is None:
+        return nullcontext()
+
+    return timings.stage(name)
+
+
+def timed(name: str, chunks: Iterable) -> Iterator:
+    """Records the time spent producing every chunk as a stage."""
+    iterator = iter(chunks)
+    while True:
+        with stage(name):
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+
+        yield chunk
+
+
+@contextmanager
+def recording(output_format: str | None):
+    """Records the stages inside the block, and prints them to stderr.
+
+    The timings already recorded for the metrics are shared.
+    """
+    if output_format is None:
+        yield None
+        return
+
+    import tracemalloc  # pylint: disable=import-outside-toplevel
+
+    timings = active_timings.get()
+    token = None
+    if timings is None:
+        timings = Timings()
+        token = active_timings.set(timings)
+
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+
+    try:
+        yield timings
+    finally:
+        if token is not None:
+            active_timings.reset(token)
+
+        if not tracing:
+            tracemalloc.stop()
+
+    if output_format == "json":
+        click.echo(timings.format_json(), err=True)
+    else:
+        for line in timings.format_table():
+            click.echo(line, err=True)
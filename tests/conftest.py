@@ -0,0 +1,15 @@
+from pathlib import Path
+
+import pytest
+
+from cw_soda.encoders.codec import ALPHABETS_ENV
+
+
+@pytest.fixture(autouse=True, scope="session")
+def user_alphabets():
+    """The user alphabets of the tests, not the ones in ~/.config."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setenv(
+            ALPHABETS_ENV, str(Path(__file__).parent / "data/alphabets.toml")
+        )
+        yield
@@ -0,0 +1,87 @@
+import pytest
+
+from cw_soda.archivers import (
+    archivers,
+    compress_auto,
+    compress_header,
+    compress_zdict,
+    decompress_header,
+    decompress_zdict,
+    race_candidates,
+)
+from cw_soda.benchmark import generate_corpus
+from cw_soda.dictionaries import train_dictionary, using_dictionary
+from cw_soda.header import HeaderError, compression_ids, pack_header, unpack_header
+
+
+@pytest.mark.parametrize("size", [0, 20, 300, 20_000])
+def test_compress_auto(size):
+    data = generate_corpus(size)
+    compressed = compress_auto(data)
+    assert decompress_header(compressed) == data
+
+    smallest = min(len(archivers[name](data)) for name in compression_ids)
+    assert len(compressed) <= smallest + len(pack_header("raw", size))
+
+
+def test_compress_auto_budget():
+    data = generate_corpus(20_000)
+    compressed = compress_auto(data, budget=0)
+    assert decompress_header(compressed) == data
+    assert len(compressed) <= len(data) + len(pack_header("raw", len(data)))
+
+
+def test_decompress_header_invalid():
+    with pytest.raises(ValueError):
+        decompress_header(b"\xff")
+
+    with pytest.raises(HeaderError):
+        decompress_header(b"\xc5\x1f\x00\x00")
+
+    # A raw message that looks like an old header
+    with pytest.raises(HeaderError):
+        decompress_header(b"\x11\x00\x07message")
+
+    data = compress_header(b"message", "zlib")
+    with pytest.raises(ValueError):
+        decompress_header(pack_header("zlib", 8) + data[4:])
+
+
+@pytest.mark.parametrize("compression", list(compression_ids))
+def test_header(compression):
+    for length in [0, 1, 127, 128, 300, 2**40]:
+        header = pack_header(compression, length, 65536)
+        assert unpack_header(header + b"data") == (
+            compression,
+            length,
+            65536,
+            len(header),
+        )
+
+    data = generate_corpus(1000)
+    assert decompress_header(compress_header(data, compression)) == data
+
+
+def test_zdict():
+    data = generate_corpus(300)
+    compressed = compress_zdict(data)
+    assert decompress_zdict(compressed) == data
+    assert len(compressed) < len(archivers["zlib"](data))
+
+    dictionary = train_dictionary(generate_corpus(20_000, seed=1).splitlines(), 1024)
+    assert 0 < len(dictionary) <= 1024
+
+    compressed = compress_zdict(data, dictionary)
+    with pytest.raises(ValueError):
+        decompress_zdict(compressed)
+
+    with using_dictionary(dictionary):
+        assert decompress_zdict(compressed) == data
+        assert compress_zdict(data) == compressed
+        assert race_candidates(data, None)["zdict"] == compressed
+
+    with pytest.raises(ValueError):
+        decompress_zdict(compressed)
+
+    with pytest.raises(ValueError):
+        decompress_zdict(compressed[:-3])
@@ -0,0 +1,50 @@
+import random
+import zlib
+
+import pytest
+from crc import Calculator, Crc8, Crc16, Crc32
+
+from cw_soda.checksums import PrefixChecksums, TableCrc, ZlibCrc32
+
+configs = [Crc8.CCITT, Crc16.X25, Crc32.POSIX, Crc32.CRC32]
+
+
+@pytest.mark.parametrize("config", configs)
+def test_table_crc(config):
+    crc = TableCrc(config.value)
+    reference = Calculator(config)
+    rnd = random.Random(config.value.width)
+    for size in [0, 1, 5, 17, 300]:
+        first = rnd.randbytes(size)
+        second = rnd.randbytes(rnd.randrange(40))
+        assert crc.checksum(first) == reference.checksum(first)
+        assert crc.checksum([first, second]) == reference.checksum(first + second)
+
+        combined = crc.combine(crc.checksum(first), crc.checksum(second), len(second))
+        assert combined == reference.checksum(first + second)
+
+
+@pytest.mark.parametrize("config", configs)
+def test_prefix_checksums(config):
+    crc = TableCrc(config.value)
+    reference = Calculator(config)
+    rnd = random.Random(1)
+    chunks = [rnd.randbytes(rnd.randrange(1, 11)) for _ in range(60)]
+    prefixes = PrefixChecksums(crc, chunks)
+    assert len(prefixes) == 60
+    for _ in range(100):
+        start = rnd.randrange(61)
+        end = rnd.randrange(start, 61)
+        assert prefixes.segment(start, end) == reference.checksum(
+            b"".join(chunks[start:end])
+        )
+
+
+def test_zlib_crc32():
+    crc = ZlibCrc32(Crc32.CRC32.value)
+    data = random.Random(2).randbytes(1000)
+    assert crc.checksum(data) == zlib.crc32(data)
+    assert crc.checksum([data[:10], data[10:]]) == zlib.crc32(data)
+
+    prefixes = PrefixChecksums(crc, [data[:100], data[100:500], data[500:]])
+    assert prefixes.segment(1, 3) == zlib.crc32(data[100:])
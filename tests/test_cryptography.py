@@ -0,0 +1,52 @@
+import os
+
+from nacl.encoding import RawEncoder
+from nacl.public import Box, PrivateKey
+
+from cw_soda.cryptography.kdf import (
+    hash_salt,
+    kdf,
+    kdf_many,
+    kdf_profiles,
+    kdf_workers,
+)
+from cw_soda.cryptography.public import SharedKeyCache
+
+
+def test_shared_key_cache():
+    cache = SharedKeyCache(maxsize=2)
+    alice = PrivateKey.generate()
+    bob = PrivateKey.generate()
+    carol = PrivateKey.generate()
+
+    box = cache.box(alice, bob.public_key)
+    assert box.shared_key() == Box(alice, bob.public_key).shared_key()
+    assert len(cache) == 1
+
+    cached = cache.box(alice, bob.public_key)
+    assert cached.shared_key() == box.shared_key()
+    assert len(cache) == 1
+
+    first = next(iter(cache.keys.values()))
+    cache.box(alice, carol.public_key)
+    cache.box(bob, carol.public_key)
+    assert len(cache) == 2
+    assert first == bytes(len(first))
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_kdf_workers():
+    profile = kdf_profiles["sensitive"]
+    assert kdf_workers(4, profile, memory=profile[1] * 10) == min(4, os.cpu_count())
+    assert kdf_workers(4, profile, memory=profile[1] * 2) == 1
+    assert kdf_workers(4, profile, memory=0) == 1
+
+
+def test_kdf_many():
+    profile = kdf_profiles["interactive"]
+    passwords = [b"password1", b"password2", b"password3"]
+    salts = [hash_salt(b"salt1"), hash_salt(b"salt2"), hash_salt(b"salt3")]
+    keys = kdf_many(passwords, salts, profile, RawEncoder)
+    assert keys == [kdf(pw, s, profile, RawEncoder) for pw, s in zip(passwords, salts)]
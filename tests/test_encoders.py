@@ -1,10 +1,33 @@
+import gc
+import random
+import time
+
+import click
+import pytest
+
 from cw_soda.encoders import (
+    Base26BlockedEncoder,
     Base26Encoder,
+    Base31BlockedEncoder,
     Base31Encoder,
+    Base36BlockedEncoder,
     Base36Encoder,
     Base64Encoder,
+    Base94BlockedEncoder,
     Base94Encoder,
+    EncoderTable,
+    compile_codec,
+    decode_bytes,
+    encode_str,
+    encoders,
+    functions,
+    load_alphabets,
 )
+from cw_soda.encoders.base26_encoder import ALPHABET as ALPHABET26
+from cw_soda.encoders.base31_encoder import ALPHABET as ALPHABET31
+from cw_soda.encoders.base36_encoder import ALPHABET as ALPHABET36
+from cw_soda.encoders.base94_encoder import ALPHABET as ALPHABET94
+from cw_soda.encoders.functions import base_to_bytes, bytes_to_base, to_digits
 
 
 def test_encoders():
@@ -23,3 +46,194 @@ def test_encoders():
 
     assert Base94Encoder.encode(b"\x64") == b"\"'"
     assert Base94Encoder.decode(b"\"'") == b"\x64"
+
+
+def reference_encode(data: bytes, alphabet: str) -> str:
+    result = []
+    number = int.from_bytes(data, byteorder="big")
+    while number:
+        number, remainder = divmod(number, len(alphabet))
+        result.append(alphabet[remainder])
+
+    return "".join(reversed(result))
+
+
+def reference_decode(data: str, alphabet: str) -> bytes:
+    number = 0
+    for digit in data:
+        number = number * len(alphabet) + alphabet.index(digit)
+
+    return number.to_bytes((number.bit_length() + 7) // 8, byteorder="big")
+
+
+def best_time(func, arg) -> float:
+    # The collector pauses depend on the other tests' garbage
+    gc.collect()
+    gc.disable()
+    try:
+        timings = []
+        for _ in range(5):
+            start = time.perf_counter()
+            func(arg)
+            timings.append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+
+    return min(timings)
+
+
+@pytest.mark.parametrize("alphabet", [ALPHABET26, ALPHABET31, ALPHABET36, ALPHABET94])
+def test_conversion_matches_reference(alphabet):
+    rnd = random.Random(alphabet)
+    for size in [0, 1, 2, 31, 32, 33, 64, 65, 500, 3000]:
+        data = bytes(rnd.randrange(3)) + rnd.randbytes(size)
+        encoded = bytes_to_base(data, alphabet)
+        assert encoded == reference_encode(data, alphabet)
+        assert base_to_bytes(encoded, alphabet) == reference_decode(encoded, alphabet)
+        padded = alphabet[0] * 3 + encoded
+        assert base_to_bytes(padded, alphabet) == reference_decode(padded, alphabet)
+
+
+def test_conversion_invalid_digit():
+    with pytest.raises(ValueError):
+        base_to_bytes("ABC!", ALPHABET26)
+
+    assert to_digits("ГЗ", ALPHABET31) == bytes([3, 7])
+    for source in ["ГЗA", "Г\x00", "ГЖЁ", "Г€"]:
+        with pytest.raises(ValueError, match="Invalid digit"):
+            to_digits(source, ALPHABET31)
+
+
+def divmod_bits(func, arg) -> int:
+    """The bits divided by the conversion, its cost without the timing noise."""
+    bits = 0
+
+    def counted(number, divisor):
+        nonlocal bits
+        bits += number.bit_length()
+        return divmod(number, divisor)
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(functions, "divmod", counted, raising=False)
+        func(arg)
+
+    return bits
+
+
+@pytest.mark.parametrize("encoder", [Base26Encoder, Base36Encoder, Base94Encoder])
+def test_encoding_work(encoder):
+    # Splitting the number divides n log n bits, ~9x when the input grows 8x,
+    # converting a digit at a time divides n^2 bits, 64x
+    small = random.Random(1).randbytes(16_000)
+    large = random.Random(2).randbytes(128_000)
+    assert divmod_bits(encoder.encode, large) < 12 * divmod_bits(encoder.encode, small)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("encoder", [Base26Encoder, Base36Encoder, Base94Encoder])
+def test_conversion_scaling(encoder):
+    # A quadratic conversion grows 64x when the input grows 8x, Karatsuba ~27x
+    small = random.Random(1).randbytes(16_000)
+    large = random.Random(2).randbytes(128_000)
+    assert best_time(encoder.encode, large) < 40 * best_time(encoder.encode, small)
+
+    small = encoder.encode(small)
+    large = encoder.encode(large)
+    assert best_time(encoder.decode, large) < 40 * best_time(encoder.decode, small)
+
+
+@pytest.mark.parametrize(
+    "encoder",
+    [
+        Base26BlockedEncoder,
+        Base31BlockedEncoder,
+        Base36BlockedEncoder,
+        Base94BlockedEncoder,
+    ],
+)
+def test_blocked_encoders(encoder):
+    rnd = random.Random(7)
+    for size in range(0, 40):
+        data = bytes(3) + rnd.randbytes(size)
+        encoded = encoder.encode(data)
+        assert encoder.decode(encoded) == data
+
+        chunks = [data[i : i + 5] for i in range(0, len(data), 5)]
+        streamed = "".join(encoder.encode_stream(chunks))
+        assert encode_str(streamed) == encoded
+
+        text = decode_bytes(encoded)
+        chunks = [text[i : i + 3] for i in range(0, len(text), 3)]
+        assert b"".join(encoder.decode_stream(chunks)) == data
+
+
+def test_blocked_encoders_fixed_width():
+    assert Base36BlockedEncoder.encode(bytes(7)) == b"0" * 11
+    assert Base36BlockedEncoder.encode(b"\x64") == b"2S"
+    assert Base36BlockedEncoder.decode(b"00000000000" + b"2S") == bytes(7) + b"\x64"
+
+    with pytest.raises(ValueError):
+        Base36BlockedEncoder.decode(b"0" * 12)
+
+    with pytest.raises(ValueError):
+        Base36BlockedEncoder.decode(b"ZZ")
+
+
+def test_compile_codec():
+    assert compile_codec(ALPHABET36, 7, cw=True) is Base36BlockedEncoder
+    assert compile_codec("01", 2).decode(compile_codec("01", 2).encode(b"\x05")) == (
+        b"\x05"
+    )
+    for alphabet in ["A", "ABA", "A B", "ab"]:
+        with pytest.raises(ValueError):
+            compile_codec(alphabet, cw=True)
+
+
+def test_load_alphabets(tmp_path):
+    path = tmp_path / "alphabets.toml"
+    assert not load_alphabets(path)
+
+    path.write_text(
+        '[alphabets.greek]\nletters = "ΑΒΓΔΕΖΗΘΙΚΛΜΝΞΟΠΡΣΤΥΦΧΨΩ"\ncw = true\n',
+        encoding="utf-8",
+    )
+    codecs = load_alphabets(path)
+    assert set(codecs) == {"greek", "greek-blocked"}
+    data = bytes(2) + random.Random(3).randbytes(50)
+    assert codecs["greek-blocked"].decode(codecs["greek-blocked"].encode(data)) == data
+    assert codecs["greek"].cw
+
+    path.write_text('[alphabets.base36]\nletters = "AB"\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="Reserved"):
+        load_alphabets(path, reserved=["base36"])
+
+    path.write_text('[alphabets.bad]\nletters = "AA"\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="repeated"):
+        load_alphabets(path)
+
+    path.write_text(
+        '[alphabets.bad]\nletters = "AB"\nblock-size = "8"\n', encoding="utf-8"
+    )
+    with pytest.raises(ValueError, match="block-size"):
+        load_alphabets(path)
+
+    path.write_text('[alphabets.bad]\nletters = "AB"\ncw = "yes"\n', encoding="utf-8")
+    with pytest.raises(ValueError, match="cw"):
+        load_alphabets(path)
+
+
+def test_user_encoders(tmp_path, monkeypatch):
+    assert encoders["greek"].cw
+    assert "greek-blocked" in encoders
+    assert "nope" not in encoders
+
+    path = tmp_path / "alphabets.toml"
+    path.write_text(
+        '[alphabets.bad]\nletters = "AB"\nblock-size = true\n', encoding="utf-8"
+    )
+    monkeypatch.setenv("SODA_ALPHABETS", str(path))
+    table = EncoderTable({"base36": Base36Encoder})
+    assert table["base36"] is Base36Encoder
+    assert not table.loaded
+    with pytest.raises(click.ClickException, match="block-size"):
+        _ = table["bad"]
@@ -0,0 +1,106 @@
+import random
+
+import click
+import pytest
+
+from cw_soda.encoders import encode_str
+from cw_soda.error_search import (
+    ChecksumTree,
+    checksum_calculators,
+    checksum_widths,
+    error_search,
+    grid_parity,
+    parity_search,
+)
+
+
+def make_groups(count: int, seed: int) -> list:
+    rnd = random.Random(seed)
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+    return ["".join(rnd.choices(letters, k=5)) for _ in range(count)]
+
+
+@pytest.mark.parametrize("checksum", list(checksum_calculators))
+@pytest.mark.parametrize("count", [1, 2, 7, 70])
+def test_checksum_tree(checksum, count):
+    calc = checksum_calculators[checksum]
+    width = checksum_widths[checksum]
+    groups = make_groups(count, seed=count)
+    sent = ChecksumTree(groups, calc, width)
+    assert len(sent.checksums(64)) == 2 * count - 1
+
+    for depth in range(8):
+        ranges = sent.level(depth)
+        assert [i for start, end in ranges for i in range(start, end)] == list(
+            range(count)
+        )
+        assert ChecksumTree(groups, calc, width).compare(sent.digest(depth)) == []
+
+    received = list(groups)
+    error = count // 3
+    received[error] = "ZZZZZ" if groups[error] != "ZZZZZ" else "YYYYY"
+    tree = ChecksumTree(received, calc, width)
+    for depth in range(8):
+        errors = tree.compare(sent.digest(depth))
+        assert len(errors) == 1
+        assert errors[0][0] <= error < errors[0][1]
+
+    assert tree.compare(sent.digest(10)) == [(error, error + 1)]
+
+
+def test_checksum_tree_invalid():
+    calc = checksum_calculators["crc16"]
+    tree = ChecksumTree(make_groups(10, seed=1), calc, 2)
+    for digest in ["", "ABC", "XYZW", "0" * 4 * 64]:
+        with pytest.raises(ValueError):
+            tree.compare(digest)
+
+
+@pytest.mark.parametrize("errors", [[], [0], [5], [3, 4], [0, 17, 18, 39]])
+def test_error_search(errors, monkeypatch):
+    calc = checksum_calculators["crc32"]
+    sent = make_groups(40, seed=3)
+    received = list(sent)
+    for i in errors:
+        received[i] = received[i][::-1]
+
+    # The operator compares the checksum with the sender's one
+    sent_sums = {
+        calc.checksum(b"".join(encode_str(g) for g in sent[start:end]))
+        for start in range(40)
+        for end in range(start + 1, 41)
+    }
+    asked = []
+    monkeypatch.setattr(click, "echo", asked.append)
+    monkeypatch.setattr(
+        click, "confirm", lambda *_, **__: int(asked[-1][10:], 16) in sent_sums
+    )
+    assert error_search(received, calc) == errors
+
+    asked.clear()
+    if len(errors) == 1:
+        assert error_search(received, calc, single=True) == errors
+        assert len(asked) <= 2 * 6
+
+
+def test_parity_search():
+    calc = checksum_calculators["crc16"]
+    sent = make_groups(37, seed=4)
+    parity = grid_parity(sent, calc, 2, 8)
+    assert len(parity[0]) == 8
+    assert len(parity[1]) == 5
+    assert parity_search(sent, parity, *parity) == []
+
+    received = list(sent)
+    received[13] = "AAAAA"
+    local = grid_parity(received, calc, 2, 8)
+    assert parity_search(received, local, *parity) == [13]
+    assert parity_search(received, local, parity[0], None) == [5, 13, 21, 29]
+    assert parity_search(received, local, None, parity[1]) == list(range(8, 16))
+
+    received[30] = "BBBBB"
+    local = grid_parity(received, calc, 2, 8)
+    assert parity_search(received, local, *parity) == [13, 14, 29, 30]
+
+    with pytest.raises(ValueError):
+        parity_search(received, local, parity[0][:-1], None)
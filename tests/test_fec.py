@@ -0,0 +1,50 @@
+import random
+
+import pytest
+
+from cw_soda.fec import GROUP_SIZE, add_fec, fec_alphabet, galois_field, repair
+
+
+@pytest.mark.parametrize("encoding", ["base26", "base31", "base36"])
+def test_galois_field(encoding):
+    base = len(fec_alphabet(encoding))
+    prime, root = galois_field(base)
+    assert prime > base**GROUP_SIZE
+    assert pow(root, (prime - 1) // 2, prime) != 1
+
+
+@pytest.mark.parametrize("encoding", ["base26", "base31", "base36"])
+def test_repair(encoding):
+    alphabet = fec_alphabet(encoding)
+    rnd = random.Random(encoding)
+    for length in [1, 4, 5, 6, 99, 300]:
+        for parity in [1, 2, 5, 8]:
+            text = "".join(rnd.choices(alphabet, k=length))
+            encoded = add_fec(text, alphabet, parity)
+            assert len(encoded) % GROUP_SIZE == 0
+            assert repair(encoded, alphabet, parity) == (text, [])
+
+            groups = [encoded[i : i + 5] for i in range(0, len(encoded), 5)]
+            erased = rnd.randrange(parity + 1)
+            wrong = (parity - erased) // 2
+            indexes = rnd.sample(range(len(groups)), min(len(groups), erased + wrong))
+            for i in indexes[:erased]:
+                groups[i] = groups[i][:2] + "?" + groups[i][3:]
+
+            for i in indexes[erased:]:
+                letter = alphabet[(alphabet.index(groups[i][0]) + 1) % len(alphabet)]
+                groups[i] = letter + groups[i][1:]
+
+            message, corrected = repair("".join(groups), alphabet, parity)
+            assert message == text
+            assert corrected == sorted(indexes)
+
+
+def test_repair_too_many_errors():
+    alphabet = fec_alphabet("base26")
+    encoded = add_fec("HELLOWORLD" * 10, alphabet, 4)
+    with pytest.raises(ValueError):
+        repair("?????" * 5 + encoded[25:], alphabet, 4)
+
+    with pytest.raises(ValueError):
+        repair(encoded[:-1], alphabet, 4)
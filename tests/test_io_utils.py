@@ -0,0 +1,34 @@
+import io
+
+from cw_soda.io_utils import LazyGroups, break_into_groups, read_groups, tokenize_groups
+
+
+class Pipe(io.StringIO):
+    def seekable(self) -> bool:
+        return False
+
+
+def test_tokenize_groups():
+    text = "ab cde\nFGH ij\tklmnopq rs\n" * 50
+    expected = break_into_groups(
+        text.upper().replace(" ", "").replace("\n", "").replace("\t", "")
+    )
+    for chunk_size in [1, 3, 7, 1000]:
+        groups = list(tokenize_groups(io.StringIO(text), chunk_size))
+        assert groups == list(enumerate(expected))
+
+
+def test_lazy_groups():
+    text = " ".join(f"{i:05}" for i in range(100)) + " 1"
+    for source in [io.StringIO(text), Pipe(text)]:
+        groups = read_groups(source)
+        assert isinstance(groups, LazyGroups)
+        assert len(groups) == 101
+        assert list(groups) == list(groups)
+        assert groups[3] == "00003"
+        assert groups[100] == "1"
+        assert groups[1:20:9] == ["00001", "00010", "00019"]
+        with groups:
+            assert groups[0] == "00000"
+
+        assert groups.spool is None or groups.spool.closed
@@ -1,8 +1,20 @@
 # pylint: disable=redefined-outer-name
+import json
+import os
+import pstats
+import random
+import subprocess
+import sys
+import threading
+
 import pytest
 from click.testing import CliRunner
+from nacl.exceptions import CryptoError
+from PIL import Image
 
-from cw_soda.main import cli
+from cw_soda.agent import SOCKET_ENV, AgentServer, default_socket
+from cw_soda.benchmark import benchmark_suites, generate_corpus, suggest_profile
+from cw_soda.main import cli, lazy_commands
 
 
 @pytest.fixture
@@ -55,7 +67,17 @@ def png_image(shared_datadir):
 
 def test_genkey():
     runner = CliRunner()
-    text_encoders = ["base26", "base31", "base36", "base64", "base94"]
+    text_encoders = [
+        "base26",
+        "base31",
+        "base36",
+        "base64",
+        "base94",
+        "base26-blocked",
+        "base31-blocked",
+        "base36-blocked",
+        "base94-blocked",
+    ]
     for enc in text_encoders:
         result = runner.invoke(cli, ["genkey", "--encoding", enc])
         assert result.exit_code == 0
@@ -336,3 +358,679 @@ def test_hide_reveal_secret(png_image):
 
         with open("output2", "rb") as fd:
             assert fd.read() == b" message2 "
+
+
+def test_stego_plan(png_image):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("image.png", "wb") as fd:
+            fd.write(png_image)
+
+        with open("message1", "w", encoding="utf-8") as fd:
+            fd.write("CQ CQ DE K1ABC K1ABC K")
+
+        args = ["stego-plan", "image.png", "message1", "message1"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert "Image: 1080x720 RGBA" in result.output
+        assert "Capacity: 259200" in result.output
+        assert "Headroom: 259074" in result.output
+
+        Image.new("RGB", (8, 8)).save("small.png")
+        args = ["stego-plan", "small.png", "message1"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 1
+        assert "the image holds 19" in result.output
+
+
+def test_hide_secret_preflight(monkeypatch):
+    def derive(*_):
+        raise AssertionError("The keys are derived")
+
+    monkeypatch.setattr("cw_soda.commands.stego.kdf_many", derive)
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        Image.new("RGB", (8, 8)).save("small.png")
+        for name in ("seed", "password", "salt", "message"):
+            with open(name, "w", encoding="utf-8") as fd:
+                fd.write(name)
+
+        args = ["hide-secret", "small.png", "out.png", "seed", "password", "salt"]
+        result = runner.invoke(cli, args=[*args, "message"])
+        assert result.exit_code == 1
+        assert "The payloads take" in result.output
+        assert not os.path.exists("out.png")
+
+        Image.new("P", (64, 64)).save("palette.png")
+        args[1] = "palette.png"
+        result = runner.invoke(cli, args=[*args, "message"])
+        assert result.exit_code == 1
+        assert "channels" in result.output
+
+
+@pytest.mark.parametrize("compression", ["zlib", "bz2", "lzma", "raw"])
+@pytest.mark.parametrize("encoding", ["binary", "base36-blocked", "base31-blocked"])
+def test_encrypt_secret_stream(private_key, compression, encoding):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        message = random.Random(1).randbytes(150_000) * 2
+        with open("message", "wb") as fd:
+            fd.write(message)
+
+        args = [
+            "encrypt-secret",
+            "secret_key",
+            "message",
+            "--data-encoding",
+            encoding,
+            "--compression",
+            compression,
+            "--output-file",
+            "encrypted",
+            "--stream",
+        ]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+
+        args = [
+            "decrypt-secret",
+            "secret_key",
+            "encrypted",
+            "--data-encoding",
+            encoding,
+            "--compression",
+            compression,
+            "--output-file",
+            "decrypted",
+            "--stream",
+        ]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        with open("decrypted", "rb") as fd:
+            assert fd.read() == message
+
+
+def test_encrypt_public_stream_truncated(private_key, public_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("private_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        with open("public_key", "w", encoding="utf-8") as fd:
+            fd.write(public_key)
+
+        with open("message", "wb") as fd:
+            fd.write(random.Random(2).randbytes(200_000))
+
+        keys = ["private_key", "public_key"]
+        options = ["--data-encoding", "binary", "--compression", "raw", "--stream"]
+        args = ["encrypt", *keys, "message", "--output-file", "encrypted", *options]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+
+        args = ["decrypt", *keys, "encrypted", "--output-file", "decrypted", *options]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        with open("decrypted", "rb") as fd, open("message", "rb") as expected:
+            assert fd.read() == expected.read()
+
+        with open("encrypted", "r+b") as fd:
+            fd.truncate(100_000)
+
+        args = ["decrypt", *keys, "encrypted", "--output-file", "truncated", *options]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code != 0
+        assert isinstance(result.exception, CryptoError)
+        assert not os.path.exists("truncated")
+
+
+def test_stream_requires_blocked_encoding(private_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write("message")
+
+        args = ["encrypt-secret", "secret_key", "message", "--stream"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 2
+
+
+def test_batch_encrypt_decrypt(private_key, public_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("private_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        with open("public_key", "w", encoding="utf-8") as fd:
+            fd.write(public_key)
+
+        messages = {f"message{i}": f"message number {i}" for i in range(5)}
+        for name, text in messages.items():
+            with open(name, "w", encoding="utf-8") as fd:
+                fd.write(text)
+
+        with open("encrypt.csv", "w", encoding="utf-8") as fd:
+            fd.write("input,output,recipient,encoding,compression\n")
+            for i, name in enumerate(messages):
+                compression = "raw" if i % 2 else ""
+                fd.write(f"{name},{name}.enc,public_key,base26-blocked,{compression}\n")
+
+        with open("decrypt.jsonl", "w", encoding="utf-8") as fd:
+            for i, name in enumerate(messages):
+                job = {
+                    "input": f"{name}.enc",
+                    "output": f"{name}.dec",
+                    "recipient": "public_key",
+                    "encoding": "base26-blocked",
+                    "compression": "raw" if i % 2 else "zlib",
+                }
+                fd.write(json.dumps(job) + "\n")
+
+        args = ["batch-encrypt", "private_key", "encrypt.csv", "--workers", "3"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert "Messages: 5" in result.stderr
+
+        args = ["batch-decrypt", "private_key", "decrypt.jsonl"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        for name, text in messages.items():
+            with open(f"{name}.dec", "r", encoding="utf-8") as fd:
+                assert fd.read() == text
+
+        os.remove("message0.dec")
+        with open("message1.enc", "w", encoding="utf-8") as fd:
+            fd.write("CORRUPTED")
+
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 1
+        assert "4 of 5 jobs failed" in result.stderr
+        assert "Needs --force" in result.stderr
+
+        result = runner.invoke(cli, args=[*args, "--force"])
+        assert result.exit_code == 1
+        assert "1 of 5 jobs failed" in result.stderr
+
+        with open("missing.csv", "w", encoding="utf-8") as fd:
+            fd.write("input,output,recipient\n")
+            fd.write("message0,message0.enc2,public_key\n")
+            fd.write("message1,message1.enc2,missing_key\n")
+
+        result = runner.invoke(
+            cli, args=["batch-encrypt", "private_key", "missing.csv"]
+        )
+        assert result.exit_code == 1
+        assert "1 of 2 jobs failed" in result.stderr
+        assert os.path.exists("message0.enc2")
+
+
+def test_agent(password, salt, private_key, monkeypatch, tmp_path):
+    server = AgentServer(tmp_path / "agent.sock", ttl=60)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv(SOCKET_ENV, str(tmp_path / "agent.sock"))
+    try:
+        runner = CliRunner()
+        with runner.isolated_filesystem():
+            with open("password", "w", encoding="utf-8") as fd:
+                fd.write(password)
+
+            with open("salt", "w", encoding="utf-8") as fd:
+                fd.write(salt)
+
+            for _ in range(2):
+                result = runner.invoke(cli, args=["kdf", "password", "salt"])
+                assert result.exit_code == 0
+                assert result.stdout == private_key + "\n"
+
+        assert server.cache.derivations == 1
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert len(server.cache.keys) == 0
+    assert not (tmp_path / "agent.sock").exists()
+
+
+def test_agent_error(password, salt, private_key, monkeypatch):
+    def request_key(*_):
+        raise RuntimeError("Agent error: MemoryError()")
+
+    monkeypatch.setattr("cw_soda.agent.request_key", request_key)
+    monkeypatch.setenv(SOCKET_ENV, "agent.sock")
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("password", "w", encoding="utf-8") as fd:
+            fd.write(password)
+
+        with open("salt", "w", encoding="utf-8") as fd:
+            fd.write(salt)
+
+        result = runner.invoke(cli, args=["kdf", "password", "salt"])
+        assert result.exit_code == 0
+        assert result.stdout == private_key + "\n"
+
+
+def test_default_socket(monkeypatch):
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    path = default_socket()
+    assert path.parent.stat().st_mode & 0o777 == 0o700
+
+    path.parent.chmod(0o755)
+    try:
+        with pytest.raises(PermissionError):
+            default_socket()
+    finally:
+        path.parent.chmod(0o700)
+
+
+def test_kdf_custom_profile(password, salt):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("password", "w", encoding="utf-8") as fd:
+            fd.write(password)
+
+        with open("salt", "w", encoding="utf-8") as fd:
+            fd.write(salt)
+
+        args = ["kdf", "password", "salt", "--profile", "2:64M"]
+        custom = runner.invoke(cli, args=args)
+        assert custom.exit_code == 0
+
+        args = ["kdf", "password", "salt", "--profile", "interactive"]
+        result = runner.invoke(cli, args=args)
+        assert result.stdout == custom.stdout
+
+        args = ["kdf", "password", "salt", "--profile", "0:64M"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 2
+
+
+def test_kdf_bench(monkeypatch):
+    runner = CliRunner()
+    args = ["kdf-bench", "--ops", "1", "--mem", "8M", "--target", "0.5", "--no-builtin"]
+    result = runner.invoke(cli, args=args)
+    assert result.exit_code == 0
+    assert "1:8M" in result.stdout
+    assert "Suggested profile for 0.5s: " in result.stdout
+
+    result = runner.invoke(cli, args=["kdf-bench", "--no-builtin", "--ops", ""])
+    assert result.exit_code == 2
+
+    results = {"1:8M": {"opslimit": 1, "memlimit": 8 << 20, "wall": 0.01}}
+    assert suggest_profile(results, 0.05) == (5, 8 << 20)
+    assert suggest_profile({}, 0.05) is None
+    monkeypatch.setattr("cw_soda.benchmark.available_memory", lambda: 1 << 20)
+    assert suggest_profile(results, 0.05) is None
+
+
+def test_bench():
+    runner = CliRunner()
+    args = ["bench", "--size", "1K", "--repeat", "2"]
+    result = runner.invoke(cli, args=args)
+    assert result.exit_code == 0
+    report = json.loads(result.stdout)
+    assert set(report["results"]) == set(benchmark_suites)
+    assert report["results"]["encoders"]["base36.encode"]["mb_per_s"] > 0
+    assert 0 < report["results"]["archivers"]["zlib.compress"]["ratio"] < 1
+
+    for args in [["--size", "abc"], ["--size", "0"], ["--repeat", "0"]]:
+        result = runner.invoke(cli, args=["bench", *args])
+        assert result.exit_code == 2
+
+
+def test_encrypt_secret_auto(private_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        message = "CQ CQ DE K1ABC K1ABC K " * 20
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write(message)
+
+        options = ["--data-encoding", "base36-blocked", "--compression", "auto"]
+        args = ["--metrics-file", "soda.prom", "encrypt-secret", "secret_key"]
+        args += ["message", *options, "--output-file", "encrypted"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+
+        args = ["decrypt-secret", "secret_key", "encrypted", *options]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert result.stdout == message.strip() + "\n"
+
+        # The ratio is recorded for the archiver auto picked
+        with open("soda.prom", "r", encoding="utf-8") as fd:
+            text = fd.read()
+
+        assert "soda_compression_ratio_count" in text
+        assert 'archiver="auto"' not in text
+
+
+@pytest.mark.parametrize("stream", [[], ["--stream"]])
+@pytest.mark.parametrize("compression", ["bz2", "raw"])
+def test_encrypt_secret_header(private_key, compression, stream):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        message = random.Random(2).randbytes(50_000).hex().encode("ascii")
+        with open("message", "wb") as fd:
+            fd.write(message)
+
+        options = ["--data-encoding", "base36-blocked", *stream]
+        args = ["encrypt-secret", "secret_key", "message", *options]
+        args += ["--compression", compression, "--header", "--output-file", "enc"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+
+        args = ["decrypt-secret", "secret_key", "enc", *options]
+        args += ["--compression", "auto", "--output-file", "dec"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        with open("dec", "rb") as fd:
+            assert fd.read() == message
+
+        args = ["encrypt-secret", "secret_key", "message", *options]
+        args += ["--compression", compression, "--output-file", "enc2"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+
+        args = ["decrypt-secret", "secret_key", "enc2", *options]
+        args += ["--compression", "auto", "--output-file", "dec2"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 2
+        assert "Missing header" in result.stderr
+
+
+def test_train_dict(private_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        with open("corpus", "wb") as fd:
+            fd.write(generate_corpus(20_000, seed=4))
+
+        message = generate_corpus(200, seed=5).decode("ascii").strip()
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write(message)
+
+        args = ["train-dict", "corpus", "--output-file", "cw.dict", "--size", "2K"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert 0 < os.path.getsize("cw.dict") <= 2048
+
+        options = ["--data-encoding", "base36-blocked", "--dictionary", "cw.dict"]
+        args = ["encrypt-secret", "secret_key", "message", *options]
+        args += ["--compression", "zdict", "--output-file", "encrypted"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+
+        args = ["decrypt-secret", "secret_key", "encrypted", *options]
+        result = runner.invoke(cli, args=[*args, "--compression", "zdict"])
+        assert result.exit_code == 0
+        assert result.stdout == message + "\n"
+
+        # The dictionary is only used by its command
+        args = ["decrypt-secret", "secret_key", "encrypted"]
+        args += ["--data-encoding", "base36-blocked", "--compression", "zdict"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code != 0
+
+        args = ["train-dict", "corpus", "--output-file", "big.dict", "--size", "64K"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 2
+
+
+def test_find_error_digest():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        message = "ABCDE FGHIJ KLMNO PQRST UVWXY Z1234 56789 ABCDE FGHIJ KLMNO"
+        with open("sent", "w", encoding="utf-8") as fd:
+            fd.write(message)
+
+        with open("received", "w", encoding="utf-8") as fd:
+            fd.write(message.replace("Z1234", "Z1235"))
+
+        result = runner.invoke(cli, args=["digest", "sent", "--depth", "4"])
+        assert result.exit_code == 0
+        digest = result.stdout.strip()
+
+        args = ["find-error", "received", "--digest", digest]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert result.stdout.startswith("The error is in: Z1235\n")
+
+        args = ["find-error", "sent", "--digest", digest]
+        result = runner.invoke(cli, args=args)
+        assert result.stdout == "The file is correct\n"
+
+
+def test_encrypt_secret_fec(private_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        message = "CQ CQ DE K1ABC K1ABC K"
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write(message)
+
+        options = ["--data-encoding", "base26-blocked"]
+        args = ["encrypt-secret", "secret_key", "message", *options, "--fec", "4"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert "FEC groups: 5\n" in result.stderr
+
+        encrypted = result.stdout.strip()
+        received = "ZZZZZ" + encrypted[5:20] + "??" + encrypted[22:]
+        with open("received", "w", encoding="utf-8") as fd:
+            fd.write(received)
+
+        args = ["repair", "received", *options, "--fec", "4"]
+        args += ["--output-file", "repaired"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert result.stderr == "Corrected groups: 1, 5\n"
+
+        result = runner.invoke(
+            cli, args=["decrypt-secret", "secret_key", "repaired", *options]
+        )
+        assert result.exit_code == 0
+        assert result.stdout == message + "\n"
+
+        for fec in ["0", "-1", "256"]:
+            args = ["repair", "received", *options, "--fec", fec]
+            result = runner.invoke(cli, args=args)
+            assert result.exit_code == 2
+
+
+def test_find_error_parity():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        message = "ABCDE FGHIJ KLMNO PQRST UVWXY Z1234 56789 ABCDE FGHIJ KLMNO"
+        with open("sent", "w", encoding="utf-8") as fd:
+            fd.write(message)
+
+        with open("received", "w", encoding="utf-8") as fd:
+            fd.write(message.replace("Z1234", "Z1235"))
+
+        options = ["--column-height", "4", "--no-header"]
+        args = ["print", "sent", "--parity", "--checksum", "crc16", *options]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        lines = result.stdout.splitlines()
+        rows = " ".join(line.split()[-1] for line in lines[:4])
+        columns = lines[4]
+
+        args = ["find-error", "received", "--checksum", "crc16", *options]
+        args += ["--row-parity", rows, "--column-parity", columns]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert result.stdout.startswith("The error is in: Z1235\n")
+
+
+def test_print_output_file():
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        message = " ".join(f"{i:05}" for i in range(1000))
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write(message)
+
+        result = runner.invoke(cli, args=["print", "message", "--column-height", "7"])
+        assert result.exit_code == 0
+        lines = result.stdout.splitlines()
+        assert len(lines) == 8
+        assert lines[1].split()[:3] == ["1", "00000", "00007"]
+
+        args = ["print", "message", "--column-height", "7", "--output-file", "table"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        with open("table", "r", encoding="utf-8") as fd:
+            assert fd.read().splitlines() == lines
+
+
+def test_lazy_commands():
+    for name, (_, _, short_help) in lazy_commands.items():
+        command = cli.get_command(None, name)
+        assert command.name == name
+        assert command.get_short_help_str() == short_help
+
+
+@pytest.mark.parametrize("args", [["--help"], ["print", "-"]])
+def test_startup_imports(args):
+    # The startup cost is bounded by what it imports, the timing is noisy.
+    # The modules loaded by the interpreter itself (site) don't count.
+    code = (
+        "import sys\n"
+        "preloaded = set(sys.modules)\n"
+        "from cw_soda.main import cli\n"
+        f"cli({args!r}, standalone_mode=False)\n"
+        "print(' '.join(set(sys.modules) - preloaded), file=sys.stderr)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        input="HELLOWORLD",
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    modules = set(result.stderr.split())
+    heavy = {
+        "steganon",
+        "PIL",
+        "cw_soda.benchmark",
+        "cw_soda.batch",
+        "cw_soda.agent",
+        "nacl.public",
+        "nacl.pwhash",
+        "bz2",
+        "lzma",
+        "cProfile",
+        "tracemalloc",
+        "crc",
+    }
+    assert not modules & heavy
+    if args == ["--help"]:
+        assert not any(module.startswith("cw_soda.commands.") for module in modules)
+
+
+def test_timings(private_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write("CQ CQ DE K1ABC K1ABC K")
+
+        args = ["encrypt-secret", "secret_key", "message", "--timings", "json"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        report = json.loads(result.stderr[result.stderr.index("{") :])
+        stages = ["read", "compress", "encrypt", "encode", "write"]
+        assert list(report["stages"]) == stages
+        assert report["total"]["calls"] == 5
+
+        with open("encrypted", "w", encoding="utf-8") as fd:
+            fd.write(result.stdout)
+
+        args = ["decrypt-secret", "secret_key", "encrypted", "--timings", "table"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        assert "Stage" in result.stderr
+        assert "decrypt" in result.stderr
+
+
+def test_metrics_file(private_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write("CQ CQ DE K1ABC K1ABC K")
+
+        options = ["--metrics-file", "soda.prom"]
+        args = [*options, "encrypt-secret", "secret_key", "message"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+
+        with open("encrypted", "w", encoding="utf-8") as fd:
+            fd.write(result.stdout[1:])
+
+        args = [*options, "decrypt-secret", "secret_key", "encrypted"]
+        result = runner.invoke(cli, args=args)
+        assert isinstance(result.exception, CryptoError)
+
+        with open("soda.prom", "r", encoding="utf-8") as fd:
+            text = fd.read()
+
+        labels = 'command="encrypt-secret",direction="in",encoding="base36"'
+        assert f"soda_bytes_total{{{labels}}} 22" in text
+        assert 'soda_compression_ratio_count{archiver="zlib"} 1' in text
+        stage = 'command="encrypt-secret",stage="compress"'
+        assert f"soda_stage_seconds_count{{{stage}}} 1" in text
+        assert 'soda_decrypt_failures_total{mode="secret"} 1' in text
+        assert text.endswith("# EOF\n")
+
+
+def test_profile_out(private_key):
+    runner = CliRunner()
+    with runner.isolated_filesystem():
+        with open("secret_key", "w", encoding="utf-8") as fd:
+            fd.write(private_key)
+
+        with open("message", "w", encoding="utf-8") as fd:
+            fd.write("CQ CQ DE K1ABC K1ABC K")
+
+        args = ["--profile-out", "profile", "encrypt-secret", "secret_key", "message"]
+        result = runner.invoke(cli, args=args)
+        assert result.exit_code == 0
+        stats = pstats.Stats("profile")
+        regions = {function for _, _, function in stats.stats}
+        assert {"io:read", "compress:zlib", "encode:base", "io:write"} <= regions
+        # io:write is the whole write, not only the overwrite check
+        callers = {
+            function: {caller[2] for caller in entry[4]}
+            for (_, _, function), entry in stats.stats.items()
+        }
+        assert callers["write_output"] == {"io:write"}
+        assert callers["output_conflict"] == {"write_output"}
+
+        args = ["--profile-out", "stacks", "--profile-format", "collapsed"]
+        result = runner.invoke(cli, args=[*args, "genkey"])
+        assert result.exit_code == 0
+        with open("stacks", encoding="utf-8") as fd:
+            for line in fd:
+                stack, count = line.rsplit(" ", 1)
+                assert stack and int(count) > 0
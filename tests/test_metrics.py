@@ -0,0 +1,64 @@
+from nacl.encoding import RawEncoder
+
+from cw_soda import metrics
+from cw_soda.cryptography.kdf import hash_salt, kdf_many
+from cw_soda.metrics import Registry, collecting, read_samples
+from cw_soda.timings import active_timings, stage
+
+
+def test_flush_adds_to_file(tmp_path):
+    path = tmp_path / "soda.prom"
+    registry = Registry(path, "encrypt")
+    registry.count("soda_bytes", 100, direction="in", encoding="base36")
+    registry.observe("soda_compression_ratio", 0.45, archiver="zlib")
+    registry.flush()
+    registry.count("soda_bytes", 50, direction="in", encoding="base36")
+    registry.count("soda_batch_jobs", outcome='"quoted"\n')
+    registry.flush()
+
+    text = path.read_text(encoding="utf-8")
+    assert text.endswith("# EOF\n")
+    assert "# TYPE soda_bytes counter" in text
+    assert 'soda_bytes_total{direction="in",encoding="base36"} 150' in text
+    assert 'soda_compression_ratio_bucket{archiver="zlib",le="0.4"} 0' in text
+    assert 'soda_compression_ratio_bucket{archiver="zlib",le="0.5"} 1' in text
+    assert 'soda_compression_ratio_bucket{archiver="zlib",le="+Inf"} 1' in text
+    assert 'soda_batch_jobs_total{outcome="\\"quoted\\"\\n"} 1' in text
+
+    # The labels survive the round trip
+    samples = read_samples(path)
+    assert (
+        samples[("soda_batch_jobs", "_total", (("outcome", '"quoted"\n'),), None)] == 1
+    )
+    assert not (tmp_path / ".soda.prom.tmp").exists()
+
+
+def test_collecting(tmp_path):
+    path = tmp_path / "soda.prom"
+    metrics.count("soda_kdf_derivations")
+    with collecting(path, "kdf"):
+        with stage("kdf"):
+            metrics.count("soda_kdf_derivations", profile="2:64M")
+            metrics.count_bytes("binary", 10, 20)
+
+    assert metrics.active_registry.get() is None
+    assert active_timings.get() is None
+    text = path.read_text(encoding="utf-8")
+    assert 'soda_kdf_derivations_total{profile="2:64M"} 1' in text
+    assert "soda_kdf_derivations_total 1" not in text
+    assert 'soda_stage_seconds_count{command="kdf",stage="kdf"} 1' in text
+    assert (
+        'soda_bytes_total{command="kdf",direction="out",encoding="binary"} 20' in text
+    )
+
+
+def test_collecting_workers(tmp_path):
+    path = tmp_path / "soda.prom"
+    salts = [hash_salt(b"1"), hash_salt(b"2")]
+    with collecting(path, "reveal-secret"):
+        with stage("kdf"):
+            kdf_many([b"a", b"b"], salts, (1, 8 << 20), RawEncoder)
+
+    text = path.read_text(encoding="utf-8")
+    assert 'soda_kdf_derivations_total{profile="1:8M"} 2' in text
+    assert 'soda_stage_seconds_count{command="reveal-secret",stage="kdf"} 1' in text
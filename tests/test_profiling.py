@@ -0,0 +1,34 @@
+import time
+
+from cw_soda.profiling import Sampler, region
+
+
+@region("test:busy")
+def busy(seconds: float) -> int:
+    """Spins for the seconds."""
+    count = 0
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        count += 1
+
+    return count
+
+
+def test_region():
+    assert busy.__name__ == "busy"
+    assert busy.__doc__ == "Spins for the seconds."
+    assert busy.__code__.co_name == "test:busy"
+    assert busy(0) == 0
+
+
+def test_sampler(tmp_path):
+    sampler = Sampler()
+    sampler.start()
+    busy(0.2)
+    sampler.stop()
+    assert sum(sampler.samples.values()) > 10
+    assert any("test:busy" in stack for stack in sampler.samples)
+
+    path = tmp_path / "stacks"
+    sampler.write(path)
+    assert len(path.read_text(encoding="utf-8").splitlines()) == len(sampler.samples)
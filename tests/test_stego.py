@@ -0,0 +1,33 @@
+import pytest
+from steganon import LSB_MWS, Image
+
+from cw_soda.stego import carrier_capacity, check_carrier, sealed_size
+
+
+@pytest.mark.parametrize("width, seeds", [(6, 1), (12, 2), (30, 2)])
+def test_carrier_capacity(width, seeds):
+    capacity = carrier_capacity(width, width, seeds)
+    lsb_mws = LSB_MWS(Image.new("RGB", (width, width)), [b"1", b"2"][:seeds])
+    for i in range(seeds):
+        lsb_mws.hide(b"x" * (capacity // seeds))
+        if i < seeds - 1:
+            lsb_mws.next()
+
+    lsb_mws.finalize()
+
+
+def test_carrier_capacity_limit():
+    capacity = carrier_capacity(30, 30, 1)
+    lsb_mws = LSB_MWS(Image.new("RGB", (30, 30)), b"1")
+    with pytest.raises(OverflowError):
+        lsb_mws.hide(b"x" * (capacity + 1))
+
+
+def test_check_carrier():
+    assert sealed_size(10) == 50
+    check_carrier(3, 100, [50, 50])
+    with pytest.raises(ValueError, match="take 101 bytes"):
+        check_carrier(4, 100, [50, 51])
+
+    with pytest.raises(ValueError, match="channels"):
+        check_carrier(1, 100, [50])
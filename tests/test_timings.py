@@ -0,0 +1,45 @@
+import time
+
+from cw_soda.timings import Timings, active_timings, recording, stage, timed
+
+
+def test_nested_stages():
+    timings = Timings()
+    with timings.stage("outer"):
+        time.sleep(0.01)
+        with timings.stage("inner"):
+            time.sleep(0.05)
+
+    # The inner time isn't counted twice
+    outer = timings.stages["outer"]
+    inner = timings.stages["inner"]
+    assert 0.01 <= outer["wall"] < 0.05
+    assert inner["wall"] >= 0.05
+    assert timings.total()["calls"] == 2
+
+
+def test_stage_without_recording():
+    assert active_timings.get() is None
+    with stage("idle"):
+        pass
+
+    assert list(timed("idle", [1, 2])) == [1, 2]
+
+
+def test_recording(capsys):
+    def produce():
+        for _ in range(3):
+            time.sleep(0.01)
+            yield bytes(1 << 16)
+
+    with recording("table") as timings:
+        with stage("write"):
+            chunks = list(timed("read", produce()))
+
+    assert len(chunks) == 3
+    assert timings.stages["read"]["calls"] == 4
+    assert timings.stages["read"]["wall"] >= 0.03
+    assert timings.stages["write"]["wall"] < timings.stages["read"]["wall"]
+    assert timings.stages["write"]["peak"] >= 3 << 16
+    assert active_timings.get() is None
+    assert "Stage" in capsys.readouterr().err